@@ -0,0 +1,66 @@
+USER_PAGE_SIZE = 50
+SUMMARY_DAYS = 30
+
+USER_COLUMNS = "SELECT id, full_name, email, phone_number, created_at FROM users"
+
+# Recherche par préfixe: LIKE 'abc%' sur une colonne indexée COLLATE NOCASE
+# devient un parcours de plage d'index (optimisation LIKE de SQLite). Les trois
+# plages sont unies en une liste d'id, puis relues par clé primaire.
+SEARCH_FILTER = """id IN (
+    SELECT id FROM users WHERE email LIKE :pattern ESCAPE '\\'
+    UNION SELECT id FROM users WHERE phone_number LIKE :pattern ESCAPE '\\'
+    UNION SELECT id FROM users WHERE full_name LIKE :pattern ESCAPE '\\'
+)"""
+
+
+def prefix_pattern(prefix):
+    """Motif LIKE 'prefix%' où % et _ saisis sont pris littéralement"""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def users_page_sql(search=False, after=False):
+    """Utilisateurs du plus récent au plus ancien, pagination par id (keyset)"""
+    conditions = []
+    if search:
+        conditions.append(SEARCH_FILTER)
+    if after:
+        conditions.append("id < :after")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"{USER_COLUMNS}{where} ORDER BY id DESC LIMIT :limit"
+
+
+def fetch_users(conn, query=None, after=None, limit=USER_PAGE_SIZE):
+    """Une page d'utilisateurs: (lignes, id à passer en `after` pour la suite ou None)"""
+    query = (query or "").strip()
+    params = {"limit": limit + 1}
+    if query:
+        params["pattern"] = prefix_pattern(query)
+    if after is not None:
+        params["after"] = int(after)
+    rows = conn.execute(users_page_sql(bool(query), after is not None), params).fetchall()
+    next_after = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+# ---------------- AGRÉGATS ----------------
+# platform_totals et platform_daily sont tenues à jour par des triggers, dans la
+# transaction de chaque écriture (voir la migration 4): la lecture ne coûte
+# qu'une plage de clé primaire, une ligne par jour affiché.
+DAILY_SQL = """
+SELECT day, new_users, deposit_count, deposit_volume, withdrawal_count, withdrawal_volume,
+       investment_count, investment_volume
+FROM platform_daily
+WHERE day > date('now', ?)
+ORDER BY day DESC
+"""
+
+
+def platform_summary(conn, days=SUMMARY_DAYS):
+    totals = conn.execute("SELECT user_count, total_balance FROM platform_totals WHERE id = 1").fetchone()
+    daily = [dict(row) for row in conn.execute(DAILY_SQL, (f"-{int(days)} days",))]
+    return {
+        "user_count": totals["user_count"] if totals else 0,
+        "total_balance": totals["total_balance"] if totals else 0,
+        "daily": daily,
+    }
@@ -1,23 +1,52 @@
-from flask import Flask, render_template, request, redirect, session, url_for, flash, jsonify
-import sqlite3
+from flask import Flask, Response, render_template, request, redirect, session, url_for, flash, jsonify
 from datetime import datetime
+import json
 import os
-import random
-import string
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_mail import Mail, Message
+from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import dashboard_data
+import archive
+import assets
+import db
+import emails
+import etags
+import events
+import export
+import hashing
+import history
+import idempotency
+import ledger
+import login_audit
+import metrics
+import migrations
+import money
+import outbox
+import ratelimit
+import references
+import search
+import sessions
+import storage
+import wallet
+from db import get_db
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "ANAMBOARY_SECRET_KEY_RENDER_2025")
 
 # Configuration Email
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True').lower() == 'true'
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'votre.email@gmail.com')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'votre-mot-de-passe-app')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'votre.email@gmail.com')
 
+# File d'emails: "thread" = envoi depuis le processus web, "off" = `flask outbox-worker` séparé
+app.config['MAIL_OUTBOX_WORKER'] = os.environ.get('MAIL_OUTBOX_WORKER', 'thread')
+# "smtp" ou "file" (écrit des .eml dans MAIL_OUTBOX_DIR, pour les tests)
+app.config['MAIL_OUTBOX_BACKEND'] = os.environ.get('MAIL_OUTBOX_BACKEND', 'smtp')
+app.config['MAIL_OUTBOX_DIR'] = os.environ.get('MAIL_OUTBOX_DIR', 'outbox_mails')
+
 mail = Mail(app)
 
 # Configuration production
@@ -27,412 +56,166 @@ app.config.update(
     SESSION_COOKIE_SECURE=True,
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE='Lax',
-    PERMANENT_SESSION_LIFETIME=3600
+    PERMANENT_SESSION_LIFETIME=3600,
+    SQLITE_POOL_SIZE=int(os.environ.get("SQLITE_POOL_SIZE", 8)),
+    SQLITE_POOL_TIMEOUT=float(os.environ.get("SQLITE_POOL_TIMEOUT", 10)),
+    DASHBOARD_CACHE_TTL=float(os.environ.get("DASHBOARD_CACHE_TTL", 10)),
+    IDEMPOTENCY_TTL=float(os.environ.get("IDEMPOTENCY_TTL", 86400)),
+    METRICS_TOKEN=os.environ.get("METRICS_TOKEN"),
+    POSTGRES_POOL_SIZE=int(os.environ.get("POSTGRES_POOL_SIZE", 10)),
+    POSTGRES_LOCK_TIMEOUT=float(os.environ.get("POSTGRES_LOCK_TIMEOUT", 2)),
+    LOGIN_RETENTION_DAYS=int(os.environ.get("LOGIN_RETENTION_DAYS", 90)),
+    TRANSACTION_RETENTION_DAYS=int(os.environ.get("TRANSACTION_RETENTION_DAYS", 730)),
+    COMPRESS_MIN_SIZE=int(os.environ.get("COMPRESS_MIN_SIZE", 1024)),
+    # Sinon `flask build-assets` au déploiement; le démarrage lit seulement le manifeste
+    ASSETS_BUILD_ON_START=os.environ.get("ASSETS_BUILD_ON_START", "False").lower() == "true",
+    # Coût des nouveaux hashes; les anciens sont refaits à la connexion suivante
+    PASSWORD_HASH_METHOD=os.environ.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000"),
+    PASSWORD_HASH_WORKERS=int(os.environ.get("PASSWORD_HASH_WORKERS", min(2, os.cpu_count() or 1))),
+    PASSWORD_HASH_MAX_PENDING=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32)),
+    # Sessions côté serveur: PERMANENT_SESSION_LIFETIME est l'expiration d'inactivité
+    SESSION_TOUCH_INTERVAL=float(os.environ.get("SESSION_TOUCH_INTERVAL", 60)),
+    SESSION_CACHE_SIZE=int(os.environ.get("SESSION_CACHE_SIZE", 10000)),
+    # Flux SSE: URL publique (vide = désactivé, le dashboard interroge /api/wallet),
+    # hub dans le processus web ("thread") ou via `flask events-server` ("off")
+    EVENTS_URL=os.environ.get("EVENTS_URL", ""),
+    EVENTS_SERVER=os.environ.get("EVENTS_SERVER", "thread"),
+    EVENTS_HOST=os.environ.get("EVENTS_HOST", "127.0.0.1"),
+    EVENTS_PORT=int(os.environ.get("EVENTS_PORT", 8001)),
+    EVENTS_ALLOW_ORIGIN=os.environ.get("EVENTS_ALLOW_ORIGIN"),
+    # "memory" (par worker) ou "sqlite" (partagé: RATELIMIT_PATH, de préférence sur /dev/shm)
+    RATELIMIT_ENABLED=os.environ.get("RATELIMIT_ENABLED", "True").lower() == "true",
+    RATELIMIT_BACKEND=os.environ.get("RATELIMIT_BACKEND", "memory"),
+    RATELIMIT_PATH=os.environ.get("RATELIMIT_PATH", "/dev/shm/anamboary-ratelimit.db"),
+    # Ex.: '{"login": {"ip": "10/60", "account": "3/300"}}' (remplace les règles de ces endpoints)
+    RATELIMIT_RULES=json.loads(os.environ.get("RATELIMIT_RULES", "{}"))
 )
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'anamboary.db')
+# Derrière le proxy de Render: l'IP du client est dans X-Forwarded-For (nombre de proxys de confiance).
+# Sans ProxyFix, tous les clients partagent l'IP du proxy, donc le même seau de limitation par IP.
+PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 1 if os.environ.get("RENDER") else 0))
+if PROXY_FIX_X_FOR:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_X_FOR)
+elif os.environ.get("RENDER") and app.config["RATELIMIT_ENABLED"]:
+    print("⚠️ PROXY_FIX_X_FOR=0 sur Render: la limitation par IP s'applique à tous les clients à la fois")
+
+# sqlite:///fichier (défaut) ou postgresql://... pour les utilisateurs, portefeuilles et mouvements
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///anamboary.db')
+# Base SQLite locale: données métier en mode SQLite, file d'emails et clés d'idempotence dans tous les cas
+DB_PATH = (os.environ.get('DB_PATH') or storage.sqlite_path(DATABASE_URL, os.path.dirname(os.path.abspath(__file__)))
+           or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anamboary.db'))
+# Lignes sorties des tables vivantes par `flask archive`
+ARCHIVE_PATH = os.environ.get('ARCHIVE_PATH') or os.path.splitext(DB_PATH)[0] + '-archive.db'
 
 # ---------------- DATABASE ----------------
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# En premier: le pool de hachage forke ses processus avant qu'un thread ne démarre
+hashing.init_app(app)
+metrics.init_app(app)
+# Avant les autres hooks: une requête refusée ne touche ni la base ni le hachage
+ratelimit.init_app(app)
+assets.init_app(app)
+db.init_app(app, DB_PATH, factory=metrics.TimedConnection)
+storage.init_app(app, DATABASE_URL, db.pool)
+outbox.init_app(app, db.pool, mail)
+migrations.init_app(app, db.pool)
+dashboard_data.init_app(app)
+events.init_app(app, session_check=sessions.is_active)
+idempotency.init_app(app)
+sessions.init_app(app, db.pool)
+login_audit.init_app(app, storage.backend.logins)
+ledger.init_app(app, storage.backend.ledger)
+archive.init_app(app, storage.backend, ARCHIVE_PATH)
+export.init_app(app, storage.backend, archive.store)
+
+metrics.registry.stats_gauge("anamboary_sqlite_pool", "État du pool de connexions SQLite", db.pool.stats)
+metrics.registry.stats_gauge("anamboary_storage", "Pool de connexions du backend de stockage",
+                             storage.backend.stats)
+metrics.registry.stats_gauge("anamboary_wallet", "Mutations de portefeuille et attente du verrou d'écriture",
+                             storage.backend.wallets.stats)
+metrics.registry.stats_gauge("anamboary_login_audit", "Tampon du journal des connexions",
+                             lambda: login_audit.buffer.stats())
+metrics.registry.stats_gauge("anamboary_archive", "Base d'archives (taille, pool)", archive.store.stats)
+metrics.registry.stats_gauge("anamboary_compression", "Réponses compressées (octets avant/après)", assets.stats)
+metrics.registry.stats_gauge("anamboary_password_hashing", "Pool de hachage des mots de passe",
+                             lambda: hashing.hasher.stats())
+metrics.registry.stats_gauge("anamboary_ratelimit", "Requêtes acceptées et refusées par le limiteur de débit",
+                             lambda: ratelimit.limiter.stats())
+metrics.registry.stats_gauge("anamboary_references", "Collisions de références rattrapées", references.stats)
+metrics.registry.stats_gauge("anamboary_sessions", "Sessions côté serveur (cache, révocations)",
+                             lambda: sessions.store.stats())
+metrics.registry.stats_gauge("anamboary_idempotency", "Clés d'idempotence et rejeux", idempotency.store.stats)
+metrics.registry.stats_gauge("anamboary_wallet_versions", "Lectures de version de portefeuille et réponses 304",
+                             etags.stats)
+metrics.registry.stats_gauge("anamboary_events", "Flux SSE: connexions, événements publiés et livrés",
+                             lambda: events.hub.stats() if events.hub else {})
+metrics.registry.stats_gauge("anamboary_dashboard_cache", "Cache des snapshots du dashboard",
+                             dashboard_data.cache.stats)
+metrics.registry.gauge_function("anamboary_email_outbox", "Emails en file par statut", ("status",),
+                                lambda: [((status,), n) for status, n in outbox.dispatcher.stats().items()])
 
 def init_db():
-    conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        full_name TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        phone_number TEXT NOT NULL UNIQUE,
-        password TEXT NOT NULL,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS wallets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL UNIQUE,
-        balance REAL DEFAULT 0,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS transactions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        type TEXT NOT NULL,
-        amount REAL NOT NULL,
-        reference TEXT UNIQUE,
-        status TEXT,
-        timestamp TEXT,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS investments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        amount REAL NOT NULL,
-        date TEXT NOT NULL,
-        profit REAL,
-        status TEXT,
-        reference TEXT UNIQUE,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS user_logins (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        login_time TEXT,
-        ip_address TEXT,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    migrations.migrate(get_db())
+    storage.backend.ensure_schema()
 
 # Initialize database on startup
 with app.app_context():
     init_db()
 
 # ---------------- UTILITY FUNCTIONS ----------------
-def generate_reference():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-
 def validate_phone(phone):
     return phone.strip().isdigit() and len(phone) >= 8
 
+def wallet_changed(user_id, result, tx_type, amount):
+    """Après un mouvement: caches du dashboard et des ETag, puis flux d'événements"""
+    idempotency.applied()
+    dashboard_data.invalidate(user_id)
+    events.publish(user_id, 'wallet', {'type': tx_type, 'amount': amount, 'reference': result.reference,
+                                       'balance': result.balance, 'version': result.version})
+
 # ---------------- EMAIL FUNCTIONS ----------------
+def queue_email(recipient, subject, html_body):
+    """Mettre un email dans la file; l'envoi SMTP se fait hors requête"""
+    conn = get_db()
+    outbox.enqueue(conn, recipient, subject, html_body)
+    conn.commit()
+    outbox.wake()
+
 def send_welcome_email(email, full_name):
     """Envoyer un email de bienvenue réel"""
     try:
-        subject = "🎉 Bienvenue sur Anamboary Invest!"
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: #f8f9fa;
-                    margin: 0;
-                    padding: 20px;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    background: white;
-                    border-radius: 15px;
-                    overflow: hidden;
-                    box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-                }}
-                .header {{
-                    background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-                    color: white;
-                    padding: 30px;
-                    text-align: center;
-                }}
-                .content {{
-                    padding: 30px;
-                    color: #333;
-                    line-height: 1.6;
-                }}
-                .button {{
-                    display: inline-block;
-                    background: linear-gradient(45deg, #ffc107, #ff8c00);
-                    color: black;
-                    padding: 12px 30px;
-                    text-decoration: none;
-                    border-radius: 25px;
-                    font-weight: bold;
-                    margin: 20px 0;
-                }}
-                .features {{
-                    background: #f8f9fa;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 20px 0;
-                }}
-                .footer {{
-                    background: #343a40;
-                    color: white;
-                    padding: 20px;
-                    text-align: center;
-                    font-size: 14px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🚀 Anamboary Invest</h1>
-                    <p>Votre succès financier commence ici</p>
-                </div>
-                
-                <div class="content">
-                    <h2>Bonjour {full_name} !</h2>
-                    <p>Nous sommes ravis de vous accueillir sur <strong>Anamboary Invest</strong>, la plateforme d'investissement la plus sécurisée de Madagascar.</p>
-                    
-                    <div class="features">
-                        <p><strong>🎯 Ce que vous pouvez faire maintenant :</strong></p>
-                        <ul>
-                            <li>✅ Faire votre premier dépôt</li>
-                            <li>✅ Investir avec 11.67% de profit quotidien</li>
-                            <li>✅ Suivre vos performances en temps réel</li>
-                            <li>✅ Retirer vos gains à tout moment</li>
-                        </ul>
-                    </div>
-                    
-                    <p style="text-align: center;">
-                        <a href="https://votre-site.com/dashboard" class="button">
-                            Commencer à Investir
-                        </a>
-                    </p>
-                    
-                    <p><strong>📞 Besoin d'aide ?</strong><br>
-                    Notre équipe de support est disponible 24h/24 et 7j/7 pour vous accompagner.</p>
-                </div>
-                
-                <div class="footer">
-                    <p>© 2025 Anamboary Invest. Tous droits réservés.</p>
-                    <p>Cet email a été envoyé à {email}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg = Message(
-            subject=subject,
-            recipients=[email],
-            html=html_body
-        )
-        
-        mail.send(msg)
-        print(f"✅ Email de bienvenue envoyé à: {email}")
+        subject, html_body = emails.render_welcome(email, full_name)
+        queue_email(email, subject, html_body)
+        print(f"📨 Email de bienvenue mis en file pour: {email}")
         return True
         
     except Exception as e:
-        print(f"❌ Erreur envoi email à {email}: {str(e)}")
+        print(f"❌ Erreur mise en file email à {email}: {str(e)}")
         return False
 
 def send_transaction_email(email, full_name, transaction_type, amount, reference=None):
     """Envoyer un email pour les transactions"""
     try:
-        if transaction_type == "dépôt":
-            subject = "💰 Dépôt réussi - Anamboary Invest"
-            action = "déposé"
-            color = "#28a745"
-            emoji = "💰"
-        elif transaction_type == "retrait":
-            subject = "💸 Retrait réussi - Anamboary Invest"
-            action = "retiré"
-            color = "#dc3545"
-            emoji = "💸"
-        else:
-            subject = "📈 Investissement réussi - Anamboary Invest"
-            action = "investi"
-            color = "#ffc107"
-            emoji = "📈"
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: #f8f9fa;
-                    margin: 0;
-                    padding: 20px;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    background: white;
-                    border-radius: 15px;
-                    overflow: hidden;
-                    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-                }}
-                .header {{
-                    background: {color};
-                    color: white;
-                    padding: 25px;
-                    text-align: center;
-                }}
-                .content {{
-                    padding: 25px;
-                    color: #333;
-                    line-height: 1.6;
-                }}
-                .transaction-details {{
-                    background: #f8f9fa;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 20px 0;
-                }}
-                .footer {{
-                    background: #343a40;
-                    color: white;
-                    padding: 20px;
-                    text-align: center;
-                    font-size: 14px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>{emoji} {subject}</h2>
-                </div>
-                
-                <div class="content">
-                    <p>Bonjour <strong>{full_name}</strong>,</p>
-                    
-                    <p>Votre transaction a été effectuée avec succès !</p>
-                    
-                    <div class="transaction-details">
-                        <h3>Détails de la transaction :</h3>
-                        <p><strong>Type :</strong> {transaction_type}</p>
-                        <p><strong>Montant :</strong> {amount} Ar</p>
-                        <p><strong>Statut :</strong> ✅ Réussi</p>
-                        {f'<p><strong>Référence :</strong> {reference}</p>' if reference else ''}
-                        <p><strong>Date :</strong> {datetime.now().strftime("%d/%m/%Y à %H:%M")}</p>
-                    </div>
-                    
-                    <p>Vous avez {action} <strong>{amount} Ar</strong> avec succès.</p>
-                    
-                    <p>Pour toute question, n'hésitez pas à contacter notre support.</p>
-                </div>
-                
-                <div class="footer">
-                    <p>© 2025 Anamboary Invest - Plateforme sécurisée d'investissement</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg = Message(
-            subject=subject,
-            recipients=[email],
-            html=html_body
-        )
-        
-        mail.send(msg)
-        print(f"✅ Email transaction envoyé à: {email}")
+        subject, html_body = emails.render_transaction(email, full_name, transaction_type, amount, reference)
+        queue_email(email, subject, html_body)
+        print(f"📨 Email transaction mis en file pour: {email}")
         return True
         
     except Exception as e:
-        print(f"❌ Erreur envoi email transaction à {email}: {str(e)}")
+        print(f"❌ Erreur mise en file email transaction à {email}: {str(e)}")
         return False
 
 def send_investment_email(email, full_name, amount, daily_profit):
     """Envoyer un email pour les investissements"""
     try:
-        monthly_profit = daily_profit * 30
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: #f8f9fa;
-                    margin: 0;
-                    padding: 20px;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    background: white;
-                    border-radius: 15px;
-                    overflow: hidden;
-                    box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-                }}
-                .header {{
-                    background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-                    color: white;
-                    padding: 30px;
-                    text-align: center;
-                }}
-                .profit-card {{
-                    background: linear-gradient(135deg, #28a745, #20c997);
-                    color: white;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 20px 0;
-                    text-align: center;
-                }}
-                .content {{
-                    padding: 30px;
-                    line-height: 1.6;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎉 Investissement Réussi !</h1>
-                    <p>Votre argent travaille pour vous</p>
-                </div>
-                
-                <div class="content">
-                    <p>Félicitations <strong>{full_name}</strong> !</p>
-                    
-                    <p>Votre investissement de <strong>{amount} Ar</strong> a été placé avec succès.</p>
-                    
-                    <div class="profit-card">
-                        <h3>📈 Votre Profit Quotidien</h3>
-                        <h2>{daily_profit} Ar</h2>
-                        <p>Soit {monthly_profit} Ar par mois</p>
-                    </div>
-                    
-                    <p><strong>Prochain profit :</strong> Dans 24 heures</p>
-                    <p><strong>Disponibilité :</strong> Retrait possible à tout moment</p>
-                    
-                    <p>Merci de nous faire confiance pour faire fructifier votre capital.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg = Message(
-            subject="📈 Investissement placé avec succès - Anamboary Invest",
-            recipients=[email],
-            html=html_body
-        )
-        
-        mail.send(msg)
-        print(f"✅ Email investissement envoyé à: {email}")
+        subject, html_body = emails.render_investment(email, full_name, amount, daily_profit)
+        queue_email(email, subject, html_body)
+        print(f"📨 Email investissement mis en file pour: {email}")
         return True
         
     except Exception as e:
-        print(f"❌ Erreur envoi email investissement à {email}: {str(e)}")
+        print(f"❌ Erreur mise en file email investissement à {email}: {str(e)}")
         return False
 
-# ---------------- SESSION MANAGEMENT ----------------
-@app.before_request
-def make_session_permanent():
-    session.permanent = True
-
 # ---------------- ROUTES ----------------
 @app.route('/')
 def index():
@@ -468,40 +251,36 @@ def register():
             flash("Adresse email invalide.", "error")
             return render_template('register.html')
 
-        conn = get_db()
-        cursor = conn.cursor()
+        users = storage.backend.users
 
         try:
             # Vérifier si l'email existe déjà
-            cursor.execute("SELECT * FROM users WHERE email=?", (email,))
-            if cursor.fetchone():
+            if users.find_by_email(email):
                 flash("Cet email est déjà enregistré.", "error")
                 return render_template('register.html')
 
             # Vérifier si le numéro existe déjà
-            cursor.execute("SELECT * FROM users WHERE phone_number=?", (phone,))
-            if cursor.fetchone():
+            if users.find_by_phone(phone):
                 flash("Ce numéro est déjà enregistré.", "error")
                 return render_template('register.html')
 
-            hashed = generate_password_hash(password)
-            cursor.execute("INSERT INTO users(full_name, email, phone_number, password) VALUES (?, ?, ?, ?)",
-                           (full_name, email, phone, hashed))
-            user_id = cursor.lastrowid
-            cursor.execute("INSERT INTO wallets(user_id, balance) VALUES (?, ?)", (user_id, 0))
-            conn.commit()
+            hashed = hashing.hasher.hash(password)
+            users.create(full_name, email, phone, hashed)
             
             # Envoyer email de bienvenue
             send_welcome_email(email, full_name)
             
             flash("Inscription réussie ! Un email de bienvenue vous a été envoyé.", "success")
             return redirect('/login')
+        except storage.DuplicateUser:
+            flash("Cet email ou ce numéro est déjà enregistré.", "error")
+            return render_template('register.html')
+        except hashing.HashingBusy as e:
+            flash(str(e), "error")
+            return render_template('register.html'), 503
         except Exception as e:
-            conn.rollback()
             flash("Erreur lors de l'inscription. Veuillez réessayer.", "error")
             return render_template('register.html')
-        finally:
-            conn.close()
 
     return render_template('register.html')
 
@@ -518,139 +297,149 @@ def login():
             flash("Veuillez entrer votre email/téléphone et mot de passe.", "error")
             return render_template('login.html')
 
-        conn = get_db()
-        cursor = conn.cursor()
-        
         try:
             # Essayer de trouver par email ou téléphone
-            cursor.execute("SELECT * FROM users WHERE email=? OR phone_number=?", (login_input, login_input))
-            user = cursor.fetchone()
-
-            if user and check_password_hash(user['password'], password):
-                session.permanent = True
-                session['user_id'] = user['id']
-                session['full_name'] = user['full_name']
-                session['phone'] = user['phone_number']
-                session['email'] = user['email']
+            user = storage.backend.users.find_by_login(login_input)
+            valid, rehashed = hashing.hasher.verify(user['password'], password) if user else (False, None)
+
+            if valid:
+                if rehashed:
+                    storage.backend.users.update_password(user['id'], rehashed)
+                sessions.login(user)
                 
-                cursor.execute(
-                    "INSERT INTO user_logins (user_id, login_time, ip_address) VALUES (?, ?, ?)",
-                    (user['id'], datetime.now().strftime("%Y-%m-%d %H:%M:%S"), request.remote_addr)
-                )
-                conn.commit()
+                # Journalisé par lots, hors du verrou d'écriture de la requête
+                login_audit.record(user['id'], request.remote_addr)
                 
                 flash(f"Bienvenue {user['full_name']} !", "success")
                 return redirect('/dashboard')
             else:
                 flash("Email/téléphone ou mot de passe incorrect.", "error")
                 return render_template('login.html')
+        except hashing.HashingBusy as e:
+            flash(str(e), "error")
+            return render_template('login.html'), 503
         except Exception as e:
             flash("Erreur de connexion. Veuillez réessayer.", "error")
             return render_template('login.html')
-        finally:
-            conn.close()
 
     return render_template('login.html')
 
 @app.route('/dashboard')
 def dashboard():
-    if 'user_id' not in session:
+    user = sessions.current_user()
+    if user is None:
         flash("Veuillez vous connecter pour accéder au dashboard.", "error")
         return redirect('/login')
 
-    conn = get_db()
-    cursor = conn.cursor()
-    
     try:
-        # Vérifier si l'utilisateur existe toujours
-        cursor.execute("SELECT * FROM users WHERE id=?", (session['user_id'],))
-        user = cursor.fetchone()
+        snapshot = dashboard_data.get_snapshot(user.id)
         
-        if not user:
-            session.clear()
+        if not snapshot:
+            sessions.logout()
             flash("Session expirée. Veuillez vous reconnecter.", "error")
             return redirect('/login')
 
-        cursor.execute("SELECT balance FROM wallets WHERE user_id=?", (session['user_id'],))
-        wallet = cursor.fetchone()
-        balance = wallet['balance'] if wallet else 0
-
-        cursor.execute("SELECT * FROM transactions WHERE user_id=? ORDER BY timestamp DESC LIMIT 5", (session['user_id'],))
-        transactions = cursor.fetchall()
-
-        cursor.execute("SELECT * FROM investments WHERE user_id=? ORDER BY date DESC", (session['user_id'],))
-        investments = cursor.fetchall()
-
-        return render_template('dashboard.html', name=session['full_name'], balance=balance,
-                               transactions=transactions, investments=investments)
+        return render_template('dashboard.html', user=user, balance=snapshot.balance,
+                               transactions=snapshot.transactions, transactions_cursor=snapshot.transactions_cursor,
+                               investments=snapshot.investments, investments_cursor=snapshot.investments_cursor)
                                
     except Exception as e:
         flash("Erreur de chargement des données.", "error")
         return redirect('/login')
-    finally:
-        conn.close()
 
-@app.route('/invest', methods=['POST'])
-def invest():
+@app.route('/api/wallet')
+def api_wallet():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Non authentifié'}), 401
 
-    try:
-        amount = float(request.form['amount'])
-    except:
-        return jsonify({'success': False, 'message': 'Montant invalide'}), 400
+    # Une seule lecture par clé unique: 304 si le client a déjà cette version
+    balance, version = etags.state(session['user_id'])
+    tag = etags.etag('wallet', session['user_id'], version)
+    if etags.not_modified(tag):
+        return etags.tagged(Response(status=304), tag)
 
-    conn = get_db()
-    cursor = conn.cursor()
+    return etags.tagged(jsonify({'success': True, 'balance': balance, 'version': version}), tag)
+
+@app.route('/api/events/token')
+def api_events_token():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Non authentifié'}), 401
+    if events.hub is None:
+        return jsonify({'success': False, 'message': 'Flux désactivé'}), 404
+
+    # Jeton valable events.TOKEN_MAX_AGE s, le temps d'ouvrir le flux
+    url = f"{app.config['EVENTS_URL']}?token={events.hub.token(session['user_id'], sessions.current_key())}"
+    return jsonify({'success': True, 'url': url}), 200, {'Cache-Control': 'no-store'}
+
+@app.route('/api/history/<kind>')
+def api_history(kind):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Non authentifié'}), 401
+    if kind not in history.KINDS:
+        return jsonify({'success': False, 'message': 'Historique inconnu'}), 404
+
+    # Toute page change avec la version du portefeuille (chaque mouvement l'incrémente).
+    # Version lue avant la page: au pire une page plus récente que son ETag, relue ensuite
+    tag = etags.etag(kind, session['user_id'], etags.current(session['user_id']))
+    if etags.not_modified(tag):
+        return etags.tagged(Response(status=304), tag)
 
     try:
-        cursor.execute("SELECT balance FROM wallets WHERE user_id=?", (session['user_id'],))
-        wallet = cursor.fetchone()
-        balance = wallet['balance'] if wallet else 0
+        items, next_cursor = storage.backend.ledger.page(kind, session['user_id'],
+                                                         cursor=request.args.get('cursor'),
+                                                         limit=request.args.get('limit', history.PAGE_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Paramètres invalides'}), 400
 
-        if amount <= 0 or amount > balance:
-            return jsonify({'success': False, 'message': 'Solde insuffisant ou montant invalide'}), 400
+    return etags.tagged(jsonify({'success': True, 'items': items, 'next_cursor': next_cursor}), tag)
 
-        daily_profit = round(amount * 0.1167, 2)
-        cursor.execute("UPDATE wallets SET balance = balance - ? WHERE user_id=?", (amount, session['user_id']))
+@app.route('/invest', methods=['POST'])
+@idempotency.idempotent
+def invest():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Non authentifié'}), 401
 
-        reference = generate_reference()
-        cursor.execute("INSERT INTO investments (user_id, amount, date, profit, status, reference) VALUES (?, ?, ?, ?, ?, ?)",
-                       (session['user_id'], amount, datetime.now().strftime("%Y-%m-%d"), daily_profit, "actif", reference))
+    try:
+        amount = money.parse_amount(request.form['amount'])
+    except:
+        return jsonify({'success': False, 'message': 'Montant invalide'}), 400
 
-        cursor.execute("INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                       (session['user_id'], "investissement", amount, reference, "réussi", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    if amount <= 0:
+        return jsonify({'success': False, 'message': 'Solde insuffisant ou montant invalide'}), 400
 
-        conn.commit()
-        
-        # Récupérer le nouveau solde
-        cursor.execute("SELECT balance FROM wallets WHERE user_id=?", (session['user_id'],))
-        new_wallet = cursor.fetchone()
-        new_balance = new_wallet['balance'] if new_wallet else 0
+    try:
+        daily_profit = money.daily_profit(amount)
+        result = references.retry_on_collision(lambda reference: storage.backend.wallets.invest(
+            session['user_id'], amount, reference, daily_profit))
+        wallet_changed(session['user_id'], result, "investissement", amount)
         
         # Envoyer email d'investissement
-        send_investment_email(session['email'], session['full_name'], amount, daily_profit)
+        user = sessions.current_user()
+        send_investment_email(user.email, user.full_name, amount, daily_profit)
         
         return jsonify({
             'success': True, 
             'message': f'Investissement de {amount} Ar réussi ! Profit quotidien: {daily_profit} Ar. Un email de confirmation vous a été envoyé.',
-            'new_balance': new_balance
+            'new_balance': result.balance,
+            'version': result.version
         })
         
+    except wallet.InsufficientFunds:
+        return jsonify({'success': False, 'message': 'Solde insuffisant ou montant invalide'}), 400
+    except wallet.WalletBusy:
+        return jsonify({'success': False, 'message': 'Service occupé, veuillez réessayer'}), 503
     except Exception as e:
-        conn.rollback()
         return jsonify({'success': False, 'message': 'Erreur lors de l\'investissement'}), 500
-    finally:
-        conn.close()
 
 @app.route('/depot', methods=['GET', 'POST'])
+@idempotency.idempotent
 def depot():
     if 'user_id' not in session:
         return redirect('/login')
 
     if request.method == 'POST':
         try:
-            amount = float(request.form['amount'])
+            amount = money.parse_amount(request.form['amount'])
         except:
             flash("Montant invalide", "error")
             return redirect('/depot')
@@ -659,89 +448,77 @@ def depot():
             flash("Le montant doit être positif.", "error")
             return redirect('/depot')
 
-        conn = get_db()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("UPDATE wallets SET balance = balance + ? WHERE user_id=?", (amount, session['user_id']))
-
-            reference = generate_reference()
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                           (session['user_id'], "dépôt", amount, reference, "réussi", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-
-            conn.commit()
+            result = references.retry_on_collision(
+                lambda reference: storage.backend.wallets.credit(session['user_id'], amount, "dépôt", reference))
+            reference = result.reference
+            wallet_changed(session['user_id'], result, "dépôt", amount)
             
             # Envoyer email de confirmation
-            send_transaction_email(session['email'], session['full_name'], "dépôt", amount, reference)
+            user = sessions.current_user()
+            send_transaction_email(user.email, user.full_name, "dépôt", amount, reference)
             
             flash(f"Dépôt de {amount} Ar effectué avec succès ! Un email de confirmation vous a été envoyé.", "success")
+        except wallet.WalletBusy:
+            flash("Service occupé, veuillez réessayer.", "error")
         except Exception as e:
-            conn.rollback()
             flash("Erreur lors du dépôt", "error")
-        finally:
-            conn.close()
             
         return redirect('/dashboard')
 
     return render_template('depot.html')
 
 @app.route('/retrait', methods=['GET', 'POST'])
+@idempotency.idempotent
 def retrait():
     if 'user_id' not in session:
         return redirect('/login')
 
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("SELECT balance FROM wallets WHERE user_id=?", (session['user_id'],))
-        wallet = cursor.fetchone()
-        balance = wallet['balance'] if wallet else 0
-    except:
-        balance = 0
-    finally:
-        conn.close()
-
     if request.method == 'POST':
         try:
-            amount = float(request.form['amount'])
+            amount = money.parse_amount(request.form['amount'])
         except:
             flash("Montant invalide", "error")
             return redirect('/retrait')
 
-        if amount <= 0 or amount > balance:
+        if amount <= 0:
             flash("Montant invalide ou solde insuffisant.", "error")
             return redirect('/retrait')
 
-        conn = get_db()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("UPDATE wallets SET balance = balance - ? WHERE user_id=?", (amount, session['user_id']))
-
-            reference = generate_reference()
-            cursor.execute("INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                           (session['user_id'], "retrait", amount, reference, "réussi", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-
-            conn.commit()
+            # Le solde est vérifié dans la même transaction que le débit
+            result = references.retry_on_collision(
+                lambda reference: storage.backend.wallets.debit(session['user_id'], amount, "retrait", reference))
+            reference = result.reference
+            wallet_changed(session['user_id'], result, "retrait", amount)
             
             # Envoyer email de confirmation
-            send_transaction_email(session['email'], session['full_name'], "retrait", amount, reference)
+            user = sessions.current_user()
+            send_transaction_email(user.email, user.full_name, "retrait", amount, reference)
             
             flash(f"Retrait de {amount} Ar effectué avec succès ! Un email de confirmation vous a été envoyé.", "success")
+        except wallet.InsufficientFunds:
+            flash("Montant invalide ou solde insuffisant.", "error")
+            return redirect('/retrait')
+        except wallet.WalletBusy:
+            flash("Service occupé, veuillez réessayer.", "error")
         except Exception as e:
-            conn.rollback()
             flash("Erreur lors du retrait", "error")
-        finally:
-            conn.close()
             
         return redirect('/dashboard')
 
+    try:
+        balance = storage.backend.wallets.balance(session['user_id'])
+    except:
+        balance = 0
+
     return render_template('retrait.html', balance=balance)
 
 @app.route('/logout')
 def logout():
-    session.clear()
+    if 'user_id' in session:
+        events.publish(session['user_id'], events.CLOSE, {'session': sessions.current_key()})
+    sessions.logout()
     flash("Déconnexion réussie", "info")
     return redirect('/')
 
@@ -752,6 +529,7 @@ def admin_login():
         username = request.form['username']
         password = request.form['password']
         if username == "admin" and password == "anamboary@2025":
+            session.regenerate()
             session['is_admin'] = True
             return redirect('/admin/dashboard')
         else:
@@ -764,23 +542,74 @@ def admin_dashboard():
     if not session.get('is_admin'):
         return redirect('/admin')
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id, full_name, email, phone_number, created_at FROM users")
-    users = cursor.fetchall()
-
-    cursor.execute("""
-        SELECT u.full_name, l.login_time, l.ip_address
-        FROM user_logins l
-        JOIN users u ON l.user_id = u.id
-        ORDER BY l.login_time DESC
-        LIMIT 50
-    """)
-    logs = cursor.fetchall()
-
-    conn.close()
-    return render_template('admin_dashboard.html', users=users, logs=logs)
+    # Les dernières connexions peuvent encore être dans le tampon
+    login_audit.buffer.flush()
+
+    query = request.args.get('q', '').strip()
+    try:
+        after = int(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        after = None
+    users, next_after = storage.backend.users.page(query, after)
+    summary = storage.backend.ledger.summary()
+    logs = storage.backend.logins.recent(50)
+
+    return render_template('admin_dashboard.html', users=users, logs=logs, summary=summary,
+                           query=query, after=after, next_after=next_after)
+
+@app.route('/admin/search')
+def admin_search():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Non autorisé'}), 403
+    try:
+        results = storage.backend.search(request.args.get('q', ''),
+                                         limit=request.args.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Paramètres invalides'}), 400
+    return jsonify({'success': True, **results})
+
+@app.route('/admin/export/<table>')
+def admin_export(table):
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Non autorisé'}), 403
+    fmt = request.args.get('format', 'csv')
+    archived = request.args.get('source') == 'archive'
+    try:
+        filters = export.parse_filters(table, request.args.get('since'), request.args.get('until'),
+                                       request.args.get('user_id'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Paramètres invalides'}), 400
+    if fmt not in export.FORMATS:
+        return jsonify({'success': False, 'message': 'Format invalide (csv ou jsonl)'}), 400
+    if archived and not archive.store.archives(table):
+        return jsonify({'success': False, 'message': 'Table non archivée'}), 400
+    if table == 'user_logins' and not archived:
+        login_audit.buffer.flush()
+
+    # Générateur: les lignes partent au fil de la lecture, sans tout charger
+    source = archive.store if archived else storage.backend
+    return Response(export.encode(source.export(table, filters), table, fmt),
+                    content_type=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{export.filename(table, fmt, filters)}"',
+                             'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/db-stats')
+def admin_db_stats():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Non autorisé'}), 403
+    return jsonify({'pool': db.pool.stats(), 'storage': storage.backend.stats(), 'wallet': wallet.stats(),
+                    'login_audit': login_audit.buffer.stats(), 'references': references.stats(),
+                    'archive': archive.store.stats()})
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    # Session admin, ou jeton Bearer pour un scraper Prometheus
+    token = app.config.get('METRICS_TOKEN')
+    authorized = session.get('is_admin') or (
+        token and request.headers.get('Authorization') == f"Bearer {token}")
+    if not authorized:
+        return "Non autorisé\n", 403, {'Content-Type': 'text/plain; charset=utf-8'}
+    return metrics.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -0,0 +1,189 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+
+import export
+import ledger
+from db import ConnectionPool
+
+# Rétention: les lignes plus anciennes que la fenêtre quittent les tables
+# vivantes pour une base SQLite d'archives (un fichier à part, mêmes colonnes).
+# Copie puis suppression, par lots: une ligne déjà copiée est ignorée
+# (INSERT OR IGNORE sur l'id), un lot interrompu se rejoue sans doublon.
+BATCH_SIZE = 1000
+
+# table -> jours conservés par défaut dans la table vivante
+RETENTION_DAYS = {
+    "user_logins": 90,
+    "transactions": 730,
+}
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        reference TEXT,
+        status TEXT,
+        timestamp TEXT,
+        archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_logins (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        login_time TEXT,
+        ip_address TEXT,
+        archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Mêmes filtres que l'export des tables vivantes
+    "CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_reference ON transactions(reference)",
+    "CREATE INDEX IF NOT EXISTS idx_user_logins_login_time ON user_logins(login_time)",
+    "CREATE INDEX IF NOT EXISTS idx_user_logins_user_time ON user_logins(user_id, login_time)",
+]
+
+
+def archivable_sql(table, param="?"):
+    """Lignes antérieures à la date limite, les plus anciennes d'abord.
+
+    Un mouvement ne sort du journal que s'il est couvert par l'instantané de
+    son utilisateur (le trigger de suppression l'exige de toute façon).
+    """
+    date_column, columns = export.TABLES[table]
+    covered = ""
+    if table == "transactions":
+        covered = (" AND t.id <= COALESCE((SELECT s.last_transaction_id FROM ledger_snapshots s"
+                   " WHERE s.user_id = t.user_id), 0)")
+    return (f"SELECT {', '.join('t.' + c for c in columns)} FROM {table} t"
+            f" WHERE t.{date_column} < {param}{covered}"
+            f" ORDER BY t.{date_column}, t.id LIMIT {param}")
+
+
+def delete_sql(table, count, param="?"):
+    return f"DELETE FROM {table} WHERE id IN ({', '.join([param] * count)})"
+
+
+def cutoff(days, now=None):
+    """Date limite 'YYYY-MM-DD HH:MM:SS', comparable aux dates comme aux horodatages"""
+    return ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------------- SQLITE ----------------
+def fetch_archivable(conn, table, before, limit):
+    return [tuple(row) for row in conn.execute(archivable_sql(table), (before, limit))]
+
+
+def delete_rows(conn, table, ids):
+    try:
+        conn.execute(delete_sql(table, len(ids)), ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# ---------------- ARCHIVES ----------------
+class Archive:
+    """Base d'archives, interrogeable comme les tables vivantes (export.fetch_rows)"""
+
+    def __init__(self, path, pool_size=2):
+        self.path = path
+        self.pool = ConnectionPool(path, max_size=pool_size)
+        self._ready = False
+
+    def ensure_schema(self):
+        if self._ready:
+            return
+        with self.pool.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+        self._ready = True
+
+    def store(self, table, rows):
+        columns = export.columns(table)
+        self.ensure_schema()
+        with self.pool.connection() as conn:
+            try:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})", rows
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def archives(self, table):
+        return table in RETENTION_DAYS
+
+    def export(self, table, filters):
+        """Même interface que backend.export(), pour les tables archivées"""
+        self.ensure_schema()
+        with self.pool.connection() as conn:
+            yield from export.fetch_rows(conn, table, filters)
+
+    def stats(self):
+        return {"path": self.path, "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                **self.pool.stats()}
+
+
+store = None
+
+
+def move(repository, table, before, batch_size=BATCH_SIZE):
+    """Archiver puis supprimer, lot par lot, les lignes antérieures à `before`"""
+    moved = 0
+    while True:
+        rows = repository.archivable(before, batch_size)
+        if rows:
+            store.store(table, rows)
+            repository.delete([row[0] for row in rows])
+            moved += len(rows)
+        if len(rows) < batch_size:
+            return moved
+
+
+def run(backend, retention=None, batch_size=BATCH_SIZE, now=None):
+    """Appliquer la rétention de chaque table; retourne {table: lignes archivées}"""
+    retention = retention or RETENTION_DAYS
+    repositories = {"transactions": backend.ledger, "user_logins": backend.logins}
+    moved = {}
+    for table, days in retention.items():
+        if table == "transactions":
+            # Couvrir les mouvements à archiver par un instantané à jour
+            ledger.take_snapshots(backend.ledger)
+        moved[table] = move(repositories[table], table, cutoff(days, now), batch_size)
+    return moved
+
+
+def init_app(app, backend, path):
+    global store
+    store = Archive(path)
+    retention = {
+        "user_logins": app.config.get("LOGIN_RETENTION_DAYS", RETENTION_DAYS["user_logins"]),
+        "transactions": app.config.get("TRANSACTION_RETENTION_DAYS", RETENTION_DAYS["transactions"]),
+    }
+
+    @app.cli.command("archive")
+    @click.option("--table", type=click.Choice(sorted(RETENTION_DAYS)), help="une seule table (défaut: toutes)")
+    @click.option("--days", type=int, help="fenêtre de rétention en jours (remplace la configuration)")
+    @click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+    def archive_command(table, days, batch_size):
+        """Déplacer les lignes anciennes vers la base d'archives (à planifier, par exemple chaque nuit)"""
+        selected = {name: days or window for name, window in retention.items() if not table or name == table}
+        start = time.perf_counter()
+        moved = run(backend, selected, batch_size)
+        for name, count in moved.items():
+            click.echo(f"🗄️ {name}: {count} lignes de plus de {selected[name]} jours archivées")
+        click.echo(f"✅ Archives: {store.path} ({time.perf_counter() - start:.1f}s)")
+
+    return store
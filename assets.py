@@ -0,0 +1,189 @@
+"""Fichiers statiques empreintés et compression des réponses.
+
+`flask build-assets` copie chaque fichier de static/ sous un nom contenant
+son empreinte (style.css -> dist/style.3f2a9c1e0b7d.css) avec ses variantes
+.gz et .br (brotli si installé), et écrit dist/manifest.json. Le nom change
+avec le contenu: ces fichiers sont servis avec un cache d'un an "immutable".
+Le démarrage ne fait que lire le manifeste (sans manifeste, les URL restent
+celles de /static): la construction est une étape du déploiement, ou du
+démarrage si ASSETS_BUILD_ON_START est activé (développement).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle: sans elle, seules les variantes gzip existent
+    brotli = None
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+HASH_LENGTH = 12
+# mkstemp crée en 0600: les fichiers servis doivent rester lisibles par tous
+FILE_MODE = 0o644
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Réponses compressées à la volée: HTML et JSON au-delà de COMPRESS_MIN_SIZE octets
+COMPRESSIBLE = ("text/html", "application/json")
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+
+# Encodages précompressés, par ordre de préférence
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+manifest = {}
+_stats_lock = threading.Lock()
+_stats = {"compressed": 0, "bytes_in": 0, "bytes_out": 0, "precompressed": 0}
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _write_atomic(path, data):
+    """Écrire via un fichier temporaire: un worker ne lit jamais un fichier à moitié écrit"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, path)
+
+
+def fingerprinted(name, data):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def build(static_folder):
+    """Construire dist/ et son manifeste; retourne le manifeste {nom source: nom empreinté}"""
+    dist = os.path.join(static_folder, DIST)
+    entries = {}
+    for directory, subdirs, files in os.walk(static_folder):
+        subdirs[:] = [d for d in subdirs if os.path.join(directory, d) != dist]
+        for filename in sorted(files):
+            source = os.path.join(directory, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            target = fingerprinted(name, data)
+            path = os.path.join(dist, target)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            variants = {
+                path: lambda: data,
+                # mtime=0: même contenu, même .gz d'une construction à l'autre
+                path + ".gz": lambda: gzip.compress(data, compresslevel=9, mtime=0),
+            }
+            if brotli is not None:
+                variants[path + ".br"] = lambda: brotli.compress(data)
+            for variant, encode in variants.items():
+                if not os.path.exists(variant):
+                    _write_atomic(variant, encode())
+            entries[name] = target
+
+    # Les empreintes précédentes restent: une page encore en cache peut les demander
+    _write_atomic(os.path.join(dist, MANIFEST), json.dumps(entries, indent=2, sort_keys=True).encode())
+    return entries
+
+
+def load_manifest(static_folder):
+    """Manifeste de la dernière construction, {} s'il n'y en a pas"""
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST), "rb") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(filename):
+    """URL empreintée d'un fichier de static/ (URL simple s'il n'est pas dans le manifeste)"""
+    target = manifest.get(filename)
+    if target is None:
+        return url_for("static", filename=filename)
+    return url_for("assets", filename=target)
+
+
+def accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def compress_response(response, min_size=COMPRESS_MIN_SIZE):
+    """gzip à la volée des réponses HTML et JSON assez grandes (jamais des flux)"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not accepts("gzip"):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    compressed = gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = "gzip"
+    # Une ETag forte désigne les octets envoyés: elle devient faible une fois compressée
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    _record(compressed=1, bytes_in=len(data), bytes_out=len(compressed))
+    return response
+
+
+def init_app(app):
+    global manifest
+    static_folder = app.static_folder
+    if app.config.get("ASSETS_BUILD_ON_START", False):
+        manifest = build(static_folder)
+    else:
+        manifest = load_manifest(static_folder)
+    app.add_template_global(asset_url, "asset_url")
+    min_size = app.config.get("COMPRESS_MIN_SIZE", COMPRESS_MIN_SIZE)
+
+    @app.route("/assets/<path:filename>", endpoint="assets")
+    def serve_asset(filename):
+        """Fichier empreinté, variante précompressée si le client l'accepte"""
+        dist = os.path.join(static_folder, DIST)
+        if filename == MANIFEST:
+            abort(404)
+        for encoding, suffix in ENCODINGS:
+            path = safe_join(dist, filename + suffix)
+            if path and accepts(encoding) and os.path.exists(path):
+                mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                response = send_from_directory(dist, filename + suffix, mimetype=mimetype, max_age=0)
+                response.headers["Content-Encoding"] = encoding
+                _record(precompressed=1)
+                break
+        else:
+            response = send_from_directory(dist, filename, max_age=0)
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.vary.add("Accept-Encoding")
+        return response
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size)
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Empreinter static/ et écrire les variantes gzip/brotli (étape de build du déploiement)"""
+        entries = build(static_folder)
+        for name, target in sorted(entries.items()):
+            print(f"📦 {name} -> {DIST}/{target}")
+        if brotli is None:
+            print("ℹ️ brotli non installé: variantes gzip uniquement")
+
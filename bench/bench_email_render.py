@@ -0,0 +1,331 @@
+"""Micro-benchmark: rendu des emails, ancien f-string contre templates Jinja précompilés.
+
+    python bench/bench_email_render.py [--number 20000]
+
+Les fonctions legacy_* reprennent à l'identique le HTML des anciens
+send_*_email d'app.py (hors envoi) pour servir de référence.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import emails
+
+
+# ---------------- ANCIEN RENDU (f-string) ----------------
+def legacy_welcome(email, full_name):
+    subject = "🎉 Bienvenue sur Anamboary Invest!"
+
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>
+            body {{
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                background: #f8f9fa;
+                margin: 0;
+                padding: 20px;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                background: white;
+                border-radius: 15px;
+                overflow: hidden;
+                box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+            }}
+            .header {{
+                background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
+                color: white;
+                padding: 30px;
+                text-align: center;
+            }}
+            .content {{
+                padding: 30px;
+                color: #333;
+                line-height: 1.6;
+            }}
+            .button {{
+                display: inline-block;
+                background: linear-gradient(45deg, #ffc107, #ff8c00);
+                color: black;
+                padding: 12px 30px;
+                text-decoration: none;
+                border-radius: 25px;
+                font-weight: bold;
+                margin: 20px 0;
+            }}
+            .features {{
+                background: #f8f9fa;
+                padding: 20px;
+                border-radius: 10px;
+                margin: 20px 0;
+            }}
+            .footer {{
+                background: #343a40;
+                color: white;
+                padding: 20px;
+                text-align: center;
+                font-size: 14px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🚀 Anamboary Invest</h1>
+                <p>Votre succès financier commence ici</p>
+            </div>
+
+            <div class="content">
+                <h2>Bonjour {full_name} !</h2>
+                <p>Nous sommes ravis de vous accueillir sur <strong>Anamboary Invest</strong>, la plateforme d'investissement la plus sécurisée de Madagascar.</p>
+
+                <div class="features">
+                    <p><strong>🎯 Ce que vous pouvez faire maintenant :</strong></p>
+                    <ul>
+                        <li>✅ Faire votre premier dépôt</li>
+                        <li>✅ Investir avec 11.67% de profit quotidien</li>
+                        <li>✅ Suivre vos performances en temps réel</li>
+                        <li>✅ Retirer vos gains à tout moment</li>
+                    </ul>
+                </div>
+
+                <p style="text-align: center;">
+                    <a href="https://votre-site.com/dashboard" class="button">
+                        Commencer à Investir
+                    </a>
+                </p>
+
+                <p><strong>📞 Besoin d'aide ?</strong><br>
+                Notre équipe de support est disponible 24h/24 et 7j/7 pour vous accompagner.</p>
+            </div>
+
+            <div class="footer">
+                <p>© 2025 Anamboary Invest. Tous droits réservés.</p>
+                <p>Cet email a été envoyé à {email}</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return html_body
+
+
+def legacy_transaction(email, full_name, transaction_type, amount, reference=None):
+    if transaction_type == "dépôt":
+        subject = "💰 Dépôt réussi - Anamboary Invest"
+        action = "déposé"
+        color = "#28a745"
+        emoji = "💰"
+    elif transaction_type == "retrait":
+        subject = "💸 Retrait réussi - Anamboary Invest"
+        action = "retiré"
+        color = "#dc3545"
+        emoji = "💸"
+    else:
+        subject = "📈 Investissement réussi - Anamboary Invest"
+        action = "investi"
+        color = "#ffc107"
+        emoji = "📈"
+
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>
+            body {{
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                background: #f8f9fa;
+                margin: 0;
+                padding: 20px;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                background: white;
+                border-radius: 15px;
+                overflow: hidden;
+                box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+            }}
+            .header {{
+                background: {color};
+                color: white;
+                padding: 25px;
+                text-align: center;
+            }}
+            .content {{
+                padding: 25px;
+                color: #333;
+                line-height: 1.6;
+            }}
+            .transaction-details {{
+                background: #f8f9fa;
+                padding: 20px;
+                border-radius: 10px;
+                margin: 20px 0;
+            }}
+            .footer {{
+                background: #343a40;
+                color: white;
+                padding: 20px;
+                text-align: center;
+                font-size: 14px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>{emoji} {subject}</h2>
+            </div>
+
+            <div class="content">
+                <p>Bonjour <strong>{full_name}</strong>,</p>
+
+                <p>Votre transaction a été effectuée avec succès !</p>
+
+                <div class="transaction-details">
+                    <h3>Détails de la transaction :</h3>
+                    <p><strong>Type :</strong> {transaction_type}</p>
+                    <p><strong>Montant :</strong> {amount} Ar</p>
+                    <p><strong>Statut :</strong> ✅ Réussi</p>
+                    {f'<p><strong>Référence :</strong> {reference}</p>' if reference else ''}
+                    <p><strong>Date :</strong> {datetime.now().strftime("%d/%m/%Y à %H:%M")}</p>
+                </div>
+
+                <p>Vous avez {action} <strong>{amount} Ar</strong> avec succès.</p>
+
+                <p>Pour toute question, n'hésitez pas à contacter notre support.</p>
+            </div>
+
+            <div class="footer">
+                <p>© 2025 Anamboary Invest - Plateforme sécurisée d'investissement</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return html_body
+
+
+def legacy_investment(email, full_name, amount, daily_profit):
+    monthly_profit = daily_profit * 30
+
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>
+            body {{
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                background: #f8f9fa;
+                margin: 0;
+                padding: 20px;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                background: white;
+                border-radius: 15px;
+                overflow: hidden;
+                box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+            }}
+            .header {{
+                background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
+                color: white;
+                padding: 30px;
+                text-align: center;
+            }}
+            .profit-card {{
+                background: linear-gradient(135deg, #28a745, #20c997);
+                color: white;
+                padding: 20px;
+                border-radius: 10px;
+                margin: 20px 0;
+                text-align: center;
+            }}
+            .content {{
+                padding: 30px;
+                line-height: 1.6;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🎉 Investissement Réussi !</h1>
+                <p>Votre argent travaille pour vous</p>
+            </div>
+
+            <div class="content">
+                <p>Félicitations <strong>{full_name}</strong> !</p>
+
+                <p>Votre investissement de <strong>{amount} Ar</strong> a été placé avec succès.</p>
+
+                <div class="profit-card">
+                    <h3>📈 Votre Profit Quotidien</h3>
+                    <h2>{daily_profit} Ar</h2>
+                    <p>Soit {monthly_profit} Ar par mois</p>
+                </div>
+
+                <p><strong>Prochain profit :</strong> Dans 24 heures</p>
+                <p><strong>Disponibilité :</strong> Retrait possible à tout moment</p>
+
+                <p>Merci de nous faire confiance pour faire fructifier votre capital.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return html_body
+
+
+# ---------------- MESURE ----------------
+CASES = {
+    "welcome": (
+        lambda: legacy_welcome("rakoto@example.mg", "Rakoto Jean"),
+        lambda: emails.render_welcome("rakoto@example.mg", "Rakoto Jean"),
+    ),
+    "transaction": (
+        lambda: legacy_transaction("rakoto@example.mg", "Rakoto Jean", "dépôt", 25000, "AB12CD34EF"),
+        lambda: emails.render_transaction("rakoto@example.mg", "Rakoto Jean", "dépôt", 25000, "AB12CD34EF"),
+    ),
+    "investment": (
+        lambda: legacy_investment("rakoto@example.mg", "Rakoto Jean", 10000, 1167),
+        lambda: emails.render_investment("rakoto@example.mg", "Rakoto Jean", 10000, 1167),
+    ),
+}
+
+
+def per_message_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'email':<12} {'f-string µs':>12} {'jinja µs':>10} {'ratio':>7}")
+    for name, (old, new) in CASES.items():
+        old_us = per_message_us(old, args.number)
+        new_us = per_message_us(new, args.number)
+        print(f"{name:<12} {old_us:>12.2f} {new_us:>10.2f} {new_us / old_us:>7.2f}")
+
+    batch = [("transaction", dict(email=f"user{i}@example.mg", full_name=f"User {i}", transaction_type="retrait",
+                                  amount=1000 + i, reference=f"REF{i:07d}")) for i in range(500)]
+    batch_us = per_message_us(lambda: emails.render_batch(batch), max(args.number // 500, 1)) / len(batch)
+    print(f"{'batch(500)':<12} {'':>12} {batch_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Réconciliation du journal: temps et mémoire sur une grosse base SQLite.
+
+    python bench/bench_reconcile.py [--users 200000] [--transactions 2000000] [--discrepancies 25]
+
+Génère des portefeuilles cohérents avec leurs mouvements, fausse quelques
+soldes, puis mesure ledger.reconcile() avant et après ledger.take_snapshots().
+Code de sortie 1 si les écarts trouvés ne sont pas exactement ceux introduits.
+Le RSS inclut les pages de la base projetées en mémoire (plafonnées par
+mmap_size et cache_size), pas seulement les lignes lues par lot.
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import ledger
+import migrations
+from db import ConnectionPool
+from storage.sqlite import SqliteStorage
+
+TYPES = (("dépôt", 1), ("retrait", -1), ("investissement", -1))
+
+
+def seed(conn, users, transactions, batch=100000):
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO users (full_name, email, phone_number, password) VALUES (?, ?, ?, 'x')",
+        [(f"Bench {i}", f"user{i}@example.mg", f"03{i:08d}") for i in range(users)]
+    )
+    balances = [0] * (users + 1)
+    for offset in range(0, transactions, batch):
+        rows = []
+        for n in range(offset, min(offset + batch, transactions)):
+            user_id = random.randint(1, users)
+            tx_type, sign = TYPES[0] if balances[user_id] < 5000 else random.choice(TYPES)
+            amount = random.randint(1, 50) * 100
+            balances[user_id] += sign * amount
+            rows.append((user_id, tx_type, amount, f"B{n:012d}"))
+        conn.executemany(
+            "INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) "
+            "VALUES (?, ?, ?, ?, 'réussi', '2025-01-01 00:00:00')", rows
+        )
+    conn.executemany("INSERT INTO wallets (user_id, balance) VALUES (?, ?)",
+                     ((user_id, balances[user_id]) for user_id in range(1, users + 1)))
+    conn.commit()
+    return time.perf_counter() - start
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--transactions", type=int, default=2000000)
+    parser.add_argument("--discrepancies", type=int, default=25)
+    parser.add_argument("--chunk-size", type=int, default=ledger.CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "ledger.db"), max_size=2)
+        with pool.connection() as conn:
+            migrations.migrate(conn)
+            seconds = seed(conn, args.users, args.transactions)
+            broken = random.sample(range(1, args.users + 1), args.discrepancies)
+            conn.executemany("UPDATE wallets SET balance = balance + 1 WHERE user_id=?", [(u,) for u in broken])
+            conn.commit()
+        print(f"{args.users} portefeuilles, {args.transactions} mouvements générés en {seconds:.1f}s "
+              f"(RSS max {max_rss_mb():.0f} Mo)")
+
+        repository = SqliteStorage(pool).ledger
+        found = []
+        problems = []
+
+        def run(label):
+            del found[:]
+            rss = max_rss_mb()
+            summary = ledger.reconcile(repository, args.chunk_size, lambda d: found.append(d.user_id))
+            print(f"{label}: {summary['wallets']} portefeuilles en {summary['seconds']:.2f}s "
+                  f"({summary['wallets'] / summary['seconds']:.0f}/s), {summary['discrepancies']} écarts, "
+                  f"RSS max +{max_rss_mb() - rss:.0f} Mo")
+            if sorted(found) != sorted(broken):
+                problems.append(f"{label}: écarts {sorted(found)[:10]}..., attendus {sorted(broken)[:10]}...")
+
+        run("sans instantané")
+        summary = ledger.take_snapshots(repository, args.chunk_size)
+        print(f"instantanés: {summary['snapshots']} écrits en {summary['seconds']:.2f}s")
+        run("avec instantanés")
+        pool.close_all()
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
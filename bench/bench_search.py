@@ -0,0 +1,109 @@
+"""Recherche admin: index FTS5 (trigrammes) contre LIKE '%...%'.
+
+    python bench/bench_search.py [--users 100000] [--transactions 1000000] [--queries 50]
+
+Génère une base temporaire en passant par les triggers (le temps d'insertion
+inclut donc la tenue de l'index), puis compare pour des sous-chaînes de noms,
+téléphones, emails et références: search.search() contre un parcours LIKE.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import migrations
+import search
+
+NAMES = ("Rakoto", "Rabe", "Randria", "Rasoa", "Andriana", "Razafy", "Ravelo", "Rajaona", "Hery", "Fara")
+
+LIKE_USERS = """
+SELECT id FROM users
+WHERE full_name LIKE ?1 OR email LIKE ?1 OR phone_number LIKE ?1
+LIMIT 20
+"""
+LIKE_TRANSACTIONS = "SELECT id FROM transactions WHERE reference LIKE ? LIMIT 20"
+
+
+def reference():
+    return "".join(random.choices(string.ascii_uppercase + string.digits, k=10))
+
+
+def seed(conn, users, transactions, batch=50000):
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO users (full_name, email, phone_number, password) VALUES (?, ?, ?, 'x')",
+        [(f"{random.choice(NAMES)} {random.choice(NAMES)}{i}", f"user{i}@example.mg", f"03{i:08d}")
+         for i in range(users)]
+    )
+    conn.commit()
+    users_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, transactions, batch):
+        conn.executemany(
+            "INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) "
+            "VALUES (?, 'dépôt', 1000, ?, 'réussi', '2025-01-01 00:00:00')",
+            [(random.randint(1, users), reference()) for _ in range(min(batch, transactions - offset))]
+        )
+        conn.commit()
+    return users_seconds, time.perf_counter() - start
+
+
+def timed(fn, samples):
+    durations = []
+    for sample in samples:
+        start = time.perf_counter()
+        fn(sample)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return statistics.mean(durations) * 1000, durations[int(len(durations) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "search.db"))
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        migrations.migrate(conn)
+        users_seconds, transactions_seconds = seed(conn, args.users, args.transactions)
+        print(f"📦 {args.users} utilisateurs en {users_seconds:.1f}s, "
+              f"{args.transactions} transactions en {transactions_seconds:.1f}s "
+              f"({args.transactions / transactions_seconds:,.0f} lignes/s, index FTS5 compris)")
+
+        refs = [row[0] for row in conn.execute(
+            "SELECT reference FROM transactions ORDER BY random() LIMIT ?", (args.queries,))]
+        samples = {
+            "nom": [random.choice(NAMES)[1:5] + str(random.randint(1, 9)) for _ in range(args.queries)],
+            "téléphone": [f"{random.randint(0, args.users - 1):08d}"[2:7] for _ in range(args.queries)],
+            "email": [f"user{random.randint(0, args.users - 1)}@" for _ in range(args.queries)],
+            "référence": [ref[2:8] for ref in refs],
+        }
+
+        print(f"{'requête':<12} {'FTS5 moy':>10} {'FTS5 p95':>10} {'LIKE moy':>10} {'LIKE p95':>10}")
+        for name, texts in samples.items():
+            fts_mean, fts_p95 = timed(lambda text: search.search(conn, text), texts)
+            like_sql = LIKE_TRANSACTIONS if name == "référence" else LIKE_USERS
+            like_mean, like_p95 = timed(
+                lambda text: conn.execute(like_sql, (f"%{text}%",)).fetchall(), texts)
+            print(f"{name:<12} {fts_mean:>8.2f}ms {fts_p95:>8.2f}ms {like_mean:>8.2f}ms {like_p95:>8.2f}ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
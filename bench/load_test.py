@@ -0,0 +1,268 @@
+"""Test de charge des routes Flask sur une base SQLite générée.
+
+    python bench/load_test.py --users 200 --history 50 --clients 8 --duration 20
+    python bench/load_test.py --mode waitress --compare bench/results/<commit>.json
+
+Génère une base temporaire (N utilisateurs, M transactions et investissements
+chacun), puis des clients concurrents enchaînent login, dashboard, invest,
+depot et retrait, soit via le client de test Flask, soit contre un serveur
+waitress local. Les emails restent dans la file (aucun envoi). Le résultat
+(débit, p50/p95/p99 par route) est écrit en JSON dans bench/results/ pour
+comparer les commits entre eux.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+PASSWORD = "bench-password"
+
+# Répartition des actions d'un client après connexion
+MIX = (("dashboard", 50), ("depot", 15), ("invest", 15), ("retrait", 10), ("login", 10))
+
+
+# ---------------- DONNÉES ----------------
+def seed(path, users, history):
+    import sqlite3
+
+    from werkzeug.security import generate_password_hash
+
+    import migrations
+    import money
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn)
+    hashed = generate_password_hash(PASSWORD)
+    start = datetime.now() - timedelta(days=365)
+
+    conn.executemany(
+        "INSERT INTO users (id, full_name, email, phone_number, password) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"Bench {i}", f"bench{i}@example.mg", f"03{i:08d}", hashed) for i in range(1, users + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO wallets (user_id, balance) VALUES (?, ?)",
+        [(i, 10_000_000) for i in range(1, users + 1)]
+    )
+    for user_id in range(1, users + 1):
+        moments = sorted(start + timedelta(minutes=random.randint(0, 525600)) for _ in range(history))
+        conn.executemany(
+            "INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, random.choice(("dépôt", "retrait", "investissement")), random.randint(1000, 100000),
+              f"B{user_id:07d}{n:06d}", "réussi", m.strftime("%Y-%m-%d %H:%M:%S")) for n, m in enumerate(moments)]
+        )
+        amounts = [random.randint(1000, 100000) for _ in moments]
+        conn.executemany(
+            "INSERT INTO investments (user_id, amount, date, profit, status, reference) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, amount, m.strftime("%Y-%m-%d"), money.daily_profit(amount), "actif", f"I{user_id:07d}{n:06d}")
+             for n, (m, amount) in enumerate(zip(moments, amounts))]
+        )
+    conn.commit()
+    conn.close()
+
+
+# ---------------- CLIENTS ----------------
+class FlaskClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Les redirections sont comptées comme la réponse de la route, pas suivies
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def run_client(make_session, user_id, deadline, results, lock):
+    session = make_session()
+    credentials = {"login_input": f"bench{user_id}@example.mg", "password": PASSWORD}
+    actions, weights = zip(*MIX)
+    samples = []
+
+    def timed(route, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status = session.request(method, path, data)
+        except Exception:
+            status = 0
+        samples.append((route, time.perf_counter() - start, status))
+
+    timed("login", "POST", "/login", credentials)
+    while time.perf_counter() < deadline:
+        action = random.choices(actions, weights)[0]
+        if action == "dashboard":
+            timed("dashboard", "GET", "/dashboard")
+        elif action == "login":
+            session.request("GET", "/logout")
+            timed("login", "POST", "/login", credentials)
+        else:
+            timed(action, "POST", f"/{action}", {"amount": str(random.randint(100, 5000))})
+
+    with lock:
+        results.extend(samples)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))
+    return values[index]
+
+
+def summarize(samples, elapsed):
+    routes = {}
+    for route in sorted({s[0] for s in samples}) + ["total"]:
+        selected = samples if route == "total" else [s for s in samples if s[0] == route]
+        latencies = sorted(s[1] for s in selected)
+        errors = sum(1 for s in selected if s[2] == 0 or s[2] >= 500)
+        routes[route] = {
+            "count": len(selected),
+            "errors": errors,
+            "rps": round(len(selected) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        }
+    return routes
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "inconnu"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def print_report(routes, previous=None):
+    print(f"{'route':<10} {'n':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in routes.items():
+        line = (f"{route:<10} {r['count']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+                f"{r['p50_ms'] or 0:>9.2f} {r['p95_ms'] or 0:>9.2f} {r['p99_ms'] or 0:>9.2f}")
+        old = (previous or {}).get(route)
+        if old and old.get("p95_ms"):
+            line += f"   p95 {(r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--history", type=int, default=50, help="transactions et investissements par utilisateur")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="secondes de charge")
+    parser.add_argument("--mode", choices=("testclient", "waitress"), default="testclient")
+    parser.add_argument("--threads", type=int, default=8, help="threads waitress")
+    parser.add_argument("--output", help="fichier JSON (défaut: bench/results/<commit>-<mode>.json)")
+    parser.add_argument("--compare", help="résultat JSON précédent à comparer")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        seed(db_path, args.users, args.history)
+        print(f"📦 Base générée: {args.users} utilisateurs x {args.history} lignes "
+              f"({time.perf_counter() - start:.1f}s)")
+
+        # Configuration lue par app.py à l'import
+        os.environ.update({
+            "DB_PATH": db_path,
+            "MAIL_OUTBOX_WORKER": "off",
+            "MAIL_OUTBOX_BACKEND": "file",
+            "MAIL_OUTBOX_DIR": os.path.join(tmp, "mails"),
+        })
+        from app import app
+        app.config["SESSION_COOKIE_SECURE"] = False
+
+        server = None
+        if args.mode == "waitress":
+            from waitress.server import create_server
+            port = free_port()
+            server = create_server(app, host="127.0.0.1", port=port, threads=args.threads)
+            threading.Thread(target=server.run, daemon=True).start()
+            base_url = f"http://127.0.0.1:{port}"
+            make_session = lambda: HttpSession(base_url)
+        else:
+            make_session = lambda: FlaskClientSession(app)
+
+        samples, lock = [], threading.Lock()
+        users = random.sample(range(1, args.users + 1), min(args.clients, args.users))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [threading.Thread(target=run_client, args=(make_session, users[i % len(users)], deadline,
+                                                             samples, lock)) for i in range(args.clients)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        elapsed = time.perf_counter() - started
+        if server is not None:
+            server.close()
+
+    routes = summarize(samples, elapsed)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["routes"]
+    print_report(routes, previous)
+
+    commit = git_commit()
+    output = args.output or os.path.join(ROOT, "bench", "results", f"{commit}-{args.mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "config": vars(args),
+            "elapsed_seconds": round(elapsed, 3),
+            "routes": routes,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"💾 Résultats: {output}")
+
+
+if __name__ == "__main__":
+    main()
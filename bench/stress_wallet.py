@@ -0,0 +1,127 @@
+"""Test de charge: nombreux retraits parallèles sur un seul portefeuille.
+
+    python bench/stress_wallet.py [--threads 16] [--withdrawals 50] [--balance 5000] [--amount 7]
+    python bench/stress_wallet.py --database-url postgresql://localhost/anamboary_test
+
+Vérifie qu'aucun retrait ne rend le solde négatif et que le solde final
+correspond exactement aux mouvements écrits. Code de sortie 1 sinon.
+Sans --database-url, la base SQLite est temporaire; avec PostgreSQL, un
+utilisateur dédié est créé dans la base indiquée.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import migrations
+import storage
+import wallet
+from db import ConnectionPool
+
+
+def open_backend(url, tmp, size):
+    if storage.is_postgres(url):
+        from storage.postgres import PostgresStorage
+        backend = PostgresStorage(url, max_size=size)
+        backend.ensure_schema()
+        return backend
+    from storage.sqlite import SqliteStorage
+    pool = ConnectionPool(os.path.join(tmp, "stress.db"), max_size=size)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+    return SqliteStorage(pool)
+
+
+def ledger_totals(backend, user_id):
+    """(nombre, somme) des retraits écrits pour cet utilisateur"""
+    sql = "SELECT COUNT(*) AS n, COALESCE(SUM(amount), 0) AS total FROM transactions WHERE user_id={} AND type='retrait'"
+    if backend.name == "sqlite":
+        with backend.connection() as conn:
+            row = conn.execute(sql.format("?"), (user_id,)).fetchone()
+    else:
+        with backend.cursor() as cur:
+            cur.execute(sql.format("%s"), (user_id,))
+            row = cur.fetchone()
+    return row["n"], row["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--withdrawals", type=int, default=50, help="retraits par thread")
+    parser.add_argument("--balance", type=int, default=5000)
+    parser.add_argument("--amount", type=int, default=7)
+    parser.add_argument("--database-url", default="", help="postgresql://... (défaut: SQLite temporaire)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = open_backend(args.database_url, tmp, args.threads)
+        tag = uuid.uuid4().hex[:12]
+        user_id = backend.users.create("Stress", f"stress-{tag}@test", f"0{tag}", "x")
+        backend.wallets.credit(user_id, args.balance, "dépôt", f"S-{tag}-init")
+
+        outcomes = {"ok": 0, "insufficient": 0, "busy": 0, "error": 0}
+        lock_waits = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(args.threads)
+
+        def worker(n):
+            barrier.wait()
+            for i in range(args.withdrawals):
+                try:
+                    result = backend.wallets.debit(user_id, args.amount, "retrait", f"S-{tag}-{n:03d}-{i:05d}")
+                    key = "ok"
+                    with lock:
+                        lock_waits.append(result.lock_wait)
+                except wallet.InsufficientFunds:
+                    key = "insufficient"
+                except wallet.WalletBusy:
+                    key = "busy"
+                except Exception as e:
+                    print(f"❌ {e}")
+                    key = "error"
+                with lock:
+                    outcomes[key] += 1
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        balance = backend.wallets.balance(user_id)
+        ledger = ledger_totals(backend, user_id)
+        if backend.name == "sqlite":
+            backend.pool.close_all()
+
+    total = args.threads * args.withdrawals
+    print(f"[{backend.name}] {total} retraits en {elapsed:.2f}s ({total / elapsed:.0f}/s): {outcomes}")
+    if lock_waits:
+        waits = sorted(lock_waits)
+        print(f"attente verrou: p50={statistics.median(waits) * 1000:.2f}ms "
+              f"p99={waits[int(len(waits) * 0.99) - 1] * 1000:.2f}ms max={waits[-1] * 1000:.2f}ms")
+    print(f"solde final {balance}, {ledger[0]} retraits pour {ledger[1]} Ar")
+
+    expected = args.balance - outcomes["ok"] * args.amount
+    problems = []
+    if balance < 0:
+        problems.append("solde négatif")
+    if balance != expected or ledger[0] != outcomes["ok"]:
+        problems.append(f"solde attendu {expected}, mouvements attendus {outcomes['ok']}")
+    if outcomes["error"]:
+        problems.append(f"{outcomes['error']} erreurs inattendues")
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
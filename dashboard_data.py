@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import namedtuple
+
+import history
+import storage
+
+DashboardSnapshot = namedtuple(
+    "DashboardSnapshot",
+    "user_id full_name phone email balance transactions transactions_cursor "
+    "investments investments_cursor loaded_at"
+)
+
+# Le dashboard n'affiche que la première page; la suite passe par /api/history
+RECENT_TRANSACTIONS = 5
+RECENT_INVESTMENTS = history.PAGE_SIZE
+
+# Une seule requête: profil, solde et premières pages d'historique agrégées en JSON.
+# Une ligne de plus que la page est lue pour savoir s'il reste une suite.
+SNAPSHOT_SQL = f"""
+SELECT u.id, u.full_name, u.phone_number, u.email,
+       COALESCE(w.balance, 0) AS balance,
+       (SELECT json_group_array(json_object(
+                   'id', t.id, 'type', t.type, 'amount', t.amount, 'reference', t.reference,
+                   'status', t.status, 'timestamp', t.timestamp))
+        FROM (SELECT id, type, amount, reference, status, timestamp FROM transactions
+              WHERE user_id = u.id ORDER BY timestamp DESC, id DESC
+              LIMIT {RECENT_TRANSACTIONS + 1}) t) AS transactions,
+       (SELECT json_group_array(json_object(
+                   'id', i.id, 'amount', i.amount, 'date', i.date, 'profit', i.profit,
+                   'status', i.status, 'reference', i.reference))
+        FROM (SELECT id, amount, date, profit, status, reference FROM investments
+              WHERE user_id = u.id ORDER BY date DESC, id DESC
+              LIMIT {RECENT_INVESTMENTS + 1}) i) AS investments
+FROM users u
+LEFT JOIN wallets w ON w.user_id = u.id
+WHERE u.id = ?
+"""
+
+
+def build_snapshot(row, transactions, investments):
+    """Snapshot à partir de la ligne profil/solde et des premières pages (limite + 1 lignes)"""
+    return DashboardSnapshot(
+        user_id=row["id"],
+        full_name=row["full_name"],
+        phone=row["phone_number"],
+        email=row["email"],
+        balance=row["balance"],
+        transactions=transactions[:RECENT_TRANSACTIONS],
+        transactions_cursor=history.next_cursor("transactions", transactions, RECENT_TRANSACTIONS),
+        investments=investments[:RECENT_INVESTMENTS],
+        investments_cursor=history.next_cursor("investments", investments, RECENT_INVESTMENTS),
+        loaded_at=time.time(),
+    )
+
+
+def load_snapshot(conn, user_id):
+    """Lire le dashboard d'un utilisateur; None si le compte n'existe plus"""
+    row = conn.execute(SNAPSHOT_SQL, (user_id,)).fetchone()
+    if row is None:
+        return None
+    return build_snapshot(row, json.loads(row["transactions"]), json.loads(row["investments"]))
+
+
+class SnapshotCache:
+    """Cache par utilisateur à durée de vie courte.
+
+    Propre à chaque processus: une écriture faite par un autre worker gunicorn
+    n'est visible qu'après expiration du TTL.
+
+    Chaque invalidation change la génération de l'utilisateur: un snapshot lu
+    avant une écriture et rangé après son invalidation est abandonné.
+    """
+
+    def __init__(self, ttl=10.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        # user_id -> numéro de la dernière invalidation (compteur global, jamais réutilisé);
+        # vidé quand il grossit trop, `_epoch` change alors pour toutes les générations
+        self._generations = {}
+        self._counter = 0
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def get(self, user_id):
+        with self._lock:
+            snapshot = self._entries.get(user_id)
+            if snapshot is not None and time.time() - snapshot.loaded_at < self.ttl:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            return None
+
+    def generation(self, user_id):
+        """À lire avant de charger un snapshot, puis à passer à put()"""
+        with self._lock:
+            return self._epoch, self._generations.get(user_id, 0)
+
+    def put(self, snapshot, generation):
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(snapshot.user_id, 0)):
+                # Invalidé pendant la lecture: peut-être antérieur à l'écriture
+                self.dropped += 1
+                return
+            if len(self._entries) >= self.max_entries:
+                self._evict_expired()
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[snapshot.user_id] = snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if len(self._generations) >= self.max_entries:
+                self._generations.clear()
+                self._epoch += 1
+            self._counter += 1
+            self._generations[user_id] = self._counter
+
+    def _evict_expired(self):
+        limit = time.time() - self.ttl
+        for user_id in [k for k, v in self._entries.items() if v.loaded_at < limit]:
+            del self._entries[user_id]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "dropped": self.dropped, "ttl": self.ttl}
+
+
+cache = SnapshotCache()
+
+
+def init_app(app):
+    cache.ttl = app.config.get("DASHBOARD_CACHE_TTL", 10.0)
+
+
+def get_snapshot(user_id):
+    """Snapshot depuis le cache, sinon depuis la base"""
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        generation = cache.generation(user_id)
+        snapshot = storage.backend.ledger.snapshot(user_id)
+        if snapshot is not None:
+            cache.put(snapshot, generation)
+    return snapshot
+
+
+def invalidate(user_id):
+    cache.invalidate(user_id)
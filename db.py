@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g
+
+# Pragmas appliqués une seule fois, à l'ouverture de chaque connexion
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+    ("mmap_size", 268435456),
+    ("cache_size", -16000),
+)
+
+
+class PoolTimeout(Exception):
+    """Aucune connexion libre dans le délai imparti"""
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite réutilisées entre les requêtes.
+
+    Les connexions libres sont rendues en LIFO pour que le thread suivant
+    récupère celle dont le cache de pages est le plus chaud.
+    """
+
+    def __init__(self, path, max_size=8, timeout=10.0, pragmas=DEFAULT_PRAGMAS, factory=sqlite3.Connection):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.factory = factory
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self):
+        with self._cond:
+            if not self._idle and self._open >= self.max_size:
+                self._waits += 1
+                start = time.perf_counter()
+                ready = self._cond.wait_for(
+                    lambda: self._idle or self._open < self.max_size, self.timeout
+                )
+                self._wait_time += time.perf_counter() - start
+                if not ready:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"Pool SQLite saturé ({self.max_size} connexions)")
+
+            if self._idle:
+                self._hits += 1
+                self._in_use += 1
+                return self._idle.pop()
+
+            # Réserver la place avant d'ouvrir, hors du verrou
+            self._misses += 1
+            self._open += 1
+            self._in_use += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+        if discard:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        """Connexion empruntée hors requête (CLI, threads de fond)"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "wait_seconds": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+            }
+
+
+pool = None
+
+
+def init_app(app, path, factory=sqlite3.Connection):
+    """Créer le pool et le lier au contexte d'application Flask"""
+    global pool
+    pool = ConnectionPool(
+        path,
+        max_size=app.config.get("SQLITE_POOL_SIZE", 8),
+        timeout=app.config.get("SQLITE_POOL_TIMEOUT", 10.0),
+        factory=factory,
+    )
+    app.teardown_appcontext(release_db)
+    return pool
+
+
+def get_db():
+    """Connexion du contexte courant, empruntée au pool au premier appel"""
+    if "db" not in g:
+        g.db = pool.acquire()
+    return g.db
+
+
+def release_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        pool.release(conn)
@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates', 'emails')
+
+# Environnement dédié: compilé une fois, jamais rechargé depuis le disque
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+# La feuille de style commune est lue une seule fois et injectée telle quelle
+with open(os.path.join(TEMPLATES_DIR, 'shared.css'), encoding='utf-8') as f:
+    env.globals['shared_css'] = Markup(f.read())
+
+TEMPLATES = {name: env.get_template(f"{name}.html") for name in ("welcome", "transaction", "investment")}
+
+TRANSACTION_KINDS = {
+    "dépôt": ("💰 Dépôt réussi - Anamboary Invest", "déposé", "#28a745", "💰"),
+    "retrait": ("💸 Retrait réussi - Anamboary Invest", "retiré", "#dc3545", "💸"),
+}
+DEFAULT_KIND = ("📈 Investissement réussi - Anamboary Invest", "investi", "#ffc107", "📈")
+
+
+def render_welcome(email, full_name):
+    """Email de bienvenue: (sujet, html)"""
+    html = TEMPLATES["welcome"].render(email=email, full_name=full_name)
+    return "🎉 Bienvenue sur Anamboary Invest!", html
+
+
+def render_transaction(email, full_name, transaction_type, amount, reference=None, date=None):
+    """Email de confirmation de dépôt/retrait: (sujet, html)"""
+    subject, action, color, emoji = TRANSACTION_KINDS.get(transaction_type, DEFAULT_KIND)
+    html = TEMPLATES["transaction"].render(
+        subject=subject, action=action, color=color, emoji=emoji,
+        full_name=full_name, transaction_type=transaction_type, amount=amount, reference=reference,
+        date=(date or datetime.now()).strftime("%d/%m/%Y à %H:%M")
+    )
+    return subject, html
+
+
+def render_investment(email, full_name, amount, daily_profit):
+    """Email de confirmation d'investissement: (sujet, html)"""
+    html = TEMPLATES["investment"].render(
+        full_name=full_name, amount=amount, daily_profit=daily_profit, monthly_profit=daily_profit * 30
+    )
+    return "📈 Investissement placé avec succès - Anamboary Invest", html
+
+
+RENDERERS = {
+    "welcome": render_welcome,
+    "transaction": render_transaction,
+    "investment": render_investment,
+}
+
+
+def render_batch(items):
+    """Rendre plusieurs emails d'un coup.
+
+    items: itérable de (type, kwargs), kwargs contenant au moins `email`.
+    Retourne une liste de (destinataire, sujet, html), prête pour outbox.enqueue_many.
+    """
+    now = datetime.now()
+    rendered = []
+    for kind, kwargs in items:
+        if kind == "transaction":
+            kwargs = {"date": now, **kwargs}
+        subject, html = RENDERERS[kind](**kwargs)
+        rendered.append((kwargs["email"], subject, html))
+    return rendered
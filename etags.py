@@ -0,0 +1,57 @@
+import threading
+
+from flask import request
+
+import storage
+
+# Version du portefeuille (wallets.version, incrémentée à chaque mouvement):
+# ETag des réponses JSON du solde et de l'historique. Chaque requête
+# conditionnelle relit la version en base (recherche par clé unique, sans
+# verrou d'écriture): un 304 n'est jamais rendu pour une version périmée,
+# quel que soit le worker qui a fait le mouvement. Le gain est le corps de
+# la réponse et la requête d'historique, pas la lecture de la version.
+CACHE_CONTROL = "private, no-cache"
+
+_stats_lock = threading.Lock()
+_stats = {"lookups": 0, "not_modified": 0}
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def current(user_id):
+    _record(lookups=1)
+    return storage.backend.wallets.version(user_id)
+
+
+def state(user_id):
+    """(solde, version) lus ensemble: un 200 n'associe jamais un ancien solde à un nouvel ETag"""
+    _record(lookups=1)
+    return storage.backend.wallets.state(user_id)
+
+
+def etag(kind, user_id, version):
+    return f"{kind}-{user_id}-{version}"
+
+
+def not_modified(tag):
+    """Vrai si le client a déjà la représentation `tag`"""
+    if request.if_none_match.contains_weak(tag):
+        _record(not_modified=1)
+        return True
+    return False
+
+
+def tagged(response, tag):
+    """ETag et revalidation obligatoire: le navigateur ne sert jamais un solde périmé"""
+    response.set_etag(tag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
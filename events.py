@@ -0,0 +1,320 @@
+"""Flux Server-Sent Events des mises à jour de portefeuille.
+
+Un hub asyncio tourne dans son propre thread (une boucle d'événements pour
+des milliers de connexions inactives, pas un thread par client) et sert
+GET /events sur EVENTS_HOST:EVENTS_PORT, derrière le proxy qui expose
+EVENTS_URL. Le navigateur s'authentifie avec un jeton signé de courte durée
+obtenu via /api/events/token (EventSource ne peut pas envoyer d'en-têtes).
+Le jeton porte aussi la session: à chaque (re)connexion, le hub vérifie
+qu'elle est toujours ouverte, et la déconnexion ou la révocation ferment les
+flux déjà ouverts (événement CLOSE).
+
+Les routes qui écrivent dans un portefeuille publient dans le hub: appel
+direct si le hub tourne dans ce processus, sinon datagramme UDP local vers
+le même port. Avec plusieurs workers gunicorn, le premier qui prend le port
+héberge le hub et reçoit les publications des autres; `flask events-server`
+le fait tourner dans un processus dédié.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs, urlsplit
+
+import click
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+PATH = "/events"
+TOKEN_MAX_AGE = 60
+HEARTBEAT = 15.0
+QUEUE_SIZE = 16
+WRITE_TIMEOUT = 10.0
+READ_TIMEOUT = 10.0
+MAX_HEADER_SIZE = 8192
+MAX_CONNECTIONS = 10000
+MAX_PER_USER = 5
+RETRY_MS = 5000
+BIND_RETRY_INTERVAL = 30.0
+
+# Fermer les flux de l'utilisateur: ceux d'une session (données {"session": clé},
+# déconnexion) ou tous (révocation)
+CLOSE = "close"
+# File d'un client lent saturée: ses événements sont remplacés par un seul
+# "resync", le client relit alors son état via les API JSON
+RESYNC = b"event: resync\ndata: {}\n\n"
+HEARTBEAT_MESSAGE = b": ping\n\n"
+
+
+def make_serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt="events")
+
+
+def encode(event_id, event, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+def _status(writer, status, reason):
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+
+
+class _Publications(asyncio.DatagramProtocol):
+    def __init__(self, hub):
+        self.hub = hub
+
+    def datagram_received(self, data, addr):
+        try:
+            user_id, event, payload = json.loads(data)
+        except (ValueError, TypeError):
+            return
+        self.hub._dispatch(user_id, event, payload)
+
+
+class EventHub:
+    def __init__(self, secret_key, host="127.0.0.1", port=8001, allow_origin=None,
+                 heartbeat=HEARTBEAT, queue_size=QUEUE_SIZE, max_connections=MAX_CONNECTIONS, session_check=None):
+        self.serializer = make_serializer(secret_key)
+        # session_check(user_id, clé de session) -> bool, appelée hors de la boucle
+        self.session_check = session_check
+        self.host = host
+        self.port = port
+        self.allow_origin = allow_origin
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._last_attempt = 0.0
+        self._start_lock = threading.Lock()
+        # user_id -> {file du flux: clé de sa session}
+        self._subscribers = defaultdict(dict)
+        self._next_id = 0
+        self._udp = None
+        self._stats = {"connections": 0, "published": 0, "delivered": 0, "resyncs": 0,
+                       "slow_clients": 0, "rejected": 0, "remote_published": 0}
+
+    # ---------------- CÔTÉ FLASK (threads des requêtes) ----------------
+    def token(self, user_id, session_key):
+        return self.serializer.dumps([user_id, session_key])
+
+    def owner(self):
+        """Vrai si le hub tourne dans ce processus"""
+        return (self._loop is not None and self._thread is not None and self._thread.is_alive()
+                and self._pid == os.getpid())
+
+    def ensure_started(self):
+        """Démarrer le hub dans ce processus si le port est libre (réessayé toutes les 30 s)"""
+        if self.owner() or time.monotonic() - self._last_attempt < BIND_RETRY_INTERVAL:
+            return
+        with self._start_lock:
+            if self.owner() or time.monotonic() - self._last_attempt < BIND_RETRY_INTERVAL:
+                return
+            self._last_attempt = time.monotonic()
+            ready = threading.Event()
+            errors = []
+            self._thread = threading.Thread(target=self._run, args=(ready, errors), name="events-hub", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+            ready.wait(5.0)
+            if errors:
+                self._thread = None
+
+    def publish(self, user_id, event, data=None):
+        """Publier un événement pour les flux ouverts de l'utilisateur (jamais bloquant)"""
+        data = data or {}
+        if self.owner():
+            self._loop.call_soon_threadsafe(self._dispatch, user_id, event, data)
+            return
+        # Hub dans un autre processus: datagramme local, perdu si personne n'écoute
+        try:
+            if self._udp is None:
+                self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self._udp.setblocking(False)
+            self._udp.sendto(json.dumps([user_id, event, data]).encode(), ("127.0.0.1", self.port))
+            self._stats["remote_published"] += 1
+        except OSError:
+            pass
+
+    def stats(self):
+        return {**self._stats, "owner": int(self.owner())}
+
+    # ---------------- BOUCLE ASYNCIO ----------------
+    def _run(self, ready, errors):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = None
+        try:
+            server = loop.run_until_complete(asyncio.start_server(
+                self._handle, self.host, self.port, limit=MAX_HEADER_SIZE, backlog=1024))
+            # Publications des autres processus: uniquement en local
+            loop.run_until_complete(loop.create_datagram_endpoint(
+                lambda: _Publications(self), local_addr=("127.0.0.1", self.port)))
+        except OSError as e:
+            # Port pris (un autre worker héberge le hub): publier vers lui en UDP
+            if server is not None:
+                server.close()
+            errors.append(e)
+            ready.set()
+            loop.close()
+            return
+        self._loop = loop
+        print(f"📡 Flux d'événements: http://{self.host}:{self.port}{PATH}")
+        ready.set()
+        try:
+            loop.run_until_complete(server.serve_forever())
+        finally:
+            loop.close()
+
+    def run_forever(self):
+        """Hub au premier plan (processus dédié)"""
+        ready, errors = threading.Event(), []
+        self._pid = os.getpid()
+        self._thread = threading.current_thread()
+        self._run(ready, errors)
+        if errors:
+            raise errors[0]
+
+    def _dispatch(self, user_id, event, data):
+        subscribers = self._subscribers.get(user_id)
+        self._stats["published"] += 1
+        if not subscribers:
+            return
+        if event == CLOSE:
+            for queue, session_key in subscribers.items():
+                if data.get("session") in (None, session_key):
+                    self._offer(queue, CLOSE)
+            return
+        self._next_id += 1
+        message = encode(self._next_id, event, data)
+        for queue in subscribers:
+            self._offer(queue, message)
+
+    def _offer(self, queue, message):
+        try:
+            queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        # Client trop lent: ses événements en attente sont remplacés par un resync
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(CLOSE if message is CLOSE else RESYNC)
+        self._stats["resyncs"] += 1
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+            method, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        user_id = session_key = None
+        if method == "GET" and url.path == PATH:
+            try:
+                user_id, session_key = self.serializer.loads(parse_qs(url.query).get("token", [""])[0],
+                                                             max_age=TOKEN_MAX_AGE)
+            except (BadSignature, TypeError, ValueError):
+                pass
+        # Session fermée depuis l'émission du jeton (déconnexion, révocation): refus
+        if user_id is not None and self.session_check is not None:
+            try:
+                alive = await asyncio.get_running_loop().run_in_executor(
+                    None, self.session_check, user_id, session_key)
+            except Exception:
+                alive = False
+            if not alive:
+                user_id = None
+        if user_id is None:
+            _status(writer, 404 if url.path != PATH else 401, "Not Found" if url.path != PATH else "Unauthorized")
+        elif self._stats["connections"] >= self.max_connections:
+            _status(writer, 503, "Service Unavailable")
+        elif len(self._subscribers[user_id]) >= MAX_PER_USER:
+            _status(writer, 429, "Too Many Requests")
+        else:
+            await self._stream(user_id, session_key, writer)
+            return
+        self._stats["rejected"] += 1
+        await self._close(writer)
+
+    async def _stream(self, user_id, session_key, writer):
+        headers = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream; charset=utf-8",
+                   "Cache-Control: no-cache", "Connection: keep-alive", "X-Accel-Buffering: no"]
+        if self.allow_origin:
+            headers += [f"Access-Control-Allow-Origin: {self.allow_origin}", "Vary: Origin"]
+        writer.write(("\r\n".join(headers) + f"\r\n\r\nretry: {RETRY_MS}\n\n").encode())
+
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[user_id][queue] = session_key
+        self._stats["connections"] += 1
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    message = HEARTBEAT_MESSAGE
+                if message is CLOSE:
+                    break
+                writer.write(message)
+                # Tampon d'envoi plein trop longtemps: le client ne lit plus
+                await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+                if message is not HEARTBEAT_MESSAGE:
+                    self._stats["delivered"] += 1
+        except asyncio.TimeoutError:
+            self._stats["slow_clients"] += 1
+        except ConnectionError:
+            pass
+        finally:
+            self._stats["connections"] -= 1
+            self._subscribers[user_id].pop(queue, None)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+            await self._close(writer)
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+hub = None
+
+
+def publish(user_id, event, data=None):
+    if hub is not None:
+        hub.publish(user_id, event, data)
+
+
+def init_app(app, session_check=None):
+    """Hub configuré si EVENTS_URL l'est; démarré à la première requête si EVENTS_SERVER=thread"""
+    global hub
+    if not app.config.get("EVENTS_URL"):
+        return None
+    hub = EventHub(
+        app.secret_key,
+        host=app.config.get("EVENTS_HOST", "127.0.0.1"),
+        port=app.config.get("EVENTS_PORT", 8001),
+        allow_origin=app.config.get("EVENTS_ALLOW_ORIGIN"),
+        heartbeat=app.config.get("EVENTS_HEARTBEAT", HEARTBEAT),
+        session_check=session_check,
+    )
+
+    @app.before_request
+    def start_event_hub():
+        if app.config.get("EVENTS_SERVER", "thread") == "thread":
+            hub.ensure_started()
+
+    @app.cli.command("events-server")
+    def events_server():
+        """Servir le flux d'événements dans un processus dédié"""
+        hub.run_forever()
+
+    return hub
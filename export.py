@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import click
+
+# Export en flux: une seule requête parcourue par lots de BATCH_SIZE lignes,
+# chaque lot écrit avant de lire le suivant. La mémoire ne dépend pas de la
+# taille de la table, et la requête lit un instantané cohérent de bout en bout.
+BATCH_SIZE = 500
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# table -> (colonne de date, colonnes exportées)
+# Index utilisés: (date) sans filtre utilisateur, (user_id, date) sinon.
+TABLES = {
+    "transactions": ("timestamp", ("id", "user_id", "type", "amount", "reference", "status", "timestamp")),
+    "investments": ("date", ("id", "user_id", "amount", "date", "profit", "status", "reference", "created_at")),
+    "user_logins": ("login_time", ("id", "user_id", "login_time", "ip_address")),
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_investments_date ON investments(date)",
+    "CREATE INDEX IF NOT EXISTS idx_user_logins_user_time ON user_logins(user_id, login_time)",
+]
+
+
+def parse_filters(table, since=None, until=None, user_id=None):
+    """Valider les filtres; ValueError si la table ou une valeur est invalide.
+
+    since et until sont des jours 'YYYY-MM-DD' inclus; until devient la borne
+    exclusive du lendemain, comparable aux dates comme aux horodatages texte.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Table inconnue: {table}")
+    filters = {}
+    if since:
+        filters["since"] = date.fromisoformat(since).isoformat()
+    if until:
+        filters["until"] = (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+    if user_id not in (None, ""):
+        filters["user_id"] = int(user_id)
+    return filters
+
+
+def export_sql(table, filters, param="?"):
+    """(sql, params) triés par (date, id): l'ordre de l'index, sans tri temporaire"""
+    date_column, columns = TABLES[table]
+    conditions, params = [], []
+    if "user_id" in filters:
+        conditions.append(f"user_id = {param}")
+        params.append(filters["user_id"])
+    if "since" in filters:
+        conditions.append(f"{date_column} >= {param}")
+        params.append(filters["since"])
+    if "until" in filters:
+        conditions.append(f"{date_column} < {param}")
+        params.append(filters["until"])
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY {date_column}, id", params
+
+
+def columns(table):
+    return TABLES[table][1]
+
+
+def fetch_rows(conn, table, filters, batch_size=BATCH_SIZE):
+    """Lots de lignes SQLite; le curseur est fermé même si le client abandonne"""
+    sql, params = export_sql(table, filters)
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+    finally:
+        cursor.close()
+
+
+def encode(batches, table, fmt):
+    """Lots de tuples -> morceaux de texte CSV (avec en-tête) ou JSONL"""
+    names = columns(table)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    elif fmt == "jsonl":
+        for rows in batches:
+            yield "".join(json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n" for row in rows)
+    else:
+        raise ValueError(f"Format inconnu: {fmt}")
+
+
+def filename(table, fmt, filters):
+    parts = [table]
+    if "user_id" in filters:
+        parts.append(f"user{filters['user_id']}")
+    if "since" in filters:
+        parts.append(filters["since"])
+    return f"{'-'.join(parts)}.{fmt}"
+
+
+def init_app(app, backend, archive=None):
+    @app.cli.command("export")
+    @click.argument("table", type=click.Choice(sorted(TABLES)))
+    @click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="csv", show_default=True)
+    @click.option("--since", help="premier jour inclus (YYYY-MM-DD)")
+    @click.option("--until", help="dernier jour inclus (YYYY-MM-DD)")
+    @click.option("--user-id", type=int)
+    @click.option("--archived", is_flag=True, help="lire la base d'archives au lieu des tables vivantes")
+    @click.option("--output", type=click.File("w", encoding="utf-8"), default="-",
+                  help="fichier (défaut: sortie standard)")
+    def export_command(table, fmt, since, until, user_id, archived, output):
+        """Exporter une table en CSV ou JSONL, en flux"""
+        try:
+            filters = parse_filters(table, since, until, user_id)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        source = backend
+        if archived:
+            if archive is None or not archive.archives(table):
+                raise click.BadParameter(f"{table} n'est pas archivée")
+            source = archive
+        for chunk in encode(source.export(table, filters), table, fmt):
+            output.write(chunk)
+        output.flush()
+        if output.name != "<stdout>":
+            click.echo(f"📤 {table} exporté vers {output.name}", err=True)
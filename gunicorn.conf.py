@@ -0,0 +1,12 @@
+# Lu par gunicorn depuis le dossier de lancement (Procfile, render.yaml)
+import hashing
+
+# Avec --preload, l'application est importée dans le maître: son pool de
+# hachage n'y est pas démarré (les workers ne pourraient pas s'en servir)
+hashing.defer_start()
+
+
+def post_fork(server, worker):
+    # Worker encore sans thread: il crée son pool de hachage ici
+    # (sans --preload, c'est fait à l'import de l'application)
+    hashing.hasher.after_fork()
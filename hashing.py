@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+
+# Hachage des mots de passe dans un pool de processus borné: les dizaines de
+# ms de PBKDF2 ne prennent plus le CPU des threads qui servent les requêtes.
+# Au-delà de max_pending calculs en attente ou en cours, refus immédiat
+# (HashingBusy) plutôt qu'une file qui fait exploser la latence.
+DEFAULT_METHOD = "pbkdf2:sha256:600000"
+DEFAULT_MAX_PENDING = 32
+DEFAULT_TIMEOUT = 10.0
+
+
+class HashingBusy(Exception):
+    """Pool de hachage saturé (ou trop lent): réessayer plus tard"""
+
+
+def needs_rehash(password_hash, method):
+    """Vrai si le hash n'a pas été produit avec `method` (forme complète, ex. pbkdf2:sha256:600000)"""
+    return password_hash.split("$", 1)[0] != method
+
+
+def _ready():
+    return True
+
+
+# Exécutées dans les processus du pool: retournent aussi leur durée de calcul
+def _hash(password, method):
+    start = time.perf_counter()
+    return generate_password_hash(password, method), time.perf_counter() - start
+
+
+def _verify(password_hash, password, method):
+    """(valide, nouveau hash si le coût a changé, durée)"""
+    start = time.perf_counter()
+    valid = check_password_hash(password_hash, password)
+    rehashed = None
+    if valid and needs_rehash(password_hash, method):
+        rehashed = generate_password_hash(password, method)
+    return valid, rehashed, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """workers=0: calcul dans le thread appelant (développement, mesures comparatives).
+
+    Le pool est créé par start() tant que le processus n'a qu'un thread (import
+    de l'application, post_fork de gunicorn): forker depuis un processus où
+    tournent déjà d'autres threads peut laisser un verrou pris dans les enfants.
+    Sans pool utilisable (fork non suivi de start(), processus tué), le calcul
+    se fait dans le thread appelant plutôt que de forker à nouveau.
+    """
+
+    def __init__(self, workers=2, max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT, method=DEFAULT_METHOD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.inline = 0
+
+    def start(self):
+        """Créer le pool et démarrer ses processus maintenant (aucun autre thread ne doit tourner)"""
+        if not self.workers:
+            return
+        # fork: les processus n'importent pas l'application (spawn réexécuterait app.py)
+        executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+        # Avec fork, tous les processus du pool partent à la première tâche
+        executor.submit(_ready).result()
+        with self._lock:
+            self._executor = executor
+            self._pid = os.getpid()
+
+    def after_fork(self):
+        """Dans un worker gunicorn forké d'un maître qui a importé l'application (--preload)"""
+        if self.workers and self._get_executor() is None:
+            self.start()
+
+    def _get_executor(self):
+        """Pool de ce processus, ou None (jamais créé ici à la demande)"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return self._executor
+            return None
+
+    def _inline(self, fn, args):
+        with self._lock:
+            self.inline += 1
+        return fn(*args)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _call(self, operation, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy("Trop de connexions simultanées, veuillez réessayer")
+        start = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+        release = True
+        try:
+            executor = self._get_executor() if self.workers else None
+            if executor is None:
+                result = self._inline(fn, args)
+            else:
+                try:
+                    future = executor.submit(fn, *args)
+                    result = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    with self._lock:
+                        self.timeouts += 1
+                    # Calcul déjà en cours: il garde sa place jusqu'à la fin, sinon
+                    # la file du pool grossirait sans limite derrière max_pending
+                    if not future.cancel():
+                        release = False
+                        future.add_done_callback(lambda _: self._release())
+                    raise HashingBusy("Vérification du mot de passe trop lente, veuillez réessayer")
+                except BrokenProcessPool:
+                    # Processus tué (OOM...): pas de nouveau fork depuis ce processus multithreadé
+                    with self._lock:
+                        self._executor = None
+                    result = self._inline(fn, args)
+        finally:
+            if release:
+                self._release()
+        elapsed = time.perf_counter() - start
+        metrics.HASH_LATENCY.observe(result[-1], operation)
+        metrics.HASH_QUEUE_WAIT.observe(max(elapsed - result[-1], 0.0), operation)
+        return result
+
+    def hash(self, password):
+        password_hash, _ = self._call("hash", _hash, password, self.method)
+        with self._lock:
+            self.hashed += 1
+        return password_hash
+
+    def verify(self, password_hash, password):
+        """(valide, nouveau hash à enregistrer ou None): le rehachage au coût configuré
+        se fait dans le même aller-retour, seulement si le mot de passe est bon"""
+        valid, rehashed, _ = self._call("verify", _verify, password_hash, password, self.method)
+        with self._lock:
+            self.verified += 1
+            self.rehashed += rehashed is not None
+        return valid, rehashed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "hashed": self.hashed,
+                "verified": self.verified,
+                "rehashed": self.rehashed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "inline": self.inline,
+            }
+
+
+hasher = PasswordHasher(workers=0)
+# Processus (maître gunicorn) où l'application est importée sans y démarrer le pool
+_defer_pid = None
+
+
+def defer_start():
+    """À appeler dans le maître gunicorn: le pool est créé dans chaque worker (post_fork)"""
+    global _defer_pid
+    _defer_pid = os.getpid()
+
+
+def init_app(app):
+    global hasher
+    hasher = PasswordHasher(
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        max_pending=app.config.get("PASSWORD_HASH_MAX_PENDING", DEFAULT_MAX_PENDING),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT", DEFAULT_TIMEOUT),
+        method=app.config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+    )
+    if _defer_pid != os.getpid():
+        hasher.start()
+    return hasher
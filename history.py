@@ -0,0 +1,69 @@
+import base64
+import json
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Pagination par curseur (keyset): (colonne de tri, id) du dernier élément vu.
+# Les index (user_id, timestamp) et (user_id, date) contiennent le rowid,
+# l'ordre "tri DESC, id DESC" se lit donc directement dans l'index.
+KINDS = {
+    "transactions": ("timestamp", "SELECT id, type, amount, reference, status, timestamp FROM transactions"),
+    "investments": ("date", "SELECT id, amount, date, profit, status, reference FROM investments"),
+}
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Retourne (valeur de tri, id); ValueError si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Curseur invalide")
+    # Un id hors des entiers 64 bits ferait échouer la requête (OverflowError): 400, pas 500
+    if not isinstance(sort_value, str) or type(row_id) is not int or not 0 < row_id < 2 ** 63:
+        raise ValueError("Curseur invalide")
+    return sort_value, row_id
+
+
+def page_sql(kind, after=False, param="?"):
+    """param: marqueur de paramètre du pilote ("?" pour sqlite3, "%s" pour psycopg2)"""
+    sort_column, select = KINDS[kind]
+    where = f"WHERE user_id={param}"
+    if after:
+        where += f" AND ({sort_column}, id) < ({param}, {param})"
+    return f"{select} {where} ORDER BY {sort_column} DESC, id DESC LIMIT {param}"
+
+
+def next_cursor(kind, rows, limit):
+    """Curseur de la page suivante, à partir de limit+1 lignes lues"""
+    if len(rows) <= limit:
+        return None
+    sort_column = KINDS[kind][0]
+    last = rows[limit - 1]
+    return encode_cursor(last[sort_column], last["id"])
+
+
+def page_params(user_id, cursor, limit):
+    """Paramètres de page_sql(after=bool(cursor)); ValueError si le curseur est invalide"""
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        return (user_id, sort_value, row_id, limit + 1)
+    return (user_id, limit + 1)
+
+
+def clamp_limit(limit):
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def fetch_page(conn, kind, user_id, cursor=None, limit=PAGE_SIZE):
+    """Une page d'historique: (liste de dicts, curseur suivant ou None)"""
+    limit = clamp_limit(limit)
+    rows = conn.execute(page_sql(kind, after=bool(cursor)), page_params(user_id, cursor, limit)).fetchall()
+    rows = [dict(row) for row in rows]
+    return rows[:limit], next_cursor(kind, rows, limit)
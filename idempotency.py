@@ -0,0 +1,250 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, flash, g, jsonify, redirect, request, session
+
+from db import get_db
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status_code INTEGER,
+    headers TEXT,
+    body BLOB,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (user_id, key)
+) WITHOUT ROWID
+"""
+
+HEADER = "Idempotency-Key"
+FORM_FIELD = "idempotency_key"
+MAX_KEY_LENGTH = 128
+
+# En-têtes rejoués avec la réponse d'origine
+REPLAYED_HEADERS = ("Content-Type", "Location")
+
+# Une clé réservée sans réponse depuis ce délai (worker tué) peut être reprise
+PENDING_TIMEOUT = 60.0
+PURGE_INTERVAL = 300.0
+PURGE_BATCH = 500
+
+StoredResponse = namedtuple("StoredResponse", "fingerprint status_code headers body expires_at")
+
+
+def fingerprint():
+    """Empreinte de la requête: même clé + autre contenu = erreur du client"""
+    fields = sorted((k, v) for k, v in request.form.items(multi=True) if k != FORM_FIELD)
+    raw = json.dumps([request.method, request.path, fields], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Réponses des POST d'argent, rejouées pour une clé déjà vue.
+
+    La table SQLite est partagée entre les workers; un LRU par processus,
+    devant elle, rend les rejeux sans requête. Seules les réponses terminées
+    entrent dans le LRU: une clé en cours n'existe que dans la table.
+    """
+
+    def __init__(self, ttl=86400.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.conflicts = 0
+        self.in_progress = 0
+
+    def _remember(self, cache_key, stored):
+        with self._lock:
+            self._entries[cache_key] = stored
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _cached(self, cache_key, now):
+        with self._lock:
+            stored = self._entries.get(cache_key)
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            self.memory_hits += 1
+            return stored
+
+    def reserve(self, conn, user_id, key, request_fingerprint):
+        """Réserver la clé pour cette requête.
+
+        Retourne (état, réponse enregistrée): "new" (à exécuter), "replay",
+        "conflict" (clé réutilisée pour un autre contenu) ou "pending".
+        """
+        now = time.time()
+        cached = self._cached((user_id, key), now)
+        if cached is not None:
+            return self._check(cached, request_fingerprint)
+
+        # Une seule instruction: la clé est prise si elle est nouvelle, expirée ou abandonnée
+        cursor = conn.execute("""
+            INSERT INTO idempotency_keys (user_id, key, fingerprint, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, key) DO UPDATE SET
+                fingerprint = excluded.fingerprint, status_code = NULL, headers = NULL, body = NULL,
+                created_at = excluded.created_at, expires_at = excluded.expires_at
+            WHERE idempotency_keys.expires_at <= excluded.created_at
+               OR (idempotency_keys.status_code IS NULL AND idempotency_keys.created_at <= ?)
+        """, (user_id, key, request_fingerprint, now, now + self.ttl, now - PENDING_TIMEOUT))
+        if cursor.rowcount == 1:
+            self._purge_expired(conn, now)
+            conn.commit()
+            with self._lock:
+                self.misses += 1
+            return "new", None
+
+        conn.commit()
+        row = conn.execute(
+            "SELECT fingerprint, status_code, headers, body, expires_at FROM idempotency_keys "
+            "WHERE user_id=? AND key=?", (user_id, key)
+        ).fetchone()
+        if row is None or row["status_code"] is None:
+            with self._lock:
+                self.in_progress += 1
+            return "pending", None
+        stored = StoredResponse(row["fingerprint"], row["status_code"], json.loads(row["headers"]),
+                                bytes(row["body"]), row["expires_at"])
+        with self._lock:
+            self.db_hits += 1
+        self._remember((user_id, key), stored)
+        return self._check(stored, request_fingerprint)
+
+    def _check(self, stored, request_fingerprint):
+        if stored.fingerprint != request_fingerprint:
+            with self._lock:
+                self.conflicts += 1
+            return "conflict", stored
+        return "replay", stored
+
+    def complete(self, conn, user_id, key, response):
+        """Enregistrer la réponse de la requête qui détenait la clé"""
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        body = response.get_data()
+        row = conn.execute(
+            "UPDATE idempotency_keys SET status_code=?, headers=?, body=? WHERE user_id=? AND key=? "
+            "RETURNING fingerprint, expires_at",
+            (response.status_code, json.dumps(headers), body, user_id, key)
+        ).fetchone()
+        conn.commit()
+        if row is not None:
+            self._remember((user_id, key), StoredResponse(
+                row["fingerprint"], response.status_code, headers, body, row["expires_at"]))
+            with self._lock:
+                self.stored += 1
+
+    def release(self, conn, user_id, key):
+        """Libérer une clé dont la requête a échoué côté serveur: le client pourra réessayer"""
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("DELETE FROM idempotency_keys WHERE user_id=? AND key=? AND status_code IS NULL",
+                     (user_id, key))
+        conn.commit()
+
+    def _purge_expired(self, conn, now):
+        # Par petits lots, au plus toutes les PURGE_INTERVAL secondes par processus
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        conn.execute("""
+            DELETE FROM idempotency_keys WHERE (user_id, key) IN (
+                SELECT user_id, key FROM idempotency_keys WHERE expires_at <= ? LIMIT ?
+            )
+        """, (now, PURGE_BATCH))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "stored": self.stored,
+                "conflicts": self.conflicts,
+                "in_progress": self.in_progress,
+            }
+
+
+store = IdempotencyStore()
+
+
+def init_app(app):
+    store.ttl = app.config.get("IDEMPOTENCY_TTL", 86400.0)
+    store.max_entries = app.config.get("IDEMPOTENCY_CACHE_SIZE", 10000)
+
+
+def _refuse(from_header, message, status_code, category):
+    # Client fetch (en-tête): JSON; formulaire HTML: message flash et retour au dashboard
+    if from_header:
+        return jsonify({'success': False, 'message': message}), status_code
+    flash(message, category)
+    return redirect('/dashboard')
+
+
+def applied():
+    """À appeler quand la requête a modifié un portefeuille: sa réponse sera rejouée"""
+    g.idempotency_applied = True
+
+
+def idempotent(view):
+    """Rejouer la réponse d'origine pour une clé d'idempotence déjà traitée.
+
+    Seule la réponse d'une opération effectuée (applied(), statut < 400) est
+    enregistrée: un refus (solde insuffisant, montant invalide, service occupé,
+    429) libère la clé, le client peut réessayer avec elle plus tard.
+    Sans clé (ancien client, JS désactivé), la requête est traitée normalement.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        from_header = key is not None
+        if not from_header:
+            key = request.form.get(FORM_FIELD)
+        if not key or request.method != "POST" or "user_id" not in session:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH or not key.isprintable():
+            return _refuse(from_header, "Clé d'idempotence invalide", 400, "error")
+
+        user_id = session["user_id"]
+        request_fingerprint = fingerprint()
+        conn = get_db()
+        state, stored = store.reserve(conn, user_id, key, request_fingerprint)
+        if state == "pending":
+            return _refuse(from_header, "Opération déjà en cours de traitement", 409, "info")
+        if state == "conflict":
+            return _refuse(from_header, "Clé d'idempotence déjà utilisée pour une autre opération", 422, "error")
+        if state == "replay":
+            return stored.body, stored.status_code, {**stored.headers, "Idempotent-Replayed": "true"}
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(conn, user_id, key)
+            raise
+        if response.status_code < 400 and g.get("idempotency_applied"):
+            store.complete(conn, user_id, key, response)
+        else:
+            # Rien d'effectué: ne pas figer ce refus pour 24 h
+            store.release(conn, user_id, key)
+        return response
+
+    return wrapper
@@ -0,0 +1,202 @@
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import click
+
+# Journal en ajout seul: un solde vaut le dernier instantané de l'utilisateur
+# plus les mouvements écrits depuis (id > last_transaction_id).
+# Les instantanés sont dérivés du journal seul, jamais de wallets.balance:
+# la réconciliation compare ensuite les deux.
+CHUNK_SIZE = 1000
+MAX_REPORTED = 100
+
+CREDIT_TYPES = ("dépôt",)
+SIGNED_AMOUNT = (
+    f"CASE WHEN t.type IN ({', '.join(repr(t) for t in CREDIT_TYPES)}) THEN t.amount ELSE -t.amount END"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    user_id INTEGER PRIMARY KEY,
+    last_transaction_id INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    taken_at TEXT NOT NULL
+)
+"""
+
+# Les lignes couvertes par un instantané peuvent être archivées (supprimées):
+# le solde reste calculable. Tout le reste est refusé.
+APPEND_ONLY_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_no_update BEFORE UPDATE ON transactions BEGIN
+        SELECT RAISE(ABORT, 'transactions: journal en ajout seul, modification interdite');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_no_delete BEFORE DELETE ON transactions
+    WHEN NOT EXISTS (SELECT 1 FROM ledger_snapshots
+                     WHERE user_id = OLD.user_id AND last_transaction_id >= OLD.id)
+    BEGIN
+        SELECT RAISE(ABORT, 'transactions: mouvement non couvert par un instantané, suppression interdite');
+    END
+    """,
+]
+
+Discrepancy = namedtuple("Discrepancy", "user_id balance expected snapshot_id")
+
+
+def balances_sql(param="?"):
+    """Un lot de portefeuilles (user_id > after) avec instantané et mouvements depuis.
+
+    Les sous-requêtes lisent l'index (user_id, id, type, amount) sans toucher la table.
+    """
+    return f"""
+    SELECT w.user_id, w.balance,
+           COALESCE(s.balance, 0) AS snapshot_balance,
+           COALESCE(s.last_transaction_id, 0) AS snapshot_id,
+           (SELECT CAST(COALESCE(SUM({SIGNED_AMOUNT}), 0) AS BIGINT) FROM transactions t
+            WHERE t.user_id = w.user_id AND t.id > COALESCE(s.last_transaction_id, 0)) AS delta,
+           (SELECT MAX(t.id) FROM transactions t WHERE t.user_id = w.user_id) AS last_transaction_id
+    FROM wallets w
+    LEFT JOIN ledger_snapshots s ON s.user_id = w.user_id
+    WHERE w.user_id > {param}
+    ORDER BY w.user_id
+    LIMIT {param}
+    """
+
+
+def upsert_sql(param="?"):
+    return f"""
+    INSERT INTO ledger_snapshots (user_id, last_transaction_id, balance, taken_at)
+    VALUES ({param}, {param}, {param}, {param})
+    ON CONFLICT(user_id) DO UPDATE SET
+        last_transaction_id = excluded.last_transaction_id,
+        balance = excluded.balance,
+        taken_at = excluded.taken_at
+    """
+
+
+def expected_balance(row):
+    return row["snapshot_balance"] + row["delta"]
+
+
+def discrepancies(rows):
+    return [
+        Discrepancy(row["user_id"], row["balance"], expected_balance(row), row["snapshot_id"])
+        for row in rows if row["balance"] != expected_balance(row)
+    ]
+
+
+def has_new_movements(row):
+    return (row["last_transaction_id"] or 0) > row["snapshot_id"]
+
+
+def new_snapshots(rows):
+    """Paramètres d'upsert pour les utilisateurs ayant des mouvements depuis leur instantané"""
+    taken_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        (row["user_id"], row["last_transaction_id"], expected_balance(row), taken_at)
+        for row in rows if has_new_movements(row)
+    ]
+
+
+# ---------------- SQLITE ----------------
+def fetch_balances(conn, after, size):
+    return [dict(row) for row in conn.execute(balances_sql(), (after, size))]
+
+
+def snapshot_balances(conn, after, size):
+    """Lire un lot et écrire ses instantanés dans la même transaction; retourne le lot lu.
+
+    Le dernier id lu couvre exactement les montants additionnés: un mouvement
+    écrit pendant ce temps entrera dans l'instantané suivant.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = fetch_balances(conn, after, size)
+        conn.executemany(upsert_sql(), new_snapshots(rows))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows
+
+
+# ---------------- TÂCHES PAR LOTS ----------------
+def _chunks(read, chunk_size):
+    """Parcourir les portefeuilles par user_id croissant, un lot en mémoire à la fois"""
+    after = 0
+    while True:
+        rows = read(after, chunk_size)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = rows[-1]["user_id"]
+
+
+def reconcile(repository, chunk_size=CHUNK_SIZE, report=None):
+    """Vérifier chaque portefeuille contre son journal; report(écart) pour chaque différence.
+
+    Chaque lot est lu par une seule requête: portefeuille et mouvements y
+    sont cohérents même pendant que l'application écrit.
+    """
+    start = time.perf_counter()
+    summary = {"wallets": 0, "discrepancies": 0, "difference": 0, "chunks": 0}
+    for rows in _chunks(repository.balances, chunk_size):
+        summary["chunks"] += 1
+        summary["wallets"] += len(rows)
+        for discrepancy in discrepancies(rows):
+            summary["discrepancies"] += 1
+            summary["difference"] += discrepancy.balance - discrepancy.expected
+            if report:
+                report(discrepancy)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def take_snapshots(repository, chunk_size=CHUNK_SIZE):
+    """Avancer l'instantané de chaque utilisateur ayant de nouveaux mouvements"""
+    start = time.perf_counter()
+    summary = {"wallets": 0, "snapshots": 0, "chunks": 0}
+    for rows in _chunks(repository.snapshot_balances, chunk_size):
+        summary["chunks"] += 1
+        summary["wallets"] += len(rows)
+        summary["snapshots"] += sum(1 for row in rows if has_new_movements(row))
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def init_app(app, repository):
+    @app.cli.command("ledger-snapshot")
+    @click.option("--chunk-size", default=CHUNK_SIZE, show_default=True, help="utilisateurs par lot")
+    def ledger_snapshot_command(chunk_size):
+        """Écrire les instantanés de solde (à planifier, par exemple chaque nuit)"""
+        summary = take_snapshots(repository, chunk_size)
+        click.echo(f"📸 {summary['snapshots']} instantanés sur {summary['wallets']} portefeuilles "
+                   f"({summary['chunks']} lots, {summary['seconds']:.1f}s)")
+
+    @app.cli.command("ledger-reconcile")
+    @click.option("--chunk-size", default=CHUNK_SIZE, show_default=True, help="utilisateurs par lot")
+    @click.option("--max-reported", default=MAX_REPORTED, show_default=True, help="écarts affichés au plus")
+    def ledger_reconcile_command(chunk_size, max_reported):
+        """Comparer chaque solde au journal; code de sortie 1 en cas d'écart"""
+        shown = []
+
+        def report(discrepancy):
+            if len(shown) < max_reported:
+                shown.append(discrepancy.user_id)
+                click.echo(f"❌ utilisateur {discrepancy.user_id}: solde {discrepancy.balance}, "
+                           f"journal {discrepancy.expected} (instantané #{discrepancy.snapshot_id})")
+
+        summary = reconcile(repository, chunk_size, report)
+        rate = summary["wallets"] / summary["seconds"] if summary["seconds"] else 0
+        click.echo(f"{'❌' if summary['discrepancies'] else '✅'} {summary['wallets']} portefeuilles vérifiés, "
+                   f"{summary['discrepancies']} écarts (total {summary['difference']} Ar) "
+                   f"en {summary['seconds']:.1f}s ({rate:.0f}/s)")
+        if summary["discrepancies"]:
+            sys.exit(1)
@@ -0,0 +1,128 @@
+import atexit
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class LoginAuditBuffer:
+    """Tampon borné des connexions, écrit dans user_logins par lots.
+
+    Les connexions ne prennent plus le verrou d'écriture SQLite: un thread
+    vide le tampon toutes les `flush_interval` secondes, ou dès que
+    `flush_size` événements attendent. Au-delà de `max_size`, les événements
+    sont abandonnés et comptés dans `dropped`.
+    """
+
+    def __init__(self, logins, max_size=10000, flush_size=200, flush_interval=2.0):
+        self.logins = logins
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.flush_errors = 0
+
+    def ensure_started(self):
+        # Après un fork (gunicorn), le thread du parent n'existe plus
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="login-audit", daemon=True)
+        self._thread.start()
+
+    def record(self, user_id, ip_address, login_time=None):
+        """Mémoriser une connexion; False si le tampon est plein"""
+        event = (user_id, login_time or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ip_address)
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+                self._wake.set()
+                return False
+            self._events.append(event)
+            self.recorded += 1
+            pending = len(self._events)
+        if pending >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Écrire tout le tampon en une transaction; retourne le nombre de lignes"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._events)
+                self._events.clear()
+            if not batch:
+                return 0
+            try:
+                self.logins.record_many(batch)
+            except Exception as e:
+                # Remettre le lot en tête, dans la limite de la capacité
+                with self._lock:
+                    room = self.max_size - len(self._events)
+                    kept = batch[-room:] if room > 0 else []
+                    self._events.extendleft(reversed(kept))
+                    self.dropped += len(batch) - len(kept)
+                    self.flush_errors += 1
+                print(f"❌ Erreur écriture journal des connexions: {e}")
+                return 0
+            self.flushed += len(batch)
+            self.flushes += 1
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self, timeout=5.0):
+        """Arrêter le thread et écrire ce qui reste"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buffered": len(self._events),
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "dropped": self.dropped,
+                "flush_errors": self.flush_errors,
+            }
+
+
+buffer = None
+
+
+def init_app(app, logins):
+    """logins: dépôt des connexions du backend de stockage (record_many)"""
+    global buffer
+    buffer = LoginAuditBuffer(
+        logins,
+        max_size=app.config.get("LOGIN_AUDIT_MAX_SIZE", 10000),
+        flush_size=app.config.get("LOGIN_AUDIT_FLUSH_SIZE", 200),
+        flush_interval=app.config.get("LOGIN_AUDIT_FLUSH_INTERVAL", 2.0),
+    )
+    # Garantit l'écriture du tampon à l'arrêt normal du processus (SIGTERM gunicorn inclus)
+    atexit.register(buffer.close)
+    return buffer
+
+
+def record(user_id, ip_address):
+    buffer.ensure_started()
+    return buffer.record(user_id, ip_address)
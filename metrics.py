@@ -0,0 +1,201 @@
+import re
+import sqlite3
+import threading
+import time
+
+from flask import before_render_template, g, request, template_rendered
+
+# Bornes en secondes: de la requête SQLite indexée (~0.1 ms) au SMTP lent
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for labelvalues, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+class GaugeFunction:
+    """Valeurs lues à chaque scrape: fn() -> [(valeurs de labels, valeur)]"""
+
+    def __init__(self, name, help, labelnames, fn):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            samples = list(self.fn())
+        except Exception:
+            return []
+        for labelvalues, value in samples:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_function(self, *args, **kwargs):
+        metric = GaugeFunction(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def stats_gauge(self, name, help, fn):
+        """Expose un dict de stats (pool, cache...) comme une jauge par clé numérique"""
+        return self.gauge_function(name, help, ("stat",), lambda: [
+            ((key,), value) for key, value in sorted(fn().items()) if isinstance(value, (int, float))
+        ])
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "anamboary_http_request_duration_seconds", "Durée des requêtes HTTP par endpoint",
+    ("endpoint", "method", "status"))
+QUERY_LATENCY = registry.histogram(
+    "anamboary_sqlite_query_duration_seconds", "Durée d'exécution des requêtes SQLite (hors lecture des lignes)",
+    ("query",))
+TEMPLATE_LATENCY = registry.histogram(
+    "anamboary_template_render_duration_seconds", "Durée de rendu des templates Jinja",
+    ("template",))
+EMAIL_LATENCY = registry.histogram(
+    "anamboary_email_send_duration_seconds", "Durée d'envoi d'un email par la file",
+    ("outcome",))
+HASH_LATENCY = registry.histogram(
+    "anamboary_password_hash_duration_seconds", "Calcul d'un hash de mot de passe dans le pool",
+    ("operation",))
+HASH_QUEUE_WAIT = registry.histogram(
+    "anamboary_password_hash_queue_seconds", "Attente avant calcul (file du pool de hachage, aller-retour)",
+    ("operation",))
+
+
+# ---------------- SQLITE ----------------
+_STATEMENT = re.compile(r"^\s*(\w+)", re.S)
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)", re.I)
+
+
+def query_label(sql):
+    """'SELECT users', 'INSERT transactions'... : cardinalité bornée par le schéma"""
+    verb = _STATEMENT.match(sql)
+    verb = verb.group(1).upper() if verb else "?"
+    table = _TABLE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            QUERY_LATENCY.observe(time.perf_counter() - start, query_label(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            QUERY_LATENCY.observe(time.perf_counter() - start, query_label(sql))
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connexion dont chaque requête est chronométrée (fabrique du pool)"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute n'appelle pas cursor() côté C: on passe par le curseur chronométré
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ---------------- FLASK ----------------
+_render_starts = threading.local()
+
+
+def _before_render(sender, template, context, **extra):
+    _render_starts.start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    start = getattr(_render_starts, "start", None)
+    if start is not None:
+        TEMPLATE_LATENCY.observe(time.perf_counter() - start, template.name or "?")
+        _render_starts.start = None
+
+
+def init_app(app):
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        start = g.pop("request_started_at", None)
+        if start is not None:
+            REQUEST_LATENCY.observe(time.perf_counter() - start,
+                                    request.endpoint or "inconnu", request.method, response.status_code)
+        return response
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
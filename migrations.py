@@ -0,0 +1,445 @@
+import sys
+import time
+
+import click
+
+import admin_data
+import dashboard_data
+import export
+import history
+import idempotency
+import ledger
+import outbox
+import search
+import sessions
+import wallet
+
+def _rebuild_money_tables(conn):
+    """REAL -> INTEGER (ariary) pour les soldes et montants.
+
+    SQLite ne sait pas changer le type d'une colonne: chaque table est recopiée
+    dans une nouvelle, montants arrondis à l'ariary le plus proche.
+    """
+    conn.execute("""
+    CREATE TABLE wallets_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL UNIQUE,
+        balance INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    conn.execute("""
+    INSERT INTO wallets_new (id, user_id, balance)
+    SELECT id, user_id, CAST(ROUND(COALESCE(balance, 0)) AS INTEGER) FROM wallets
+    """)
+
+    conn.execute("""
+    CREATE TABLE transactions_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        reference TEXT UNIQUE,
+        status TEXT,
+        timestamp TEXT,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    conn.execute("""
+    INSERT INTO transactions_new (id, user_id, type, amount, reference, status, timestamp)
+    SELECT id, user_id, type, CAST(ROUND(amount) AS INTEGER), reference, status, timestamp FROM transactions
+    """)
+
+    conn.execute("""
+    CREATE TABLE investments_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        profit INTEGER,
+        status TEXT,
+        reference TEXT UNIQUE,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    conn.execute("""
+    INSERT INTO investments_new (id, user_id, amount, date, profit, status, reference, created_at)
+    SELECT id, user_id, CAST(ROUND(amount) AS INTEGER), date, CAST(ROUND(profit) AS INTEGER),
+           status, reference, created_at
+    FROM investments
+    """)
+
+    for table in ("wallets", "transactions", "investments"):
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    # Les index de la migration 2 ont disparu avec les anciennes tables
+    conn.execute("CREATE INDEX idx_transactions_user_timestamp ON transactions(user_id, timestamp)")
+    conn.execute("CREATE INDEX idx_investments_user_date ON investments(user_id, date)")
+
+
+def _create_platform_summary(conn):
+    """Agrégats de la plateforme tenus à jour par triggers, puis calculés une fois sur l'existant.
+
+    Les suppressions de transactions (archivage) ne retirent rien des volumes
+    journaliers: ils décrivent l'activité passée, pas le contenu de la table.
+    """
+    conn.execute("""
+    CREATE TABLE platform_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        user_count INTEGER NOT NULL DEFAULT 0,
+        total_balance INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE platform_daily (
+        day TEXT PRIMARY KEY,
+        new_users INTEGER NOT NULL DEFAULT 0,
+        deposit_count INTEGER NOT NULL DEFAULT 0,
+        deposit_volume INTEGER NOT NULL DEFAULT 0,
+        withdrawal_count INTEGER NOT NULL DEFAULT 0,
+        withdrawal_volume INTEGER NOT NULL DEFAULT 0,
+        investment_count INTEGER NOT NULL DEFAULT 0,
+        investment_volume INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+    CREATE TRIGGER trg_users_summary AFTER INSERT ON users BEGIN
+        UPDATE platform_totals SET user_count = user_count + 1 WHERE id = 1;
+        INSERT INTO platform_daily (day, new_users) VALUES (date(COALESCE(NEW.created_at, 'now')), 1)
+        ON CONFLICT(day) DO UPDATE SET new_users = new_users + 1;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_wallets_insert_summary AFTER INSERT ON wallets BEGIN
+        UPDATE platform_totals SET total_balance = total_balance + NEW.balance WHERE id = 1;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_wallets_update_summary AFTER UPDATE OF balance ON wallets BEGIN
+        UPDATE platform_totals SET total_balance = total_balance + NEW.balance - OLD.balance WHERE id = 1;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_wallets_delete_summary AFTER DELETE ON wallets BEGIN
+        UPDATE platform_totals SET total_balance = total_balance - OLD.balance WHERE id = 1;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_transactions_summary AFTER INSERT ON transactions BEGIN
+        INSERT INTO platform_daily (day, deposit_count, deposit_volume, withdrawal_count, withdrawal_volume,
+                                    investment_count, investment_volume)
+        VALUES (date(COALESCE(NEW.timestamp, 'now')),
+                NEW.type = 'dépôt', CASE WHEN NEW.type = 'dépôt' THEN NEW.amount ELSE 0 END,
+                NEW.type = 'retrait', CASE WHEN NEW.type = 'retrait' THEN NEW.amount ELSE 0 END,
+                NEW.type = 'investissement', CASE WHEN NEW.type = 'investissement' THEN NEW.amount ELSE 0 END)
+        ON CONFLICT(day) DO UPDATE SET
+            deposit_count = deposit_count + excluded.deposit_count,
+            deposit_volume = deposit_volume + excluded.deposit_volume,
+            withdrawal_count = withdrawal_count + excluded.withdrawal_count,
+            withdrawal_volume = withdrawal_volume + excluded.withdrawal_volume,
+            investment_count = investment_count + excluded.investment_count,
+            investment_volume = investment_volume + excluded.investment_volume;
+    END
+    """)
+
+    conn.execute("""
+    INSERT INTO platform_totals (id, user_count, total_balance)
+    VALUES (1, (SELECT COUNT(*) FROM users), (SELECT COALESCE(SUM(balance), 0) FROM wallets))
+    """)
+    conn.execute("""
+    INSERT INTO platform_daily (day, new_users)
+    SELECT date(COALESCE(created_at, 'now')), COUNT(*) FROM users GROUP BY 1
+    """)
+    conn.execute("""
+    INSERT INTO platform_daily (day, deposit_count, deposit_volume, withdrawal_count, withdrawal_volume,
+                                investment_count, investment_volume)
+    SELECT date(COALESCE(timestamp, 'now')),
+           SUM(type = 'dépôt'), SUM(CASE WHEN type = 'dépôt' THEN amount ELSE 0 END),
+           SUM(type = 'retrait'), SUM(CASE WHEN type = 'retrait' THEN amount ELSE 0 END),
+           SUM(type = 'investissement'), SUM(CASE WHEN type = 'investissement' THEN amount ELSE 0 END)
+    FROM transactions
+    WHERE true
+    GROUP BY 1
+    ON CONFLICT(day) DO UPDATE SET
+        deposit_count = excluded.deposit_count,
+        deposit_volume = excluded.deposit_volume,
+        withdrawal_count = excluded.withdrawal_count,
+        withdrawal_volume = excluded.withdrawal_volume,
+        investment_count = excluded.investment_count,
+        investment_volume = excluded.investment_volume
+    """)
+
+
+def _create_search_index(conn):
+    """Index plein texte FTS5 (trigrammes) des utilisateurs et des références de transactions.
+
+    Index à contenu externe: les triggers y reportent chaque écriture, et
+    'rebuild' l'alimente une fois à partir des tables existantes.
+    """
+    conn.execute("""
+    CREATE VIRTUAL TABLE users_fts USING fts5(
+        full_name, email, phone_number,
+        content='users', content_rowid='id', tokenize='trigram case_sensitive 0'
+    )
+    """)
+    conn.execute("""
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+        reference,
+        content='transactions', content_rowid='id', tokenize='trigram case_sensitive 0'
+    )
+    """)
+
+    conn.execute("""
+    CREATE TRIGGER trg_users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, full_name, email, phone_number)
+        VALUES (NEW.id, NEW.full_name, NEW.email, NEW.phone_number);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, email, phone_number)
+        VALUES ('delete', OLD.id, OLD.full_name, OLD.email, OLD.phone_number);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_users_fts_update AFTER UPDATE OF full_name, email, phone_number ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, email, phone_number)
+        VALUES ('delete', OLD.id, OLD.full_name, OLD.email, OLD.phone_number);
+        INSERT INTO users_fts (rowid, full_name, email, phone_number)
+        VALUES (NEW.id, NEW.full_name, NEW.email, NEW.phone_number);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, reference) VALUES (NEW.id, NEW.reference);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, reference) VALUES ('delete', OLD.id, OLD.reference);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_transactions_fts_update AFTER UPDATE OF reference ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, reference) VALUES ('delete', OLD.id, OLD.reference);
+        INSERT INTO transactions_fts (rowid, reference) VALUES (NEW.id, NEW.reference);
+    END
+    """)
+
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+# Chaque migration: (version, description, étapes). Une étape est une requête
+# SQL ou une fonction recevant la connexion. Ne jamais modifier une migration
+# déjà livrée: en ajouter une nouvelle.
+MIGRATIONS = [
+    (1, "schéma initial", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone_number TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS wallets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            balance REAL DEFAULT 0,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            reference TEXT UNIQUE,
+            status TEXT,
+            timestamp TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS investments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            profit REAL,
+            status TEXT,
+            reference TEXT UNIQUE,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_logins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            login_time TEXT,
+            ip_address TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+        outbox.SCHEMA,
+    ]),
+    (2, "index des requêtes chaudes (dashboard, admin, file d'emails)", [
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions(user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_investments_user_date ON investments(user_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_user_logins_login_time ON user_logins(login_time)",
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_status ON email_outbox(status, next_attempt_at)",
+    ]),
+    (3, "montants en ariary entiers (INTEGER au lieu de REAL)", [
+        _rebuild_money_tables,
+    ]),
+    (4, "recherche admin par préfixe et agrégats de la plateforme", [
+        "CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users(email COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_users_phone_nocase ON users(phone_number COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_users_full_name_nocase ON users(full_name COLLATE NOCASE)",
+        _create_platform_summary,
+    ]),
+    (5, "recherche plein texte FTS5 des utilisateurs et références", [
+        _create_search_index,
+    ]),
+    (6, "clés d'idempotence des dépôts, retraits et investissements", [
+        idempotency.SCHEMA,
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at)",
+    ]),
+    (7, "journal des mouvements en ajout seul, instantanés de solde", [
+        ledger.SCHEMA,
+        # Couvrant: la réconciliation additionne les mouvements sans lire la table
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_ledger ON transactions(user_id, id, type, amount)",
+        *ledger.APPEND_ONLY_TRIGGERS,
+    ]),
+    (8, "index des exports par période", export.INDEXES),
+    (9, "sessions côté serveur", [
+        sessions.SCHEMA,
+        *sessions.INDEXES,
+    ]),
+    (10, "version des portefeuilles (ETag des API JSON)", [
+        "ALTER TABLE wallets ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+
+
+def current_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.commit()
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Appliquer les migrations manquantes, chacune dans sa propre transaction"""
+    applied = []
+    for version, description, steps in migrations:
+        if version <= current_version(conn):
+            continue
+        # BEGIN IMMEDIATE: un seul worker gunicorn applique la migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM schema_version WHERE version=?", (version,)).fetchone():
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        print(f"🗄️ Migration {version} appliquée: {description}")
+    if applied:
+        conn.execute("PRAGMA optimize")
+    return applied
+
+
+# ---------------- PLANS DE REQUÊTES ----------------
+# Requêtes exécutées à chaque page vue (ou par lot dans les tâches de fond):
+# aucune ne doit parcourir une table entière
+HOT_QUERIES = {
+    "dashboard.snapshot": (dashboard_data.SNAPSHOT_SQL, (1,)),
+    "wallets.state": (wallet.STATE_SQL, (1,)),
+    "history.transactions": (history.page_sql("transactions", after=True), (1, "", 0, 21)),
+    "history.investments": (history.page_sql("investments", after=True), (1, "", 0, 21)),
+    "admin.logins": ("""
+        SELECT u.full_name, l.login_time, l.ip_address
+        FROM user_logins l
+        JOIN users u ON l.user_id = u.id
+        ORDER BY l.login_time DESC
+        LIMIT 50
+    """, ()),
+    "admin.users": (admin_data.users_page_sql(after=True), {"after": 1 << 62, "limit": 51}),
+    "admin.users_search": (admin_data.users_page_sql(search=True, after=True),
+                           {"pattern": "ab%", "after": 1 << 62, "limit": 51}),
+    "admin.summary": (admin_data.DAILY_SQL, ("-30 days",)),
+    "search.users": (search.USERS_SQL, ('"rakoto"', 20)),
+    "search.transactions": (search.TRANSACTIONS_SQL, ('"AB12"', 20)),
+    "ledger.balances": (ledger.balances_sql(), (0, 1000)),
+    "export.transactions": export.export_sql("transactions", {"since": "2025-01-01", "until": "2025-02-01"}),
+    "export.investments_user": export.export_sql("investments", {"user_id": 1, "since": "2025-01-01"}),
+    "export.user_logins_user": export.export_sql("user_logins", {"user_id": 1, "until": "2025-02-01"}),
+    "outbox.claim": ("""
+        SELECT id FROM email_outbox
+        WHERE (status='pending' AND next_attempt_at <= ?)
+           OR (status='sending' AND claimed_at < ?)
+        LIMIT 50
+    """, (0, 0)),
+}
+
+
+def plan_problems(detail, subqueries=()):
+    """Un SCAN sans index ou un tri en B-tree temporaire trahit un parcours complet.
+
+    Le SCAN d'une sous-requête déjà bornée (CO-ROUTINE/MATERIALIZE) est accepté,
+    comme celui d'une table FTS5 filtrée par MATCH (":M" dans l'index choisi).
+    """
+    if "VIRTUAL TABLE INDEX" in detail:
+        return ":M" not in detail
+    if detail.startswith("SCAN") and "USING" not in detail:
+        return detail.split()[1] not in subqueries
+    return "USE TEMP B-TREE" in detail
+
+
+def check_query_plans(conn, queries=None):
+    """Retourne [(nom, ligne du plan)] pour chaque requête chaude mal indexée"""
+    failures = []
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        details = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        subqueries = {d.split()[1] for d in details if d.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+        failures += [(name, d) for d in details if plan_problems(d, subqueries)]
+    return failures
+
+
+def init_app(app, pool):
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """Échoue si une requête chaude retombe sur un parcours de table"""
+        with pool.connection() as conn:
+            migrate(conn)
+            start = time.perf_counter()
+            failures = check_query_plans(conn)
+        for name, detail in failures:
+            click.echo(f"❌ {name}: {detail}")
+        if failures:
+            sys.exit(1)
+        click.echo(f"✅ {len(HOT_QUERIES)} requêtes indexées ({(time.perf_counter() - start) * 1000:.1f} ms)")
@@ -0,0 +1,43 @@
+import re
+from decimal import Decimal
+
+# Les montants sont des entiers en ariary: l'ariary n'a pas de subdivision
+# utilisée en pratique, et les entiers SQLite se somment et se comparent sans
+# tolérance d'arrondi.
+MAX_AMOUNT = 10 ** 12
+
+# Profit quotidien: 11.67 %, exprimé en points de base pour rester en entiers
+DAILY_PROFIT_BP = 1167
+
+# Partie décimale d'au plus deux chiffres: "1,000" ou "1.000" (mille ou un?)
+# est refusé plutôt que deviné
+AMOUNT_PATTERN = re.compile(r"[+-]?\d+(?:[.,]\d{1,2})?")
+
+
+def parse_amount(value):
+    """Montant saisi -> entier en ariary.
+
+    Accepte "1000", "1000.0", "1 000" ou "1000,00"; lève ValueError pour un
+    montant fractionnaire ("1000,5"), ambigu ("1,000", "1.000"), non
+    numérique ou hors limites.
+    """
+    # Espaces (y compris insécables) tolérés comme séparateurs de milliers
+    text = "".join(str(value).split())
+    if not AMOUNT_PATTERN.fullmatch(text):
+        raise ValueError(f"Montant invalide: {value!r}")
+    amount = Decimal(text.replace(",", "."))
+    if not amount.is_finite() or amount != amount.to_integral_value():
+        raise ValueError(f"Montant invalide: {value!r}")
+    amount = int(amount)
+    if abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Montant hors limites: {value!r}")
+    return amount
+
+
+def percent_of(amount, basis_points):
+    """amount * basis_points / 10000, arrondi à l'ariary le plus proche (demi vers le haut)"""
+    return (amount * basis_points + 5000) // 10000
+
+
+def daily_profit(amount):
+    return percent_of(amount, DAILY_PROFIT_BP)
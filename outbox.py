@@ -0,0 +1,247 @@
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from email.utils import formatdate
+
+from flask_mail import Message
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    sent_at TEXT
+)
+"""
+
+
+def enqueue(conn, recipient, subject, html):
+    """Ajouter un email à la file, dans la transaction de l'appelant.
+
+    Appeler wake() après le commit pour un envoi sans attendre le prochain tour.
+    """
+    cursor = conn.execute(
+        "INSERT INTO email_outbox (recipient, subject, html, next_attempt_at) VALUES (?, ?, ?, ?)",
+        (recipient, subject, html, time.time())
+    )
+    return cursor.lastrowid
+
+
+def enqueue_many(conn, messages):
+    """Variante par lot: messages = [(destinataire, sujet, html), ...]"""
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO email_outbox (recipient, subject, html, next_attempt_at) VALUES (?, ?, ?, ?)",
+        [(recipient, subject, html, now) for recipient, subject, html in messages]
+    )
+
+
+def wake():
+    if dispatcher is not None:
+        dispatcher.wake()
+
+
+# ---------------- BACKENDS ----------------
+class SmtpBackend:
+    """Envoi réel via Flask-Mail, une seule connexion SMTP par lot"""
+
+    def __init__(self, mail):
+        self.mail = mail
+
+    @contextmanager
+    def open(self):
+        with self.mail.connect() as connection:
+            yield lambda msg: connection.send(msg)
+
+
+class FileBackend:
+    """Écrit chaque message en .eml dans un dossier (tests, développement)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def open(self):
+        yield self._write
+
+    def _write(self, msg):
+        name = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            f.write(msg.as_string())
+
+
+def make_backend(app, mail):
+    kind = app.config.get("MAIL_OUTBOX_BACKEND", "smtp")
+    if kind == "file":
+        return FileBackend(app.config.get("MAIL_OUTBOX_DIR", "outbox_mails"))
+    if kind == "smtp":
+        return SmtpBackend(mail)
+    raise ValueError(f"MAIL_OUTBOX_BACKEND inconnu: {kind}")
+
+
+# ---------------- DISPATCHER ----------------
+class OutboxDispatcher:
+    """Vide la file en arrière-plan, par lots, avec relances exponentielles"""
+
+    def __init__(self, app, pool, backend, batch_size=50, poll_interval=5.0,
+                 max_attempts=6, backoff_base=30.0, backoff_max=3600.0, claim_timeout=300.0):
+        self.app = app
+        self.pool = pool
+        self.backend = backend
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_timeout = claim_timeout
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        # Après un fork (gunicorn), le thread du parent n'existe plus
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self.run_forever, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except Exception as e:
+                print(f"❌ Erreur file d'emails: {e}")
+                sent = 0
+            # Lot plein: on enchaîne sans attendre
+            if sent < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim(self, conn):
+        now = time.time()
+        token = uuid.uuid4().hex
+        conn.execute("""
+            UPDATE email_outbox SET status='sending', claimed_by=?, claimed_at=?
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status='pending' AND next_attempt_at <= ?)
+                   OR (status='sending' AND claimed_at < ?)
+                LIMIT ?
+            )
+        """, (token, now, now, now - self.claim_timeout, self.batch_size))
+        conn.commit()
+        return conn.execute(
+            "SELECT * FROM email_outbox WHERE claimed_by=? AND status='sending' ORDER BY id", (token,)
+        ).fetchall()
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _send(self, rows):
+        results = []
+        with self.app.app_context():
+            try:
+                with self.backend.open() as send:
+                    for row in rows:
+                        start = time.perf_counter()
+                        try:
+                            send(Message(subject=row["subject"], recipients=[row["recipient"]], html=row["html"]))
+                            results.append((row, None))
+                            metrics.EMAIL_LATENCY.observe(time.perf_counter() - start, "sent")
+                        except Exception as e:
+                            results.append((row, str(e)))
+                            metrics.EMAIL_LATENCY.observe(time.perf_counter() - start, "error")
+            except Exception as e:
+                # Connexion SMTP impossible: tout le lot est à relancer
+                done = {row["id"] for row, _ in results}
+                results += [(row, str(e)) for row in rows if row["id"] not in done]
+        return results
+
+    def run_once(self):
+        """Envoyer un lot; retourne le nombre de messages réclamés"""
+        with self.pool.connection() as conn:
+            rows = self._claim(conn)
+        if not rows:
+            return 0
+
+        # Aucune connexion SQLite n'est gardée pendant l'échange SMTP
+        results = self._send(rows)
+
+        with self.pool.connection() as conn:
+            for row, error in results:
+                if error is None:
+                    conn.execute(
+                        "UPDATE email_outbox SET status='sent', sent_at=?, claimed_by=NULL WHERE id=?",
+                        (formatdate(localtime=True), row["id"])
+                    )
+                    print(f"✅ Email envoyé à: {row['recipient']}")
+                    continue
+                attempts = row["attempts"] + 1
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                conn.execute(
+                    "UPDATE email_outbox SET status=?, attempts=?, next_attempt_at=?, last_error=?, claimed_by=NULL "
+                    "WHERE id=?",
+                    (status, attempts, time.time() + self._backoff(attempts), error[:500], row["id"])
+                )
+                print(f"❌ Erreur envoi email à {row['recipient']} (tentative {attempts}): {error}")
+            conn.commit()
+        return len(rows)
+
+    def stats(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM email_outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+dispatcher = None
+
+
+def init_app(app, pool, mail):
+    """Configurer la file; le thread ne démarre que si MAIL_OUTBOX_WORKER=thread"""
+    global dispatcher
+    dispatcher = OutboxDispatcher(
+        app, pool, make_backend(app, mail),
+        batch_size=app.config.get("MAIL_OUTBOX_BATCH_SIZE", 50),
+        poll_interval=app.config.get("MAIL_OUTBOX_POLL_INTERVAL", 5.0),
+        max_attempts=app.config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 6),
+    )
+
+    @app.before_request
+    def start_outbox_dispatcher():
+        if app.config.get("MAIL_OUTBOX_WORKER", "thread") == "thread":
+            dispatcher.ensure_started()
+
+    @app.cli.command("outbox-worker")
+    def outbox_worker():
+        """Vider la file d'emails dans un processus dédié"""
+        print("📧 File d'emails: worker démarré")
+        dispatcher.run_forever()
+
+    return dispatcher
@@ -0,0 +1,237 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import jsonify, make_response, request, session
+from markupsafe import escape
+
+from db import ConnectionPool
+
+# Seaux à jetons par endpoint: chaque requête POST prend un jeton dans le
+# seau de son IP et/ou de son compte; un seau se remplit de `capacity`
+# jetons par `period` secondes. Seau vide: 429 + Retry-After, avant toute
+# lecture en base ou tout hachage de mot de passe.
+Rule = namedtuple("Rule", "capacity period")
+
+# endpoint -> {portée: "capacité/période en secondes"}
+DEFAULT_RULES = {
+    "login": {"ip": "20/60", "account": "5/300"},
+    # Large par IP (NAT des opérateurs mobiles: une IP pour tout un quartier), strict par email
+    "register": {"ip": "30/3600", "account": "3/3600"},
+    "admin_login": {"ip": "5/300", "account": "5/300"},
+    "depot": {"account": "10/60"},
+    "retrait": {"account": "10/60"},
+    "invest": {"account": "10/60"},
+}
+
+# Identifiant du compte visé, lu dans le formulaire ou la session
+ACCOUNT_KEYS = {
+    "login": lambda: request.form.get("login_input", "").strip().lower() or None,
+    "register": lambda: request.form.get("email", "").strip().lower() or None,
+    "admin_login": lambda: request.form.get("username", "").strip().lower() or None,
+}
+
+# Appelés en fetch(): réponse JSON, comme leurs autres erreurs
+JSON_ENDPOINTS = ("invest",)
+
+MAX_KEYS = 100000
+PURGE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    full_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Un seul UPSERT: remplissage depuis la dernière requête puis retrait d'un
+# jeton, seulement s'il y en a un (sinon aucune ligne retournée)
+TAKE_SQL = """
+INSERT INTO rate_buckets (key, tokens, updated, full_at) VALUES (:key, :capacity - 1, :now, :now + :refill)
+ON CONFLICT(key) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + (:now - updated) * :rate) - 1,
+    updated = :now,
+    full_at = :now + (:capacity - MIN(:capacity, tokens + (:now - updated) * :rate) + 1) / :rate
+WHERE MIN(:capacity, tokens + (:now - updated) * :rate) >= 1
+RETURNING tokens
+"""
+
+
+def parse_rule(text):
+    """'5/60' -> Rule(5, 60.0): 5 requêtes, un jeton rendu toutes les 12 s"""
+    capacity, period = text.split("/")
+    return Rule(int(capacity), float(period))
+
+
+def _refill(tokens, updated, rule, now):
+    return min(rule.capacity, tokens + (now - updated) * rule.capacity / rule.period)
+
+
+class MemoryBuckets:
+    """Seaux du processus: {clé: (jetons, mise à jour, plein à)} dans l'ordre des mises à jour.
+
+    Un seau redevenu plein équivaut à un seau absent: il est retiré en tête
+    de file au fil des appels; au-delà de max_keys, les plus anciens partent.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rule, now):
+        """(autorisé, secondes avant le prochain jeton)"""
+        rate = rule.capacity / rule.period
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = rule.capacity if bucket is None else _refill(bucket[0], bucket[1], rule, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (rule.capacity - tokens) / rate)
+            self._expire(now)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def _expire(self, now):
+        for _ in range(2):
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now and len(self._buckets) <= self.max_keys:
+                return
+            del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._buckets)}
+
+
+class SqliteBuckets:
+    """Seaux partagés par les workers gunicorn, dans un fichier SQLite dédié
+    (jamais la base principale: pas de concurrence avec son verrou d'écriture).
+    Sur tmpfs (/dev/shm/...), le fichier reste en mémoire partagée."""
+
+    name = "sqlite"
+
+    PRAGMAS = (("journal_mode", "WAL"), ("synchronous", "OFF"), ("busy_timeout", 1000))
+
+    def __init__(self, path, pool_size=4):
+        self.pool = ConnectionPool(path, max_size=pool_size, pragmas=self.PRAGMAS)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.errors = 0
+        with self.pool.connection() as conn:
+            conn.execute(SCHEMA)
+            conn.commit()
+
+    def take(self, key, rule, now):
+        rate = rule.capacity / rule.period
+        params = {"key": key, "capacity": rule.capacity, "rate": rate, "now": now, "refill": 1 / rate}
+        with self._lock:
+            self._calls += 1
+            purge = self._calls % PURGE_EVERY == 0
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(TAKE_SQL, params).fetchone()
+                if row is None:
+                    bucket = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key=?", (key,)).fetchone()
+                if purge:
+                    conn.execute("DELETE FROM rate_buckets WHERE full_at < ?", (now,))
+                conn.commit()
+        except sqlite3.Error as e:
+            # Limiteur indisponible: laisser passer plutôt que bloquer tout le site
+            with self._lock:
+                self.errors += 1
+            print(f"❌ Limiteur de débit: {e}")
+            return True, 0.0
+        if row is not None:
+            return True, 0.0
+        return False, (1 - _refill(bucket["tokens"], bucket["updated"], rule, now)) / rate
+
+    def stats(self):
+        with self._lock:
+            return {"errors": self.errors, **self.pool.stats()}
+
+
+class RateLimiter:
+    def __init__(self, buckets, rules=DEFAULT_RULES):
+        self.buckets = buckets
+        self.rules = {endpoint: {scope: parse_rule(rule) if isinstance(rule, str) else rule
+                                 for scope, rule in scopes.items()}
+                      for endpoint, scopes in rules.items()}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = {}
+
+    def _key_value(self, endpoint, scope):
+        if scope == "ip":
+            return request.remote_addr
+        if endpoint in ACCOUNT_KEYS:
+            return ACCOUNT_KEYS[endpoint]()
+        return session.get("user_id")
+
+    def check(self, endpoint, now=None):
+        """None si la requête passe, sinon le délai (s) avant de réessayer"""
+        now = time.time() if now is None else now
+        for scope, rule in self.rules.get(endpoint, {}).items():
+            value = self._key_value(endpoint, scope)
+            if value is None:
+                continue
+            allowed, retry_after = self.buckets.take(f"{endpoint}:{scope}:{value}", rule, now)
+            if not allowed:
+                with self._lock:
+                    self.limited[endpoint] = self.limited.get(endpoint, 0) + 1
+                return retry_after
+        with self._lock:
+            self.allowed += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = {"allowed": self.allowed, **{f"limited_{k}": v for k, v in self.limited.items()}}
+        return {**stats, **self.buckets.stats()}
+
+
+limiter = None
+
+
+def too_many_requests(retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    message = f"Trop de tentatives, veuillez réessayer dans {retry_after} s."
+    if request.endpoint in JSON_ENDPOINTS or request.is_json:
+        response = jsonify({"success": False, "message": message})
+    else:
+        response = make_response(f"<!DOCTYPE html><html lang=\"fr\"><meta charset=\"UTF-8\">"
+                                 f"<title>Trop de requêtes</title><p>{escape(message)}</p>"
+                                 f"<p><a href=\"javascript:history.back()\">Retour</a></p></html>")
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def init_app(app):
+    """À enregistrer avant les autres before_request qui touchent la base"""
+    global limiter
+    backend = app.config.get("RATELIMIT_BACKEND", "memory")
+    if backend == "sqlite":
+        buckets = SqliteBuckets(app.config["RATELIMIT_PATH"])
+    elif backend == "memory":
+        buckets = MemoryBuckets(app.config.get("RATELIMIT_MAX_KEYS", MAX_KEYS))
+    else:
+        raise ValueError(f"RATELIMIT_BACKEND inconnu: {backend}")
+    rules = {**DEFAULT_RULES, **app.config.get("RATELIMIT_RULES", {})}
+    limiter = RateLimiter(buckets, rules)
+
+    @app.before_request
+    def rate_limit():
+        if not app.config.get("RATELIMIT_ENABLED", True) or request.method != "POST":
+            return None
+        retry_after = limiter.check(request.endpoint)
+        if retry_after is not None:
+            return too_many_requests(retry_after)
+
+    return limiter
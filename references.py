@@ -0,0 +1,122 @@
+import re
+import secrets
+import threading
+import time
+
+# Références de type ULID en base32 de Crockford (sans I, L, O, U):
+#   10 caractères d'horodatage (ms, 48 bits) + 16 aléatoires (80 bits, secrets)
+#   + 1 caractère de contrôle (valeur modulo 37, symboles *~$=U en plus).
+# Triées par date, elles s'ajoutent en fin des index UNIQUE au lieu d'y être
+# insérées au hasard.
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CHECK_SYMBOLS = ALPHABET + "*~$=U"
+TIME_LENGTH = 10
+RANDOM_LENGTH = 16
+LENGTH = TIME_LENGTH + RANDOM_LENGTH + 1
+RANDOM_BITS = RANDOM_LENGTH * 5
+
+MAX_ATTEMPTS = 3
+
+# Saisie humaine: I et L se lisent 1, O se lit 0
+_NORMALIZE = str.maketrans("ILO", "110")
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+
+
+# Colonnes `reference` sous index UNIQUE
+UNIQUE_COLUMNS = {("transactions", "reference"), ("investments", "reference")}
+# Message de sqlite3.IntegrityError pour une contrainte UNIQUE sur une seule colonne
+_SQLITE_UNIQUE = re.compile(r"UNIQUE constraint failed: (\w+)\.(\w+)")
+
+
+class ReferenceCollision(Exception):
+    """Référence déjà présente: levée par chaque backend à la place de son erreur d'intégrité"""
+
+
+def is_sqlite_collision(error):
+    """Vrai si cette IntegrityError de SQLite vient de l'index UNIQUE d'une colonne reference"""
+    match = _SQLITE_UNIQUE.fullmatch(str(error))
+    return match is not None and (match.group(1), match.group(2)) in UNIQUE_COLUMNS
+
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+_collisions = 0
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _decode(text):
+    value = 0
+    for char in text:
+        value = value * 32 + _DECODE[char]
+    return value
+
+
+def new(now=None):
+    """Nouvelle référence, strictement croissante dans le processus.
+
+    Dans une même milliseconde, la partie aléatoire est incrémentée au lieu
+    d'être tirée à nouveau: deux appels ne peuvent pas produire la même valeur.
+    """
+    global _last_ms, _last_random
+    ms = int((time.time() if now is None else now) * 1000)
+    with _lock:
+        if ms <= _last_ms:
+            ms = _last_ms
+            random_part = _last_random + 1
+            if random_part >> RANDOM_BITS:
+                # Débordement (2^80 appels dans la même ms): passer à la suivante
+                ms += 1
+                random_part = secrets.randbits(RANDOM_BITS)
+        else:
+            random_part = secrets.randbits(RANDOM_BITS)
+        _last_ms, _last_random = ms, random_part
+    body = _encode(ms, TIME_LENGTH) + _encode(random_part, RANDOM_LENGTH)
+    return body + CHECK_SYMBOLS[_decode(body) % 37]
+
+
+def normalize(reference):
+    """Référence saisie -> forme canonique (majuscules, sans tirets ni espaces)"""
+    return "".join(reference.split()).replace("-", "").upper().translate(_NORMALIZE)
+
+
+def is_valid(reference):
+    """Vrai pour une référence bien formée dont le caractère de contrôle correspond"""
+    reference = normalize(reference)
+    if len(reference) != LENGTH or any(c not in _DECODE for c in reference[:-1]):
+        return False
+    return CHECK_SYMBOLS[_decode(reference[:-1]) % 37] == reference[-1]
+
+
+def timestamp(reference):
+    """Instant de création (secondes epoch) encodé dans la référence"""
+    return _decode(normalize(reference)[:TIME_LENGTH]) / 1000
+
+
+def retry_on_collision(operation, attempts=MAX_ATTEMPTS):
+    """Exécuter operation(reference), avec une nouvelle référence si l'index UNIQUE la refuse.
+
+    Ne devrait jamais servir entre processus (80 bits aléatoires), mais une
+    collision ne doit pas se transformer en erreur 500.
+    """
+    global _collisions
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation(new())
+        except ReferenceCollision:
+            if attempt == attempts:
+                raise
+            with _lock:
+                _collisions += 1
+
+
+def stats():
+    with _lock:
+        return {"collisions": _collisions}
@@ -0,0 +1,61 @@
+import time
+
+import admin_data
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Le tokenizer trigram indexe chaque suite de 3 caractères: une sous-chaîne
+# plus courte ne peut pas être cherchée dans l'index.
+MIN_QUERY_LENGTH = 3
+
+# users_fts et transactions_fts sont des index FTS5 à contenu externe: ils ne
+# stockent que les trigrammes, les lignes sont relues par rowid dans la table.
+# rank (bm25) est le tri natif de FTS5, sans B-tree temporaire.
+USERS_SQL = """
+SELECT u.id, u.full_name, u.email, u.phone_number, u.created_at, f.rank AS score
+FROM users_fts f
+JOIN users u ON u.id = f.rowid
+WHERE users_fts MATCH ?
+ORDER BY f.rank
+LIMIT ?
+"""
+
+TRANSACTIONS_SQL = """
+SELECT t.id, t.reference, t.type, t.amount, t.status, t.timestamp, t.user_id, u.full_name, f.rank AS score
+FROM transactions_fts f
+JOIN transactions t ON t.id = f.rowid
+LEFT JOIN users u ON u.id = t.user_id
+WHERE transactions_fts MATCH ?
+ORDER BY f.rank
+LIMIT ?
+"""
+
+
+def match_expression(text):
+    """Texte saisi -> phrase FTS5: les opérateurs (AND, *, :, -...) ne sont pas interprétés"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def search(conn, text, limit=DEFAULT_LIMIT):
+    """Utilisateurs et transactions correspondant à `text`, classés par pertinence.
+
+    En dessous de MIN_QUERY_LENGTH caractères, seule la recherche par préfixe
+    des utilisateurs (index NOCASE) est possible.
+    """
+    text = (text or "").strip()
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    start = time.perf_counter()
+    if len(text) < MIN_QUERY_LENGTH:
+        users = [dict(row) for row in admin_data.fetch_users(conn, text, limit=limit)[0]] if text else []
+        transactions = []
+    else:
+        expression = match_expression(text)
+        users = [dict(row) for row in conn.execute(USERS_SQL, (expression, limit))]
+        transactions = [dict(row) for row in conn.execute(TRANSACTIONS_SQL, (expression, limit))]
+    return {
+        "query": text,
+        "users": users,
+        "transactions": transactions,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
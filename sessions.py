@@ -0,0 +1,345 @@
+import hashlib
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import click
+from flask import session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+import events
+
+# Sessions côté serveur: le cookie ne porte que "identifiant.version", les
+# données (user_id, profil, messages flash) sont dans la table `sessions` de
+# la base locale. Un LRU par processus, devant la table, répond sans requête
+# si la version du cookie est celle qu'il connaît: une session modifiée par un
+# autre worker est relue en base. Une entrée est revalidée (lecture seule) au
+# plus toutes les TOUCH_INTERVAL secondes: une session révoquée par un autre
+# worker disparaît en TOUCH_INTERVAL s au plus. L'expiration d'inactivité n'est
+# prolongée (écriture) que si last_seen a plus de TOUCH_INTERVAL secondes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)",
+]
+
+TOUCH_INTERVAL = 60.0
+# Prolongation de l'inactivité: jamais plus de quelques ms derrière une écriture de portefeuille
+TOUCH_BUSY_TIMEOUT_MS = 50
+MAX_ENTRIES = 10000
+PURGE_INTERVAL = 300.0
+PURGE_BATCH = 500
+SID_LENGTH = 43  # secrets.token_urlsafe(32)
+
+User = namedtuple("User", "id full_name email phone")
+CachedSession = namedtuple("CachedSession", "data version expires_at checked_at")
+
+# Même sérialisation que le cookie signé de Flask (tuples des messages flash...)
+serializer = TaggedJSONSerializer()
+
+
+def session_key(sid):
+    """Clé en base: empreinte de l'identifiant, une fuite de la table ne donne pas de cookie valide"""
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class SessionStore:
+    def __init__(self, pool, idle_timeout=3600.0, touch_interval=TOUCH_INTERVAL, max_entries=MAX_ENTRIES):
+        self.pool = pool
+        self.idle_timeout = idle_timeout
+        self.touch_interval = touch_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.saved = 0
+        self.revoked = 0
+        self.touch_skipped = 0
+
+    def _remember(self, key, cached):
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def load(self, sid, version, now=None):
+        """(données, version, expiration prolongée) ou (None, 0, False) si la session n'existe plus"""
+        now = time.time() if now is None else now
+        key = session_key(sid)
+        with self._lock:
+            cached = self._entries.get(key)
+            if (cached is not None and cached.version == version and cached.expires_at > now
+                    and now - cached.checked_at < self.touch_interval):
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return serializer.loads(cached.data), version, False
+
+        # Validation en lecture seule: un cookie inconnu ou forgé ne prend jamais le verrou d'écriture
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT data, version, last_seen, expires_at FROM sessions WHERE id=? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            touched = row is not None and now - row["last_seen"] >= self.touch_interval
+            if touched:
+                touched = self._touch(conn, key, now)
+        if row is None:
+            self._forget([key])
+            with self._lock:
+                self.misses += 1
+            return None, 0, False
+        expires_at = now + self.idle_timeout if touched else row["expires_at"]
+        self._remember(key, CachedSession(row["data"], row["version"], expires_at, now))
+        with self._lock:
+            self.db_hits += 1
+        return serializer.loads(row["data"]), row["version"], touched
+
+    def _touch(self, conn, key, now):
+        """Prolonger l'inactivité, au plus toutes les touch_interval s; base occupée: ce sera la prochaine fois"""
+        previous_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout = {TOUCH_BUSY_TIMEOUT_MS}")
+        try:
+            conn.execute("UPDATE sessions SET last_seen=?, expires_at=? WHERE id=?",
+                         (now, now + self.idle_timeout, key))
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+            with self._lock:
+                self.touch_skipped += 1
+            return False
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {previous_timeout}")
+        return True
+
+    def save(self, sid, data, version, now=None):
+        now = time.time() if now is None else now
+        key = session_key(sid)
+        encoded = serializer.dumps(data)
+        with self.pool.connection() as conn:
+            try:
+                conn.execute("""
+                    INSERT INTO sessions (id, user_id, data, version, created_at, last_seen, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        user_id = excluded.user_id, data = excluded.data, version = excluded.version,
+                        last_seen = excluded.last_seen, expires_at = excluded.expires_at
+                """, (key, data.get("user_id"), encoded, version, now, now, now + self.idle_timeout))
+                self._purge_expired(conn, now)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._remember(key, CachedSession(encoded, version, now + self.idle_timeout, now))
+        with self._lock:
+            self.saved += 1
+
+    def delete(self, sid):
+        key = session_key(sid)
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id=?", (key,))
+            conn.commit()
+        self._forget([key])
+
+    def active(self, key, user_id, now=None):
+        """Vrai si la session de clé `key` est ouverte pour cet utilisateur (lu en base)"""
+        now = time.time() if now is None else now
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT 1 FROM sessions WHERE id=? AND user_id=? AND expires_at > ?",
+                               (key, user_id, now)).fetchone()
+        return row is not None
+
+    def revoke_user(self, user_id):
+        """Fermer toutes les sessions d'un utilisateur; retourne leur nombre"""
+        with self.pool.connection() as conn:
+            keys = [row["id"] for row in conn.execute("DELETE FROM sessions WHERE user_id=? RETURNING id", (user_id,))]
+            conn.commit()
+        self._forget(keys)
+        with self._lock:
+            self.revoked += len(keys)
+        return len(keys)
+
+    def _purge_expired(self, conn, now):
+        # Par petits lots, au plus toutes les PURGE_INTERVAL secondes par processus
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        conn.execute("""
+            DELETE FROM sessions WHERE id IN (
+                SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?
+            )
+        """, (now, PURGE_BATCH))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "saved": self.saved,
+                "revoked": self.revoked,
+                "touch_skipped": self.touch_skipped,
+            }
+
+
+class ServerSession(SecureCookieSession):
+    """Session dont seul l'identifiant voyage dans le cookie"""
+
+    def __init__(self, initial=None, sid=None, version=0, touched=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.version = version
+        self.new = sid is None
+        self.touched = touched
+        self.previous_sid = None
+
+    # Toujours permanente: la durée de vie est l'expiration d'inactivité côté serveur.
+    # Affecter `permanent` ne crée donc pas de session pour un simple visiteur.
+    @property
+    def permanent(self):
+        return True
+
+    @permanent.setter
+    def permanent(self, value):
+        pass
+
+    def regenerate(self):
+        """Nouvel identifiant (connexion): un identifiant fixé avant l'authentification ne sert plus"""
+        if self.sid is not None and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.version = 0
+        self.modified = True
+
+
+def parse_cookie(value):
+    """'identifiant.version' -> (identifiant, version) ou (None, 0)"""
+    sid, _, version = (value or "").partition(".")
+    if len(sid) != SID_LENGTH or not version.isdigit():
+        return None, 0
+    return sid, int(version)
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid, version = parse_cookie(request.cookies.get(self.get_cookie_name(app)))
+        if sid is None:
+            return ServerSession()
+        data, version, touched = self.store.load(sid, version)
+        if data is None:
+            return ServerSession()
+        return ServerSession(data, sid, version, touched)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.sid is not None or session.previous_sid is not None:
+                if session.sid is not None:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app),
+                                       samesite=self.get_cookie_samesite(app))
+                response.vary.add("Cookie")
+            return
+
+        if session.modified:
+            if session.sid is None:
+                session.sid = secrets.token_urlsafe(32)
+            session.version += 1
+            self.store.save(session.sid, dict(session), session.version)
+        elif not session.touched:
+            # Cookie renvoyé seulement quand l'expiration serveur a bougé
+            return
+        response.vary.add("Cookie")
+        response.set_cookie(name, f"{session.sid}.{session.version}", expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+store = None
+
+
+def login(user):
+    """Ouvrir la session d'un utilisateur authentifié; son profil y est mis en cache"""
+    session.clear()
+    session.regenerate()
+    session["user_id"] = user["id"]
+    session["profile"] = {"full_name": user["full_name"], "email": user["email"], "phone": user["phone_number"]}
+
+
+def logout():
+    """Vider la session; son identifiant est abandonné même si un message flash suit"""
+    session.clear()
+    session.regenerate()
+
+
+def current_key():
+    """Clé en base de la session courante (jeton du flux d'événements), None si elle n'est pas enregistrée"""
+    return session_key(session.sid) if session.sid is not None else None
+
+
+def is_active(user_id, key):
+    return store is not None and key is not None and store.active(key, user_id)
+
+
+def current_user():
+    """Utilisateur de la session (User) ou None, sans requête sur `users`"""
+    user_id = session.get("user_id")
+    profile = session.get("profile")
+    if user_id is None or profile is None:
+        return None
+    return User(user_id, profile["full_name"], profile["email"], profile["phone"])
+
+
+def init_app(app, pool):
+    global store
+    store = SessionStore(
+        pool,
+        idle_timeout=app.permanent_session_lifetime.total_seconds(),
+        touch_interval=app.config.get("SESSION_TOUCH_INTERVAL", TOUCH_INTERVAL),
+        max_entries=app.config.get("SESSION_CACHE_SIZE", MAX_ENTRIES),
+    )
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.cli.command("sessions-revoke")
+    @click.argument("user_id", type=int)
+    def sessions_revoke_command(user_id):
+        """Déconnecter un utilisateur de toutes ses sessions"""
+        click.echo(f"🔒 {store.revoke_user(user_id)} session(s) fermée(s) pour l'utilisateur {user_id}")
+        # Ses flux d'événements ouverts aussi (hub d'un worker ou `flask events-server`)
+        events.publish(user_id, events.CLOSE)
+
+    return store
@@ -1,7 +1,30 @@
 document.addEventListener('DOMContentLoaded', function() {
+    // ====== CLÉS D'IDEMPOTENCE ======
+    // Un double envoi (double clic, réseau lent) réutilise la même clé:
+    // le serveur rejoue alors la première réponse sans refaire l'opération.
+    document.querySelectorAll('form[data-idempotent]').forEach(form => {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = 'idempotency_key';
+        input.value = newIdempotencyKey();
+        form.appendChild(input);
+    });
+
+    // Page restaurée par le bouton retour: nouvelle opération, nouvelle clé
+    window.addEventListener('pageshow', function(e) {
+        if (e.persisted) {
+            document.querySelectorAll('form[data-idempotent] input[name="idempotency_key"]').forEach(input => {
+                input.value = newIdempotencyKey();
+            });
+        }
+    });
+
     // ====== INVESTISSEMENT AVEC FETCH ======
     const investForm = document.querySelector('form[action="/invest"]');
     if (investForm) {
+        // Conservée tant que le serveur n'a pas répondu, pour qu'un nouvel essai soit rejoué
+        let investKey = newIdempotencyKey();
+
         investForm.addEventListener('submit', async function(e) {
             e.preventDefault();
 
@@ -25,29 +48,28 @@ document.addEventListener('DOMContentLoaded', function() {
                     method: 'POST',
                     headers: { 
                         'Content-Type': 'application/x-www-form-urlencoded',
+                        'Idempotency-Key': investKey,
                     },
                     body: new URLSearchParams({ amount })
                 });
 
                 const data = await response.json();
+                if (response.status !== 409) {
+                    investKey = newIdempotencyKey();
+                }
 
                 if (data.success) {
                     showAlert(data.message, 'success');
                     
-                    // Mettre à jour le solde affiché
-                    const balanceElement = document.querySelector('.display-6');
-                    if (balanceElement && data.new_balance !== undefined) {
-                        balanceElement.textContent = data.new_balance + ' Ar';
+                    // Mettre à jour le solde affiché, puis l'historique via les API JSON
+                    if (data.new_balance !== undefined) {
+                        updateBalance(data.new_balance);
                     }
+                    refreshWallet(true);
                     
                     // Réinitialiser le formulaire
                     amountInput.value = '';
                     
-                    // Recharger la page après 2 secondes pour voir les nouvelles données
-                    setTimeout(() => {
-                        window.location.reload();
-                    }, 2000);
-                    
                 } else {
                     showAlert(data.message, 'error');
                 }
@@ -223,6 +245,180 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialiser les progress bars
     updateInvestmentProgress();
 
+    // ====== HISTORIQUE PAGINÉ (CHARGEMENT À LA DEMANDE) ======
+    const historyColumns = {
+        transactions: t => [
+            [t.type, ''],
+            [t.amount + ' Ar', t.type === 'dépôt' ? 'text-success' : 'text-danger'],
+            [t.timestamp, '']
+        ],
+        investments: inv => [
+            [inv.amount + ' Ar', ''],
+            [inv.profit + ' Ar', 'text-success'],
+            [inv.date, '']
+        ]
+    };
+
+    function renderRow(kind, item) {
+        const row = document.createElement('tr');
+        historyColumns[kind](item).forEach(([text, className]) => {
+            const cell = document.createElement('td');
+            cell.textContent = text;
+            if (className) cell.className = className;
+            row.appendChild(cell);
+        });
+        return row;
+    }
+
+    document.querySelectorAll('.load-more').forEach(button => {
+        button.addEventListener('click', async function() {
+            const kind = this.dataset.kind;
+            const tbody = document.getElementById(this.dataset.target);
+            const originalText = this.innerHTML;
+
+            try {
+                this.disabled = true;
+                this.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Chargement...';
+
+                const params = new URLSearchParams({ cursor: this.dataset.cursor });
+                const response = await fetch(`/api/history/${kind}?${params}`);
+                const data = await response.json();
+
+                if (!data.success) {
+                    showAlert(data.message, 'error');
+                    return;
+                }
+
+                data.items.forEach(item => tbody.appendChild(renderRow(kind, item)));
+
+                if (data.next_cursor) {
+                    this.dataset.cursor = data.next_cursor;
+                } else {
+                    this.remove();
+                }
+            } catch (error) {
+                console.error('Erreur:', error);
+                showAlert('Erreur de connexion. Veuillez réessayer.', 'error');
+            } finally {
+                this.disabled = false;
+                this.innerHTML = originalText;
+            }
+        });
+    });
+
+    // ====== SOLDE À JOUR (REQUÊTES CONDITIONNELLES) ======
+    // Le serveur répond 304 sans corps tant que la version du portefeuille
+    // (ETag) n'a pas changé: l'interrogation régulière ne coûte presque rien.
+    const WALLET_POLL_INTERVAL = 15000;
+    const etags = {};
+    let walletVersion = null;
+
+    async function fetchIfChanged(url) {
+        const headers = etags[url] ? { 'If-None-Match': etags[url] } : {};
+        // no-store: l'ETag est géré ici, sans le cache HTTP du navigateur
+        const response = await fetch(url, { headers, cache: 'no-store' });
+        if (response.status === 304) return null;
+        const data = await response.json();
+        if (response.ok && response.headers.get('ETag')) {
+            etags[url] = response.headers.get('ETag');
+        }
+        return data.success ? data : null;
+    }
+
+    function updateBalance(balance) {
+        document.querySelectorAll('[data-wallet-balance]').forEach(element => {
+            element.textContent = balance;
+        });
+        document.querySelectorAll('[data-wallet-max]').forEach(input => {
+            input.max = balance;
+        });
+    }
+
+    async function refreshHistory(kind) {
+        const tbody = document.getElementById(`${kind}-rows`);
+        if (!tbody) return;
+        // Autant de lignes qu'affichées: les plus anciennes repassent derrière "Voir plus"
+        const limit = Math.max(tbody.rows.length, 1);
+        const data = await fetchIfChanged(`/api/history/${kind}?limit=${limit}`);
+        if (!data) return;
+
+        tbody.replaceChildren(...data.items.map(item => renderRow(kind, item)));
+        // Tableau toujours présent, caché tant qu'il est vide
+        document.getElementById(`${kind}-table`).hidden = data.items.length === 0;
+        document.getElementById(`${kind}-empty`).hidden = data.items.length > 0;
+        const button = document.querySelector(`.load-more[data-kind="${kind}"]`);
+        if (button && data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+        } else if (button) {
+            button.remove();
+        }
+    }
+
+    async function refreshWallet(historyChanged = false) {
+        try {
+            const data = await fetchIfChanged('/api/wallet');
+            if (!data) return;
+
+            const displayed = document.querySelector('[data-wallet-balance]').textContent.trim();
+            const changed = walletVersion === null ? String(data.balance) !== displayed : data.version !== walletVersion;
+            walletVersion = data.version;
+            updateBalance(data.balance);
+            if (changed || historyChanged) {
+                await Promise.all(Object.keys(historyColumns).map(refreshHistory));
+            }
+        } catch (error) {
+            console.error('Erreur:', error);
+        }
+    }
+
+    // ====== FLUX D'ÉVÉNEMENTS (SSE) ======
+    // Poussé par le serveur après chaque dépôt, retrait ou investissement;
+    // tant que le flux est ouvert, l'interrogation de /api/wallet est suspendue.
+    let eventSource = null;
+
+    async function connectEvents() {
+        try {
+            const response = await fetch('/api/events/token', { cache: 'no-store' });
+            if (!response.ok) return; // flux désactivé: interrogation seule
+            const data = await response.json();
+
+            eventSource = new EventSource(data.url);
+            eventSource.addEventListener('open', () => refreshWallet(true));
+            eventSource.addEventListener('wallet', e => {
+                const event = JSON.parse(e.data);
+                updateBalance(event.balance);
+                walletVersion = event.version;
+                Object.keys(historyColumns).forEach(refreshHistory);
+            });
+            eventSource.addEventListener('resync', () => refreshWallet(true));
+            eventSource.addEventListener('error', () => {
+                // Jeton expiré ou serveur indisponible: nouveau jeton avant de réessayer
+                if (eventSource.readyState === EventSource.CLOSED) {
+                    eventSource.close();
+                    eventSource = null;
+                    setTimeout(connectEvents, WALLET_POLL_INTERVAL);
+                }
+            });
+        } catch (error) {
+            console.error('Erreur:', error);
+            setTimeout(connectEvents, WALLET_POLL_INTERVAL);
+        }
+    }
+
+    function eventsOpen() {
+        return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+    }
+
+    if (document.querySelector('[data-wallet-balance]')) {
+        setInterval(() => {
+            if (document.visibilityState === 'visible' && !eventsOpen()) refreshWallet();
+        }, WALLET_POLL_INTERVAL);
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'visible' && !eventsOpen()) refreshWallet();
+        });
+        if (window.EventSource) connectEvents();
+    }
+
     // ====== GESTION DES ERREURS RÉSEAU ======
     window.addEventListener('online', function() {
         showAlert('Connexion rétablie', 'success');
@@ -246,6 +442,14 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // ====== FONCTIONS GLOBALES ======
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
 function formatCurrency(amount) {
     return new Intl.NumberFormat('fr-FR', {
         style: 'currency',
@@ -0,0 +1,588 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+    import psycopg2.pool
+    from psycopg2 import errors
+except ImportError:  # dépendance optionnelle: seulement pour DATABASE_URL=postgresql://
+    psycopg2 = None
+
+import admin_data
+import archive
+import dashboard_data
+import export
+import history
+import ledger
+import references
+import search
+import wallet
+from db import PoolTimeout
+from storage import DuplicateUser
+
+# Mêmes colonnes que le schéma SQLite (dates en TEXT 'YYYY-MM-DD HH:MM:SS'):
+# curseurs de pagination, templates et JSON restent identiques d'un backend à l'autre.
+NOW_TEXT = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS users (
+        id BIGSERIAL PRIMARY KEY,
+        full_name TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        phone_number TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        created_at TEXT DEFAULT {NOW_TEXT}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS wallets (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL UNIQUE REFERENCES users(id),
+        balance BIGINT NOT NULL DEFAULT 0 CHECK (balance >= 0)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL REFERENCES users(id),
+        type TEXT NOT NULL,
+        amount BIGINT NOT NULL,
+        reference TEXT CONSTRAINT transactions_reference_key UNIQUE,
+        status TEXT,
+        timestamp TEXT
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS investments (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL REFERENCES users(id),
+        amount BIGINT NOT NULL,
+        date TEXT NOT NULL,
+        profit BIGINT,
+        status TEXT,
+        reference TEXT CONSTRAINT investments_reference_key UNIQUE,
+        created_at TEXT DEFAULT {NOW_TEXT}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_logins (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT REFERENCES users(id),
+        login_time TEXT,
+        ip_address TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions(user_id, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS idx_investments_user_date ON investments(user_id, date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_logins_login_time ON user_logins(login_time)",
+    "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)",
+    *export.INDEXES,
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_ledger ON transactions(user_id, id) INCLUDE (type, amount)",
+    # Recherche admin par préfixe, insensible à la casse
+    "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users(lower(email) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_users_phone_lower ON users(lower(phone_number) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_users_full_name_lower ON users(lower(full_name) text_pattern_ops)",
+    """
+    CREATE TABLE IF NOT EXISTS ledger_snapshots (
+        user_id BIGINT PRIMARY KEY REFERENCES users(id),
+        last_transaction_id BIGINT NOT NULL,
+        balance BIGINT NOT NULL,
+        taken_at TEXT NOT NULL
+    )
+    """,
+    # Journal en ajout seul, comme les triggers SQLite de ledger.APPEND_ONLY_TRIGGERS
+    """
+    CREATE OR REPLACE FUNCTION transactions_append_only() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' AND EXISTS (SELECT 1 FROM ledger_snapshots
+                                        WHERE user_id = OLD.user_id AND last_transaction_id >= OLD.id) THEN
+            RETURN OLD;
+        END IF;
+        RAISE EXCEPTION 'transactions: journal en ajout seul (% interdit)', TG_OP;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_transactions_append_only ON transactions",
+    """
+    CREATE TRIGGER trg_transactions_append_only BEFORE UPDATE OR DELETE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION transactions_append_only()
+    """,
+    # Incrémentée à chaque mouvement: ETag de /api/wallet et /api/history
+    "ALTER TABLE wallets ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0",
+    "DROP TRIGGER IF EXISTS trg_transactions_no_truncate ON transactions",
+    """
+    CREATE TRIGGER trg_transactions_no_truncate BEFORE TRUNCATE ON transactions
+    FOR EACH STATEMENT EXECUTE FUNCTION transactions_append_only()
+    """,
+]
+
+# Recherche par sous-chaîne (ILIKE '%...%'): index GIN trigrammes de pg_trgm,
+# l'équivalent des tables FTS5 trigram de SQLite. Créés seulement si l'extension
+# est disponible; sinon la recherche se limite aux préfixes (SEARCH_PREFIX_SCHEMA).
+TRIGRAM_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_users_phone_trgm ON users USING gin (phone_number gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_reference_trgm ON transactions USING gin (reference gin_trgm_ops)",
+]
+SEARCH_PREFIX_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_transactions_reference_lower ON transactions(lower(reference) text_pattern_ops)",
+]
+
+# Verrou consultatif pris pendant la création du schéma (un seul worker à la fois)
+SCHEMA_LOCK_ID = 0x414E414D
+# Index UNIQUE des colonnes reference (noms fixés dans SCHEMA)
+REFERENCE_CONSTRAINTS = {"transactions_reference_key", "investments_reference_key"}
+
+SNAPSHOT_SQL = f"""
+SELECT u.id, u.full_name, u.phone_number, u.email,
+       COALESCE(w.balance, 0) AS balance,
+       (SELECT COALESCE(json_agg(t), '[]')
+        FROM (SELECT id, type, amount, reference, status, timestamp FROM transactions
+              WHERE user_id = u.id ORDER BY timestamp DESC, id DESC
+              LIMIT {dashboard_data.RECENT_TRANSACTIONS + 1}) t) AS transactions,
+       (SELECT COALESCE(json_agg(i), '[]')
+        FROM (SELECT id, amount, date, profit, status, reference FROM investments
+              WHERE user_id = u.id ORDER BY date DESC, id DESC
+              LIMIT {dashboard_data.RECENT_INVESTMENTS + 1}) i) AS investments
+FROM users u
+LEFT JOIN wallets w ON w.user_id = u.id
+WHERE u.id = %s
+"""
+
+TRANSACTION_SEARCH_SQL = """
+SELECT t.id, t.reference, t.type, t.amount, t.status, t.timestamp, t.user_id, u.full_name
+FROM transactions t LEFT JOIN users u ON u.id = t.user_id
+WHERE {condition}
+ORDER BY t.id DESC LIMIT %s
+"""
+
+
+class PostgresStorage:
+    """Backend PostgreSQL: pool de connexions partagé par les threads, verrous de ligne sur wallets.
+
+    Le pool est recréé après un fork (gunicorn --preload): une connexion
+    libpq ne doit jamais être partagée entre deux processus.
+    """
+
+    name = "postgresql"
+
+    def __init__(self, url, max_size=10, timeout=10.0, lock_timeout=2.0):
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 est requis pour DATABASE_URL=postgresql://... (pip install -r requirements-postgres.txt)")
+        self.url = url
+        self.max_size = max_size
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self._pool = None
+        self._pid = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool lève une erreur quand il est vide: le sémaphore fait attendre
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._in_use = 0
+        self._waits = 0
+        self._timeouts = 0
+        # pg_trgm installé ? (None: pas encore vérifié dans ce processus)
+        self.trigram = None
+        self.users = PostgresUsers(self)
+        self.wallets = PostgresWallets(self)
+        self.ledger = PostgresLedger(self)
+        self.logins = PostgresLogins(self)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = psycopg2.pool.ThreadedConnectionPool(0, self.max_size, self.url)
+                self._pid = os.getpid()
+            return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Connexion empruntée pour une opération; `with conn:` délimite la transaction"""
+        if not self._slots.acquire(blocking=False):
+            with self._pool_lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._pool_lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"Pool PostgreSQL saturé ({self.max_size} connexions)")
+        pool = self._get_pool()
+        try:
+            conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._pool_lock:
+            self._in_use += 1
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                self._in_use -= 1
+            broken = conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+            if not broken and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            pool.putconn(conn, close=bool(broken))
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self):
+        """Curseur (lignes en dict) dans une transaction validée à la sortie du bloc"""
+        with self.connection() as conn:
+            with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                yield cur
+
+    def ensure_schema(self):
+        with self.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+            for statement in SCHEMA:
+                cur.execute(statement)
+            # CREATE EXTENSION demande un droit que le rôle de l'application n'a pas toujours
+            cur.execute("SAVEPOINT trigram")
+            try:
+                for statement in TRIGRAM_SCHEMA:
+                    cur.execute(statement)
+                self.trigram = True
+            except psycopg2.Error:
+                cur.execute("ROLLBACK TO SAVEPOINT trigram")
+                self.trigram = False
+                for statement in SEARCH_PREFIX_SCHEMA:
+                    cur.execute(statement)
+
+    def _has_trigram(self):
+        if self.trigram is None:
+            with self.cursor() as cur:
+                cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                self.trigram = cur.fetchone() is not None
+        return self.trigram
+
+    def search(self, text, limit=search.DEFAULT_LIMIT):
+        """Sous-chaîne insensible à la casse (ILIKE, index GIN trigrammes), triée par id.
+
+        Comme avec FTS5: en dessous de MIN_QUERY_LENGTH caractères, ou sans
+        pg_trgm, seule la recherche par préfixe (index text_pattern_ops) est faite.
+        """
+        text = (text or "").strip()
+        limit = max(1, min(int(limit), search.MAX_LIMIT))
+        start = time.perf_counter()
+        users, transactions = [], []
+        if len(text) < search.MIN_QUERY_LENGTH:
+            if text:
+                users = self.users.page(text, limit=limit)[0]
+        elif self._has_trigram():
+            pattern = "%" + admin_data.prefix_pattern(text)
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT id, full_name, email, phone_number, created_at FROM users
+                    WHERE full_name ILIKE %(p)s OR email ILIKE %(p)s OR phone_number ILIKE %(p)s
+                    ORDER BY id DESC LIMIT %(limit)s
+                """, {"p": pattern, "limit": limit})
+                users = cur.fetchall()
+                cur.execute(TRANSACTION_SEARCH_SQL.format(condition="t.reference ILIKE %s"), (pattern, limit))
+                transactions = cur.fetchall()
+        else:
+            users = self.users.page(text, limit=limit)[0]
+            with self.cursor() as cur:
+                cur.execute(TRANSACTION_SEARCH_SQL.format(condition="lower(t.reference) LIKE %s"),
+                            (admin_data.prefix_pattern(text.lower()), limit))
+                transactions = cur.fetchall()
+        return {
+            "query": text,
+            "users": [dict(row) for row in users],
+            "transactions": [dict(row) for row in transactions],
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def export(self, table, filters):
+        """Curseur nommé (côté serveur): PostgreSQL envoie les lignes par lots de itersize"""
+        sql, params = export.export_sql(table, filters, param="%s")
+        with self.connection() as conn:
+            with conn, conn.cursor(name=f"export_{table}") as cur:
+                cur.itersize = export.BATCH_SIZE
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(export.BATCH_SIZE)
+                    if not rows:
+                        return
+                    yield rows
+
+    def stats(self):
+        with self._pool_lock:
+            return {
+                "backend": self.name,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
+
+
+class PostgresUsers:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _one(self, sql, params):
+        with self.storage.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+        return dict(row) if row else None
+
+    def find_by_email(self, email):
+        return self._one("SELECT * FROM users WHERE email=%s", (email,))
+
+    def find_by_phone(self, phone):
+        return self._one("SELECT * FROM users WHERE phone_number=%s", (phone,))
+
+    def find_by_login(self, login_input):
+        return self._one("SELECT * FROM users WHERE email=%s OR phone_number=%s", (login_input, login_input))
+
+    def create(self, full_name, email, phone, password_hash):
+        try:
+            with self.storage.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO users(full_name, email, phone_number, password) VALUES (%s, %s, %s, %s) RETURNING id",
+                    (full_name, email, phone, password_hash)
+                )
+                user_id = cur.fetchone()["id"]
+                cur.execute("INSERT INTO wallets(user_id, balance) VALUES (%s, 0)", (user_id,))
+        except errors.UniqueViolation as e:
+            raise DuplicateUser(str(e)) from e
+        return user_id
+
+    def update_password(self, user_id, password_hash):
+        with self.storage.cursor() as cur:
+            cur.execute("UPDATE users SET password=%s WHERE id=%s", (password_hash, user_id))
+
+    def page(self, query=None, after=None, limit=admin_data.USER_PAGE_SIZE):
+        query = (query or "").strip()
+        conditions, params = [], {"limit": limit + 1}
+        if query:
+            conditions.append("(lower(email) LIKE %(p)s OR lower(phone_number) LIKE %(p)s "
+                              "OR lower(full_name) LIKE %(p)s)")
+            params["p"] = admin_data.prefix_pattern(query.lower())
+        if after is not None:
+            conditions.append("id < %(after)s")
+            params["after"] = int(after)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.storage.cursor() as cur:
+            cur.execute(f"{admin_data.USER_COLUMNS}{where} ORDER BY id DESC LIMIT %(limit)s", params)
+            rows = [dict(row) for row in cur.fetchall()]
+        next_after = rows[limit - 1]["id"] if len(rows) > limit else None
+        return rows[:limit], next_after
+
+
+class PostgresWallets:
+    """Mutations sous SELECT ... FOR UPDATE: seul le portefeuille concerné est verrouillé,
+    les écritures sur d'autres portefeuilles avancent en parallèle."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def balance(self, user_id):
+        with self.storage.cursor() as cur:
+            cur.execute("SELECT balance FROM wallets WHERE user_id=%s", (user_id,))
+            row = cur.fetchone()
+        return row["balance"] if row else 0
+
+    def version(self, user_id):
+        with self.storage.cursor() as cur:
+            cur.execute("SELECT version FROM wallets WHERE user_id=%s", (user_id,))
+            row = cur.fetchone()
+        return row["version"] if row else 0
+
+    def state(self, user_id):
+        """(solde, version)"""
+        with self.storage.cursor() as cur:
+            cur.execute("SELECT balance, version FROM wallets WHERE user_id=%s", (user_id,))
+            row = cur.fetchone()
+        return (row["balance"], row["version"]) if row else (0, 0)
+
+    def _mutate(self, user_id, amount, tx_type, reference, debit, investment_profit=None):
+        start = time.perf_counter()
+        lock_wait = 0.0
+        try:
+            with self.storage.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (f"{int(self.storage.lock_timeout * 1000)}ms",))
+                cur.execute("SELECT balance FROM wallets WHERE user_id=%s FOR UPDATE", (user_id,))
+                row = cur.fetchone()
+                lock_wait = time.perf_counter() - start
+                if row is None:
+                    if debit:
+                        raise wallet.InsufficientFunds("Solde insuffisant")
+                    raise wallet.WalletNotFound(f"Aucun portefeuille pour l'utilisateur {user_id}")
+                if debit and row["balance"] < amount:
+                    raise wallet.InsufficientFunds("Solde insuffisant")
+
+                cur.execute("UPDATE wallets SET balance = balance + %s, version = version + 1 WHERE user_id=%s "
+                            "RETURNING balance, version", (-amount if debit else amount, user_id))
+                row = cur.fetchone()
+                now = datetime.now()
+                cur.execute(
+                    "INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    (user_id, tx_type, amount, reference, "réussi", now.strftime("%Y-%m-%d %H:%M:%S"))
+                )
+                if investment_profit is not None:
+                    cur.execute(
+                        "INSERT INTO investments (user_id, amount, date, profit, status, reference) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)",
+                        (user_id, amount, now.strftime("%Y-%m-%d"), investment_profit, "actif", reference)
+                    )
+        except wallet.InsufficientFunds:
+            wallet.record(insufficient_funds=1, lock_wait_seconds=lock_wait, lock_wait_max_seconds=lock_wait)
+            raise
+        except errors.LockNotAvailable as e:
+            wallet.record(busy_failures=1, lock_wait_seconds=time.perf_counter() - start)
+            raise wallet.WalletBusy("Portefeuille occupé, veuillez réessayer") from e
+        except errors.UniqueViolation as e:
+            if e.diag.constraint_name in REFERENCE_CONSTRAINTS:
+                raise references.ReferenceCollision(str(e)) from e
+            raise
+
+        wallet.record(mutations=1, lock_wait_seconds=lock_wait, lock_wait_max_seconds=lock_wait)
+        return wallet.MutationResult(balance=row["balance"], reference=reference, lock_wait=lock_wait, attempts=1,
+                                     version=row["version"])
+
+    def credit(self, user_id, amount, tx_type, reference):
+        return self._mutate(user_id, amount, tx_type, reference, False)
+
+    def debit(self, user_id, amount, tx_type, reference):
+        return self._mutate(user_id, amount, tx_type, reference, True)
+
+    def invest(self, user_id, amount, reference, daily_profit):
+        return self._mutate(user_id, amount, "investissement", reference, True, investment_profit=daily_profit)
+
+    def stats(self):
+        return wallet.stats()
+
+
+class PostgresLedger:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def snapshot(self, user_id):
+        with self.storage.cursor() as cur:
+            cur.execute(SNAPSHOT_SQL, (user_id,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        # json_agg est décodé par psycopg2
+        return dashboard_data.build_snapshot(row, row["transactions"], row["investments"])
+
+    def page(self, kind, user_id, cursor=None, limit=history.PAGE_SIZE):
+        limit = history.clamp_limit(limit)
+        params = history.page_params(user_id, cursor, limit)
+        with self.storage.cursor() as cur:
+            cur.execute(history.page_sql(kind, after=bool(cursor), param="%s"), params)
+            rows = [dict(row) for row in cur.fetchall()]
+        return rows[:limit], history.next_cursor(kind, rows, limit)
+
+    def summary(self, days=admin_data.SUMMARY_DAYS):
+        """Agrégats calculés à la lecture (SUM de bigint -> numeric: recasté en bigint).
+
+        Écart voulu avec SQLite (platform_totals/platform_daily, migration 4):
+        ici un trigger mettrait à jour la même ligne à chaque mouvement, et son
+        verrou de ligne, tenu jusqu'au COMMIT, sérialiserait les écritures que
+        SELECT ... FOR UPDATE laisse avancer en parallèle. La lecture reste
+        bornée à la fenêtre de `days` par les index sur timestamp et created_at.
+        """
+        with self.storage.cursor() as cur:
+            cur.execute("""
+                SELECT (SELECT COUNT(*) FROM users) AS user_count,
+                       (SELECT COALESCE(SUM(balance), 0)::bigint FROM wallets) AS total_balance
+            """)
+            totals = cur.fetchone()
+            cur.execute("""
+                WITH since AS (SELECT to_char(now() - make_interval(days => %(days)s), 'YYYY-MM-DD') AS day),
+                tx AS (
+                    SELECT left(timestamp, 10) AS day,
+                           COUNT(*) FILTER (WHERE type = 'dépôt') AS deposit_count,
+                           COALESCE(SUM(amount) FILTER (WHERE type = 'dépôt'), 0)::bigint AS deposit_volume,
+                           COUNT(*) FILTER (WHERE type = 'retrait') AS withdrawal_count,
+                           COALESCE(SUM(amount) FILTER (WHERE type = 'retrait'), 0)::bigint AS withdrawal_volume,
+                           COUNT(*) FILTER (WHERE type = 'investissement') AS investment_count,
+                           COALESCE(SUM(amount) FILTER (WHERE type = 'investissement'), 0)::bigint AS investment_volume
+                    FROM transactions
+                    WHERE timestamp > (SELECT day FROM since)
+                    GROUP BY 1
+                ),
+                signups AS (
+                    SELECT left(created_at, 10) AS day, COUNT(*) AS new_users
+                    FROM users WHERE created_at > (SELECT day FROM since)
+                    GROUP BY 1
+                )
+                SELECT COALESCE(tx.day, signups.day) AS day,
+                       COALESCE(signups.new_users, 0) AS new_users,
+                       COALESCE(deposit_count, 0) AS deposit_count, COALESCE(deposit_volume, 0) AS deposit_volume,
+                       COALESCE(withdrawal_count, 0) AS withdrawal_count,
+                       COALESCE(withdrawal_volume, 0) AS withdrawal_volume,
+                       COALESCE(investment_count, 0) AS investment_count,
+                       COALESCE(investment_volume, 0) AS investment_volume
+                FROM tx FULL JOIN signups ON signups.day = tx.day
+                ORDER BY 1 DESC
+            """, {"days": int(days)})
+            daily = [dict(row) for row in cur.fetchall()]
+        return {"user_count": totals["user_count"], "total_balance": totals["total_balance"], "daily": daily}
+
+    def balances(self, after, size):
+        with self.storage.cursor() as cur:
+            cur.execute(ledger.balances_sql(param="%s"), (after, size))
+            return [dict(row) for row in cur.fetchall()]
+
+    def snapshot_balances(self, after, size):
+        """Les mouvements d'un utilisateur sont écrits sous le verrou de son portefeuille:
+        leurs ids sont validés dans l'ordre, le MAX(id) visible couvre tous les précédents"""
+        with self.storage.cursor() as cur:
+            cur.execute(ledger.balances_sql(param="%s"), (after, size))
+            rows = [dict(row) for row in cur.fetchall()]
+            snapshots = ledger.new_snapshots(rows)
+            if snapshots:
+                cur.executemany(ledger.upsert_sql(param="%s"), snapshots)
+        return rows
+
+    def archivable(self, before, limit):
+        with self.storage.cursor() as cur:
+            cur.execute(archive.archivable_sql("transactions", param="%s"), (before, limit))
+            return [tuple(row.values()) for row in cur.fetchall()]
+
+    def delete(self, ids):
+        with self.storage.cursor() as cur:
+            cur.execute(archive.delete_sql("transactions", len(ids), param="%s"), ids)
+
+
+class PostgresLogins:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def record_many(self, events):
+        with self.storage.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur, "INSERT INTO user_logins (user_id, login_time, ip_address) VALUES %s", events
+            )
+
+    def recent(self, limit=50):
+        with self.storage.cursor() as cur:
+            cur.execute("""
+                SELECT u.full_name, l.login_time, l.ip_address
+                FROM user_logins l
+                JOIN users u ON l.user_id = u.id
+                ORDER BY l.login_time DESC
+                LIMIT %s
+            """, (limit,))
+            return [dict(row) for row in cur.fetchall()]
+
+    def archivable(self, before, limit):
+        with self.storage.cursor() as cur:
+            cur.execute(archive.archivable_sql("user_logins", param="%s"), (before, limit))
+            return [tuple(row.values()) for row in cur.fetchall()]
+
+    def delete(self, ids):
+        with self.storage.cursor() as cur:
+            cur.execute(archive.delete_sql("user_logins", len(ids), param="%s"), ids)
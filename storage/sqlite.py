@@ -0,0 +1,206 @@
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import has_app_context
+
+import admin_data
+import archive
+import dashboard_data
+import db
+import export
+import history
+import ledger
+import search
+import wallet
+from storage import DuplicateUser
+
+
+class SqliteStorage:
+    """Backend SQLite: les requêtes existantes (wallet, history, dashboard_data...) derrière les dépôts"""
+
+    name = "sqlite"
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.users = SqliteUsers(self)
+        self.wallets = SqliteWallets(self)
+        self.ledger = SqliteLedger(self)
+        self.logins = SqliteLogins(self)
+
+    @contextmanager
+    def connection(self):
+        # Dans une requête: la connexion du contexte, rendue au pool au teardown
+        if has_app_context():
+            yield db.get_db()
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+
+    def ensure_schema(self):
+        """Le schéma SQLite est géré par migrations.migrate()"""
+
+    def search(self, text, limit=search.DEFAULT_LIMIT):
+        with self.connection() as conn:
+            return search.search(conn, text, limit)
+
+    def export(self, table, filters):
+        """Lots de lignes sur une connexion du pool: le flux survit à la fin de la requête"""
+        with self.pool.connection() as conn:
+            yield from export.fetch_rows(conn, table, filters)
+
+    def stats(self):
+        return {"backend": self.name, **self.pool.stats()}
+
+
+class SqliteUsers:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _one(self, sql, params):
+        with self.storage.connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def find_by_email(self, email):
+        return self._one("SELECT * FROM users WHERE email=?", (email,))
+
+    def find_by_phone(self, phone):
+        return self._one("SELECT * FROM users WHERE phone_number=?", (phone,))
+
+    def find_by_login(self, login_input):
+        """Par email ou téléphone"""
+        return self._one("SELECT * FROM users WHERE email=? OR phone_number=?", (login_input, login_input))
+
+    def create(self, full_name, email, phone, password_hash):
+        """Créer l'utilisateur et son portefeuille vide; retourne l'id"""
+        with self.storage.connection() as conn:
+            try:
+                cursor = conn.execute(
+                    "INSERT INTO users(full_name, email, phone_number, password) VALUES (?, ?, ?, ?)",
+                    (full_name, email, phone, password_hash)
+                )
+                user_id = cursor.lastrowid
+                conn.execute("INSERT INTO wallets(user_id, balance) VALUES (?, ?)", (user_id, 0))
+                conn.commit()
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                raise DuplicateUser(str(e)) from e
+            except Exception:
+                conn.rollback()
+                raise
+        return user_id
+
+    def update_password(self, user_id, password_hash):
+        with self.storage.connection() as conn:
+            conn.execute("UPDATE users SET password=? WHERE id=?", (password_hash, user_id))
+            conn.commit()
+
+    def page(self, query=None, after=None, limit=admin_data.USER_PAGE_SIZE):
+        with self.storage.connection() as conn:
+            rows, next_after = admin_data.fetch_users(conn, query, after, limit)
+        return [dict(row) for row in rows], next_after
+
+
+class SqliteWallets:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def balance(self, user_id):
+        with self.storage.connection() as conn:
+            row = conn.execute("SELECT balance FROM wallets WHERE user_id=?", (user_id,)).fetchone()
+        return row["balance"] if row else 0
+
+    def version(self, user_id):
+        with self.storage.connection() as conn:
+            row = conn.execute("SELECT version FROM wallets WHERE user_id=?", (user_id,)).fetchone()
+        return row["version"] if row else 0
+
+    def state(self, user_id):
+        """(solde, version)"""
+        with self.storage.connection() as conn:
+            row = conn.execute(wallet.STATE_SQL, (user_id,)).fetchone()
+        return (row["balance"], row["version"]) if row else (0, 0)
+
+    def credit(self, user_id, amount, tx_type, reference):
+        with self.storage.connection() as conn:
+            return wallet.credit(conn, user_id, amount, tx_type, reference)
+
+    def debit(self, user_id, amount, tx_type, reference):
+        with self.storage.connection() as conn:
+            return wallet.debit(conn, user_id, amount, tx_type, reference)
+
+    def invest(self, user_id, amount, reference, daily_profit):
+        """Débit et ligne d'investissement dans la même transaction"""
+        with self.storage.connection() as conn:
+            return wallet.debit(conn, user_id, amount, "investissement", reference, extra=[(
+                "INSERT INTO investments (user_id, amount, date, profit, status, reference) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, amount, datetime.now().strftime("%Y-%m-%d"), daily_profit, "actif", reference)
+            )])
+
+    def stats(self):
+        return wallet.stats()
+
+
+class SqliteLedger:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def snapshot(self, user_id):
+        with self.storage.connection() as conn:
+            return dashboard_data.load_snapshot(conn, user_id)
+
+    def page(self, kind, user_id, cursor=None, limit=history.PAGE_SIZE):
+        with self.storage.connection() as conn:
+            return history.fetch_page(conn, kind, user_id, cursor, limit)
+
+    def summary(self, days=admin_data.SUMMARY_DAYS):
+        with self.storage.connection() as conn:
+            return admin_data.platform_summary(conn, days)
+
+    def balances(self, after, size):
+        with self.storage.connection() as conn:
+            return ledger.fetch_balances(conn, after, size)
+
+    def snapshot_balances(self, after, size):
+        with self.storage.connection() as conn:
+            return ledger.snapshot_balances(conn, after, size)
+
+    def archivable(self, before, limit):
+        with self.storage.connection() as conn:
+            return archive.fetch_archivable(conn, "transactions", before, limit)
+
+    def delete(self, ids):
+        """Seuls les mouvements couverts par un instantané passent le trigger"""
+        with self.storage.connection() as conn:
+            archive.delete_rows(conn, "transactions", ids)
+
+
+class SqliteLogins:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def record_many(self, events):
+        """events: [(user_id, login_time, ip_address)], en une transaction"""
+        with self.storage.connection() as conn:
+            conn.executemany("INSERT INTO user_logins (user_id, login_time, ip_address) VALUES (?, ?, ?)", events)
+            conn.commit()
+
+    def recent(self, limit=50):
+        with self.storage.connection() as conn:
+            rows = conn.execute("""
+                SELECT u.full_name, l.login_time, l.ip_address
+                FROM user_logins l
+                JOIN users u ON l.user_id = u.id
+                ORDER BY l.login_time DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def archivable(self, before, limit):
+        with self.storage.connection() as conn:
+            return archive.fetch_archivable(conn, "user_logins", before, limit)
+
+    def delete(self, ids):
+        with self.storage.connection() as conn:
+            archive.delete_rows(conn, "user_logins", ids)
@@ -0,0 +1,55 @@
+import importlib
+import itertools
+import os
+import sys
+
+import pytest
+
+# Modules de l'application à la racine du dépôt, comme pour bench/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+_phones = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app.py importé une fois, sur une base SQLite temporaire, sans threads de fond"""
+    tmp = tmp_path_factory.mktemp("app")
+    env = {
+        "DATABASE_URL": f"sqlite:///{tmp / 'anamboary.db'}",
+        "DB_PATH": str(tmp / "anamboary.db"),
+        "MAIL_OUTBOX_WORKER": "off",
+        "PASSWORD_HASH_WORKERS": "0",
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "RATELIMIT_ENABLED": "False",
+        "EVENTS_URL": "",
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        module = importlib.import_module("app")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    module.app.config["TESTING"] = True
+    return module
+
+
+@pytest.fixture
+def login(app_module):
+    """login() -> client de test connecté à un nouvel utilisateur, avec son identifiant"""
+    def login(balance=0):
+        n = next(_phones)
+        client = app_module.app.test_client()
+        email = f"user{n}@test.mg"
+        client.post("/register", data={"full_name": f"User {n}", "email": email, "phone": f"034{n:07d}",
+                                       "password": "secret123", "confirm_password": "secret123"})
+        client.post("/login", data={"login_input": email, "password": "secret123"})
+        user_id = app_module.storage.backend.users.find_by_email(email)["id"]
+        if balance:
+            app_module.storage.backend.wallets.credit(user_id, balance, "dépôt", f"SEED-{n}")
+        return client, user_id
+    return login
@@ -0,0 +1,73 @@
+import pytest
+
+import admin_data
+import migrations
+from db import ConnectionPool
+
+
+@pytest.fixture
+def conn(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "admin.db"), max_size=1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        yield conn
+    pool.close_all()
+
+
+def add_users(conn, *names):
+    ids = []
+    for n, name in enumerate(names):
+        cursor = conn.execute("INSERT INTO users(full_name, email, phone_number, password) VALUES (?, ?, ?, 'x')",
+                              (name, f"u{n}@test.mg", f"0340000{n:03d}"))
+        ids.append(cursor.lastrowid)
+    conn.commit()
+    return ids
+
+
+def names(rows):
+    return sorted(row["full_name"] for row in rows)
+
+
+def test_prefix_pattern_escapes_like_wildcards():
+    assert admin_data.prefix_pattern("50%_a\\") == "50\\%\\_a\\\\%"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("100%", ["100% Rakoto"]),
+    ("a_b", ["a_b Jean"]),
+    ("a\\", ["a\\b Paul"]),
+    ("A", ["aXb Marie", "a\\b Paul", "a_b Jean"]),
+])
+def test_search_takes_wildcards_literally(conn, query, expected):
+    add_users(conn, "100% Rakoto", "1000 Rabe", "a_b Jean", "aXb Marie", "a\\b Paul")
+    rows, next_after = admin_data.fetch_users(conn, query)
+    assert names(rows) == expected
+    assert next_after is None
+
+
+def test_keyset_pages_cover_every_user_once(conn):
+    ids = add_users(conn, *(f"User {n}" for n in range(7)))
+    seen, after, pages = [], None, 0
+    while True:
+        rows, after = admin_data.fetch_users(conn, after=after, limit=3)
+        seen += [row["id"] for row in rows]
+        pages += 1
+        if after is None:
+            break
+    assert seen == sorted(ids, reverse=True)
+    assert pages == 3
+
+
+def test_keyset_page_with_search(conn):
+    add_users(conn, "Rabe 1", "Other", "Rabe 2", "Rabe 3")
+    first, after = admin_data.fetch_users(conn, "rabe", limit=2)
+    assert names(first) == ["Rabe 2", "Rabe 3"]
+    rest, after = admin_data.fetch_users(conn, "rabe", after=after, limit=2)
+    assert names(rest) == ["Rabe 1"]
+    assert after is None
+
+
+def test_after_is_an_exclusive_bound(conn):
+    ids = add_users(conn, "A", "B", "C")
+    rows, _ = admin_data.fetch_users(conn, after=ids[2])
+    assert [row["id"] for row in rows] == [ids[1], ids[0]]
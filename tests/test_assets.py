@@ -0,0 +1,20 @@
+import os
+import stat
+
+import assets
+
+
+def test_build_writes_world_readable_files(tmp_path):
+    (tmp_path / "style.css").write_text("body { color: black }")
+    entries = assets.build(str(tmp_path))
+
+    dist = tmp_path / assets.DIST
+    target = dist / entries["style.css"]
+    for path in (target, dist / (entries["style.css"] + ".gz"), dist / assets.MANIFEST):
+        assert stat.S_IMODE(os.stat(path).st_mode) == assets.FILE_MODE
+    assert assets.load_manifest(str(tmp_path)) == entries
+
+
+def test_load_manifest_without_build(tmp_path):
+    assert assets.load_manifest(str(tmp_path)) == {}
+    assert not (tmp_path / assets.DIST).exists()
@@ -0,0 +1,54 @@
+import time
+
+import dashboard_data
+
+
+def snapshot(user_id, balance=0):
+    return dashboard_data.DashboardSnapshot(user_id, "Test", "034", "t@test", balance,
+                                            [], None, [], None, time.time())
+
+
+def test_put_then_get():
+    cache = dashboard_data.SnapshotCache(ttl=10)
+    cache.put(snapshot(1, 100), cache.generation(1))
+    assert cache.get(1).balance == 100
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_snapshot_loaded_before_a_write_is_not_cached():
+    cache = dashboard_data.SnapshotCache(ttl=10)
+    generation = cache.generation(1)
+    stale = snapshot(1, 100)
+    # L'écriture et son invalidation arrivent pendant la lecture
+    cache.invalidate(1)
+    cache.put(stale, generation)
+    assert cache.get(1) is None
+    assert cache.stats()["dropped"] == 1
+
+    cache.put(snapshot(1, 50), cache.generation(1))
+    assert cache.get(1).balance == 50
+
+
+def test_generations_survive_pruning():
+    cache = dashboard_data.SnapshotCache(ttl=10, max_entries=2)
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    for user_id in (2, 3, 4):
+        cache.invalidate(user_id)
+    cache.put(snapshot(1), generation)
+    assert cache.get(1) is None
+
+
+def test_get_snapshot_drops_a_load_raced_by_a_write(app_module, login, monkeypatch):
+    _, user_id = login(balance=100)
+    load = app_module.storage.backend.ledger.snapshot
+
+    def racing_load(uid):
+        result = load(uid)
+        dashboard_data.invalidate(uid)
+        return result
+    monkeypatch.setattr(app_module.storage.backend.ledger, "snapshot", racing_load)
+    dashboard_data.cache.invalidate(user_id)
+    assert dashboard_data.get_snapshot(user_id).balance == 100
+    assert dashboard_data.cache.get(user_id) is None
@@ -0,0 +1,28 @@
+def test_wallet_etag_follows_every_write(app_module, login):
+    client, user_id = login(balance=500)
+    first = client.get("/api/wallet")
+    assert first.get_json()["balance"] == 500
+    tag = first.headers["ETag"]
+
+    assert client.get("/api/wallet", headers={"If-None-Match": tag}).status_code == 304
+
+    # Écriture qui ne passe pas par ce processus (autre worker): vue dès la requête suivante
+    app_module.storage.backend.wallets.credit(user_id, 250, "dépôt", f"ETAG-{user_id}")
+    fresh = client.get("/api/wallet", headers={"If-None-Match": tag})
+    assert fresh.status_code == 200
+    data = fresh.get_json()
+    assert data["balance"] == 750
+    assert fresh.headers["ETag"] == f'"wallet-{user_id}-{data["version"]}"'
+
+
+def test_history_etag(app_module, login):
+    client, user_id = login(balance=500)
+    first = client.get("/api/history/transactions")
+    assert len(first.get_json()["items"]) == 1
+    tag = first.headers["ETag"]
+    assert client.get("/api/history/transactions", headers={"If-None-Match": tag}).status_code == 304
+
+    app_module.storage.backend.wallets.debit(user_id, 100, "retrait", f"ETAG-H-{user_id}")
+    fresh = client.get("/api/history/transactions", headers={"If-None-Match": tag})
+    assert fresh.status_code == 200
+    assert len(fresh.get_json()["items"]) == 2
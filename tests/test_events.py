@@ -0,0 +1,57 @@
+import socket
+import time
+
+import pytest
+
+import events
+
+PORT = 18511
+
+
+def open_stream(token):
+    conn = socket.create_connection(("127.0.0.1", PORT), timeout=2)
+    conn.sendall(f"GET {events.PATH}?token={token} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+    return conn, conn.recv(200).split(b"\r\n", 1)[0]
+
+
+def closed(conn):
+    try:
+        while conn.recv(200):
+            pass
+    except socket.timeout:
+        return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def hub():
+    alive = {(1, "a"), (1, "b")}
+    hub = events.EventHub("secret", port=PORT, heartbeat=60,
+                          session_check=lambda user_id, key: (user_id, key) in alive)
+    hub.alive = alive
+    hub.ensure_started()
+    assert hub.owner()
+    return hub
+
+
+def test_closed_session_cannot_connect(hub):
+    conn, status = open_stream(hub.token(1, "gone"))
+    assert status == b"HTTP/1.1 401 Unauthorized"
+    conn.close()
+
+
+def test_close_targets_one_session_then_all(hub):
+    first, status = open_stream(hub.token(1, "a"))
+    second, _ = open_stream(hub.token(1, "b"))
+    assert status == b"HTTP/1.1 200 OK"
+
+    hub.publish(1, events.CLOSE, {"session": "a"})
+    assert closed(first)
+    second.settimeout(0.3)
+    assert not closed(second)
+
+    hub.publish(1, events.CLOSE)
+    second.settimeout(2)
+    assert closed(second)
+    first.close()
+    second.close()
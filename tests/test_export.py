@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+import pytest
+
+import export
+import migrations
+from db import ConnectionPool
+
+
+@pytest.fixture
+def conn(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "export.db"), max_size=1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        for user_id in (1, 2):
+            conn.execute("INSERT INTO users(full_name, email, phone_number, password) VALUES (?, ?, ?, 'x')",
+                         (f"User {user_id}", f"u{user_id}@test.mg", f"034000000{user_id}"))
+        for n, (user_id, timestamp) in enumerate([(1, "2024-02-29 23:59:59"), (1, "2024-03-01 00:00:00"),
+                                                   (2, "2024-03-01 12:30:00"), (1, "2024-03-02 00:00:00")]):
+            conn.execute("INSERT INTO transactions(user_id, type, amount, reference, status, timestamp) "
+                         "VALUES (?, 'dépôt', 100, ?, 'réussi', ?)", (user_id, f"EXP-{n}", timestamp))
+        conn.commit()
+        yield conn
+    pool.close_all()
+
+
+def exported(conn, table, filters, batch_size=export.BATCH_SIZE):
+    return [row for rows in export.fetch_rows(conn, table, filters, batch_size) for row in rows]
+
+
+def test_parse_filters_until_is_the_next_day_exclusive():
+    assert export.parse_filters("transactions", "2024-02-28", "2024-02-29", "3") == {
+        "since": "2024-02-28", "until": "2024-03-01", "user_id": 3}
+    assert export.parse_filters("user_logins", "", None, "") == {}
+
+
+@pytest.mark.parametrize("args", [
+    ("users",), ("transactions", "2024-13-01"), ("transactions", None, "hier"), ("transactions", None, None, "abc"),
+])
+def test_parse_filters_rejects_invalid_values(args):
+    with pytest.raises(ValueError):
+        export.parse_filters(*args)
+
+
+def test_date_bounds_are_inclusive_days(conn):
+    filters = export.parse_filters("transactions", "2024-03-01", "2024-03-01")
+    assert [row[4] for row in exported(conn, "transactions", filters)] == ["EXP-1", "EXP-2"]
+    filters = export.parse_filters("transactions", until="2024-02-29", user_id=1)
+    assert [row[4] for row in exported(conn, "transactions", filters)] == ["EXP-0"]
+
+
+def test_rows_are_read_in_batches_in_date_order(conn):
+    batches = list(export.fetch_rows(conn, "transactions", {}, batch_size=3))
+    assert [len(rows) for rows in batches] == [3, 1]
+    assert [row[4] for rows in batches for row in rows] == ["EXP-0", "EXP-1", "EXP-2", "EXP-3"]
+
+
+def test_csv_has_a_header_and_quotes_values(conn):
+    rows = exported(conn, "transactions", {"user_id": 2}) + [(9, 2, "retrait", 5, 'a,"b"', "réussi", "x")]
+    text = "".join(export.encode([rows[:1], rows[1:]], "transactions", "csv"))
+    parsed = list(csv.reader(io.StringIO(text)))
+    assert parsed[0] == list(export.columns("transactions"))
+    assert parsed[1][4] == "EXP-2"
+    assert parsed[2][4] == 'a,"b"'
+    assert len(parsed) == 3
+
+
+def test_jsonl_has_one_object_per_line(conn):
+    chunks = list(export.encode(export.fetch_rows(conn, "transactions", {}, batch_size=2), "transactions", "jsonl"))
+    assert len(chunks) == 2
+    lines = "".join(chunks).splitlines()
+    assert [json.loads(line)["reference"] for line in lines] == ["EXP-0", "EXP-1", "EXP-2", "EXP-3"]
+    assert "dépôt" in lines[0]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        list(export.encode([], "transactions", "xml"))
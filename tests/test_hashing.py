@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+import hashing
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return None, seconds
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_running_jobs_keep_their_slot_after_timeout():
+    hasher = hashing.PasswordHasher(workers=1, max_pending=2, timeout=0.1)
+    hasher.start()
+    try:
+        # Déjà transmis au processus: ni annulables ni oubliés
+        for _ in range(2):
+            with pytest.raises(hashing.HashingBusy):
+                hasher._call("hash", _slow, 0.5)
+        assert hasher.stats()["pending"] == 2
+        with pytest.raises(hashing.HashingBusy):
+            hasher._call("hash", _slow, 0.0)
+        assert hasher.stats()["rejected"] == 1
+
+        assert wait_for(lambda: hasher.stats()["pending"] == 0)
+        assert hasher._call("hash", _slow, 0.0) == (None, 0.0)
+    finally:
+        hasher._executor.shutdown(cancel_futures=True)
+
+
+def test_queued_jobs_are_cancelled_after_timeout():
+    hasher = hashing.PasswordHasher(workers=1, max_pending=8, timeout=0.05)
+    hasher.start()
+    try:
+        for _ in range(6):
+            with pytest.raises(hashing.HashingBusy):
+                hasher._call("hash", _slow, 0.5)
+        # Ceux encore dans la file du pool ont été annulés et ont rendu leur place
+        assert 1 <= hasher.stats()["pending"] < 6
+        assert hasher.stats()["timeouts"] == 6
+        assert wait_for(lambda: hasher.stats()["pending"] == 0)
+    finally:
+        hasher._executor.shutdown(cancel_futures=True)
+
+
+def test_pool_is_never_created_on_demand():
+    hasher = hashing.PasswordHasher(workers=1, max_pending=2)
+    # Pas de start() dans ce processus (fork non suivi de post_fork): calcul sur place
+    assert hasher._call("hash", _slow, 0.0) == (None, 0.0)
+    assert hasher._executor is None
+    assert hasher.stats()["inline"] == 1
+
+
+def test_broken_pool_falls_back_to_inline():
+    hasher = hashing.PasswordHasher(workers=1, max_pending=2)
+    hasher.start()
+    executor = hasher._executor
+    for process in list(executor._processes.values()):
+        process.kill()
+        process.join()
+    assert hasher._call("hash", _slow, 0.0) == (None, 0.0)
+    assert hasher._executor is None
+    assert hasher.stats()["inline"] == 1
+    executor.shutdown()
+
+
+def test_hash_and_verify_in_process():
+    hasher = hashing.PasswordHasher(workers=0, method="pbkdf2:sha256:1000")
+    password_hash = hasher.hash("secret")
+    assert hasher.verify(password_hash, "secret") == (True, None)
+    assert hasher.verify(password_hash, "wrong") == (False, None)
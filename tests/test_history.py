@@ -0,0 +1,68 @@
+import base64
+import json
+
+import pytest
+
+import history
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    cursor = history.encode_cursor("2024-03-01 12:30:00", 42)
+    assert "=" not in cursor
+    assert history.decode_cursor(cursor) == ("2024-03-01 12:30:00", 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage!", "é", "", raw_cursor({"a": 1}), raw_cursor(["2024-03-01", 1, 2]), raw_cursor(["2024-03-01", "1"]),
+    raw_cursor([20240301, 1]), raw_cursor(["2024-03-01", True]), raw_cursor(["2024-03-01", 1.5]),
+    raw_cursor(["2024-03-01", 2 ** 70]), raw_cursor(["2024-03-01", -1]),
+])
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        history.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit, expected", [(0, 1), (-5, 1), ("7", 7), (20, 20), (10 ** 6, history.MAX_PAGE_SIZE)])
+def test_clamp_limit(limit, expected):
+    assert history.clamp_limit(limit) == expected
+
+
+def test_clamp_limit_rejects_non_numbers():
+    with pytest.raises(ValueError):
+        history.clamp_limit("abc")
+
+
+def test_page_sql_uses_the_keyset_condition():
+    sql = history.page_sql("investments", after=True, param="%s")
+    assert "(date, id) < (%s, %s)" in sql
+    assert sql.endswith("ORDER BY date DESC, id DESC LIMIT %s")
+
+
+def test_pages_follow_the_cursor(login, app_module):
+    client, user_id = login()
+    for n in range(5):
+        app_module.storage.backend.wallets.credit(user_id, 100 + n, "dépôt", f"HIST-{user_id}-{n}")
+    amounts, cursor = [], None
+    while True:
+        response = client.get("/api/history/transactions", query_string={"limit": 2, "cursor": cursor or ""})
+        assert response.status_code == 200
+        amounts += [item["amount"] for item in response.json["items"]]
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+    assert amounts == [104, 103, 102, 101, 100]
+
+
+@pytest.mark.parametrize("query", [
+    {"cursor": "garbage!"}, {"cursor": raw_cursor(["2024-03-01", "1"])},
+    {"cursor": raw_cursor(["2024-03-01", 2 ** 70])}, {"limit": "abc"},
+])
+def test_invalid_parameters_are_a_400(login, query):
+    client, _ = login()
+    response = client.get("/api/history/transactions", query_string=query)
+    assert response.status_code == 400
+    assert response.json["success"] is False
@@ -0,0 +1,102 @@
+import time
+
+import idempotency
+import wallet
+
+
+def invest(client, key, amount=100):
+    return client.post("/invest", data={"amount": str(amount)}, headers={idempotency.HEADER: key})
+
+
+def balance(app_module, user_id):
+    return app_module.storage.backend.wallets.balance(user_id)
+
+
+def key_row(app_module, user_id, key):
+    with app_module.db.pool.connection() as conn:
+        return conn.execute("SELECT * FROM idempotency_keys WHERE user_id=? AND key=?", (user_id, key)).fetchone()
+
+
+def test_replay_returns_stored_response_without_second_debit(app_module, login):
+    client, user_id = login(balance=1000)
+    first = invest(client, "k-replay")
+    assert first.status_code == 200
+    assert balance(app_module, user_id) == 900
+
+    again = invest(client, "k-replay")
+    assert again.status_code == 200
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.get_data() == first.get_data()
+    assert balance(app_module, user_id) == 900
+
+
+def test_same_key_other_body_is_refused(app_module, login):
+    client, user_id = login(balance=1000)
+    assert invest(client, "k-conflict", 100).status_code == 200
+    assert invest(client, "k-conflict", 200).status_code == 422
+    assert balance(app_module, user_id) == 900
+
+
+def test_key_in_flight_is_refused(app_module, login):
+    client, user_id = login(balance=1000)
+    with app_module.app.test_request_context("/invest", method="POST", data={"amount": "100"}):
+        fingerprint = idempotency.fingerprint()
+    with app_module.db.pool.connection() as conn:
+        assert idempotency.store.reserve(conn, user_id, "k-pending", fingerprint)[0] == "new"
+
+    assert invest(client, "k-pending").status_code == 409
+    assert balance(app_module, user_id) == 1000
+
+
+def test_abandoned_reservation_is_taken_over(app_module, login):
+    client, user_id = login(balance=1000)
+    with app_module.db.pool.connection() as conn:
+        conn.execute("INSERT INTO idempotency_keys (user_id, key, fingerprint, created_at, expires_at) "
+                     "VALUES (?, 'k-abandoned', 'x', ?, ?)",
+                     (user_id, time.time() - idempotency.PENDING_TIMEOUT - 1, time.time() + 3600))
+        conn.commit()
+
+    assert invest(client, "k-abandoned").status_code == 200
+    assert balance(app_module, user_id) == 900
+
+
+def test_server_error_releases_the_key(app_module, login, monkeypatch):
+    client, user_id = login(balance=1000)
+
+    def busy(*args):
+        raise wallet.WalletBusy("occupé")
+    monkeypatch.setattr(app_module.storage.backend.wallets, "invest", busy)
+    assert invest(client, "k-busy").status_code == 503
+    assert key_row(app_module, user_id, "k-busy") is None
+
+    monkeypatch.undo()
+    assert invest(client, "k-busy").status_code == 200
+    assert balance(app_module, user_id) == 900
+
+
+def test_refusal_is_not_replayed_after_top_up(app_module, login):
+    client, user_id = login(balance=50)
+    refused = invest(client, "k-funds")
+    assert refused.status_code == 400
+    assert key_row(app_module, user_id, "k-funds") is None
+
+    app_module.storage.backend.wallets.credit(user_id, 1000, "dépôt", f"TOPUP-{user_id}")
+    retried = invest(client, "k-funds")
+    assert retried.status_code == 200
+    assert "Idempotent-Replayed" not in retried.headers
+    assert balance(app_module, user_id) == 950
+
+
+def test_form_withdrawal_replays_only_success(app_module, login):
+    client, user_id = login(balance=50)
+    form = {"amount": "100", idempotency.FORM_FIELD: "k-form"}
+    # Refus: redirection avec message flash, clé libérée
+    assert client.post("/retrait", data=form).status_code == 302
+    assert key_row(app_module, user_id, "k-form") is None
+
+    app_module.storage.backend.wallets.credit(user_id, 100, "dépôt", f"TOPUP-{user_id}")
+    assert client.post("/retrait", data=form).status_code == 302
+    assert balance(app_module, user_id) == 50
+    replayed = client.post("/retrait", data=form)
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert balance(app_module, user_id) == 50
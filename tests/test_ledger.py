@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+import ledger
+import migrations
+from db import ConnectionPool
+from storage.sqlite import SqliteStorage
+
+
+@pytest.fixture
+def backend(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "ledger.db"), max_size=2)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+    backend = SqliteStorage(pool)
+    # Trois utilisateurs, lots de deux: la réconciliation passe par plusieurs lots
+    for n in range(3):
+        user_id = backend.users.create(f"User {n}", f"u{n}@test", f"034000000{n}", "x")
+        backend.wallets.credit(user_id, 1000, "dépôt", f"L-{n}-1")
+        backend.wallets.debit(user_id, 300, "retrait", f"L-{n}-2")
+    yield backend
+    pool.close_all()
+
+
+def transaction_ids(backend, user_id):
+    with backend.connection() as conn:
+        return [row["id"] for row in conn.execute("SELECT id FROM transactions WHERE user_id=? ORDER BY id",
+                                                  (user_id,))]
+
+
+def test_clean_ledger_has_no_discrepancy(backend):
+    summary = ledger.take_snapshots(backend.ledger, chunk_size=2)
+    assert (summary["wallets"], summary["snapshots"], summary["chunks"]) == (3, 3, 2)
+
+    # Mouvements après l'instantané: instantané + delta
+    backend.wallets.credit(1, 50, "dépôt", "L-after")
+    summary = ledger.reconcile(backend.ledger, chunk_size=2)
+    assert (summary["wallets"], summary["discrepancies"]) == (3, 0)
+
+
+def test_balance_drift_is_reported(backend):
+    ledger.take_snapshots(backend.ledger)
+    with backend.connection() as conn:
+        conn.execute("UPDATE wallets SET balance = balance + 25 WHERE user_id=2")
+        conn.commit()
+
+    reported = []
+    summary = ledger.reconcile(backend.ledger, chunk_size=2, report=reported.append)
+    assert summary["discrepancies"] == 1
+    assert summary["difference"] == 25
+    assert [(d.user_id, d.balance, d.expected) for d in reported] == [(2, 725, 700)]
+
+
+def test_transactions_cannot_be_updated(backend):
+    with backend.connection() as conn:
+        with pytest.raises(sqlite3.IntegrityError, match="ajout seul"):
+            conn.execute("UPDATE transactions SET amount = 1 WHERE user_id=1")
+        conn.rollback()
+
+
+def test_only_rows_covered_by_a_snapshot_can_be_deleted(backend):
+    first, second = transaction_ids(backend, 1)
+    with backend.connection() as conn:
+        with pytest.raises(sqlite3.IntegrityError, match="non couvert"):
+            conn.execute("DELETE FROM transactions WHERE id=?", (first,))
+        conn.rollback()
+
+    ledger.take_snapshots(backend.ledger)
+    backend.wallets.credit(1, 10, "dépôt", "L-uncovered")
+    third = transaction_ids(backend, 1)[-1]
+    with backend.connection() as conn:
+        conn.execute("DELETE FROM transactions WHERE id IN (?, ?)", (first, second))
+        with pytest.raises(sqlite3.IntegrityError, match="non couvert"):
+            conn.execute("DELETE FROM transactions WHERE id=?", (third,))
+        conn.commit()
+
+    # Le solde reste calculable sans les lignes archivées
+    assert transaction_ids(backend, 1) == [third]
+    assert ledger.reconcile(backend.ledger)["discrepancies"] == 0
@@ -0,0 +1,28 @@
+import pytest
+
+import money
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1000", 1000),
+    ("1\u00a0000", 1000),
+    ("1 000", 1000),
+    ("1000.0", 1000),
+    ("1000,00", 1000),
+    (2500, 2500),
+])
+def test_parse_amount(value, expected):
+    assert money.parse_amount(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "1,000", "1.000", "1,000.00", "1.000,00", "1000,5", "1000.50", "1e3", "abc", "", "NaN", "Infinity",
+])
+def test_parse_amount_rejects_ambiguous_or_fractional(value):
+    with pytest.raises(ValueError):
+        money.parse_amount(value)
+
+
+def test_parse_amount_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        money.parse_amount(str(money.MAX_AMOUNT + 1))
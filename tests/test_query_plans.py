@@ -0,0 +1,15 @@
+import migrations
+from db import ConnectionPool
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "plans.db"), max_size=1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        assert migrations.check_query_plans(conn) == []
+
+
+def test_plan_problems_flags_table_scans():
+    assert migrations.plan_problems("SCAN transactions")
+    assert migrations.plan_problems("USE TEMP B-TREE FOR ORDER BY")
+    assert not migrations.plan_problems("SEARCH transactions USING INDEX idx_transactions_user_timestamp (user_id=?)")
@@ -0,0 +1,27 @@
+from flask import Flask
+
+import ratelimit
+
+
+def check_register(limiter, app, email, ip, now):
+    with app.test_request_context("/register", method="POST", data={"email": email},
+                                  environ_base={"REMOTE_ADDR": ip}):
+        return limiter.check("register", now)
+
+
+def test_register_allows_many_accounts_behind_one_ip():
+    app = Flask(__name__)
+    limiter = ratelimit.RateLimiter(ratelimit.MemoryBuckets())
+    # NAT d'opérateur: des inscriptions distinctes depuis la même IP passent
+    for n in range(30):
+        assert check_register(limiter, app, f"user{n}@test", "10.0.0.1", 1000.0) is None
+    assert check_register(limiter, app, "user30@test", "10.0.0.1", 1000.0) is not None
+    assert check_register(limiter, app, "user30@test", "10.0.0.2", 1000.0) is None
+
+
+def test_register_limits_repeated_email():
+    app = Flask(__name__)
+    limiter = ratelimit.RateLimiter(ratelimit.MemoryBuckets())
+    for n in range(3):
+        assert check_register(limiter, app, "same@test", f"10.0.0.{n}", 1000.0) is None
+    assert check_register(limiter, app, "same@test", "10.0.0.9", 1000.0) is not None
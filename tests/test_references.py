@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import references
+import wallet
+from db import ConnectionPool
+
+
+def test_format_and_check_character():
+    reference = references.new()
+    assert len(reference) == references.LENGTH == 27
+    assert all(c in references.ALPHABET for c in reference[:-1])
+    assert reference[-1] in references.CHECK_SYMBOLS
+    assert references.is_valid(reference)
+
+    # Un caractère changé: le contrôle modulo 37 ne correspond plus
+    position = 12
+    other = next(c for c in references.ALPHABET if c != reference[position])
+    assert not references.is_valid(reference[:position] + other + reference[position + 1:])
+    assert not references.is_valid(reference[:-1])
+
+
+def test_normalize_accepts_human_input(monkeypatch):
+    # Horloge du générateur remise à zéro: l'horodatage demandé est bien celui encodé
+    monkeypatch.setattr(references, "_last_ms", 0)
+    reference = references.new(now=1_700_000_000.0)
+    typed = "-".join([reference[:9], reference[9:18], reference[18:]]).lower()
+    assert references.normalize(typed) == reference
+    assert references.is_valid(" " + typed + " ")
+    assert references.normalize("il-o") == "110"
+    assert references.timestamp(reference) == 1_700_000_000.0
+
+
+def test_monotonic_within_one_millisecond():
+    generated = [references.new(now=1_800_000_000.0) for _ in range(1000)]
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+    assert all(references.is_valid(r) for r in generated)
+
+
+@pytest.mark.parametrize("message, collision", [
+    ("UNIQUE constraint failed: transactions.reference", True),
+    ("UNIQUE constraint failed: investments.reference", True),
+    ("UNIQUE constraint failed: users.email", False),
+    ("UNIQUE constraint failed: archive.reference", False),
+    ("UNIQUE constraint failed: transactions.user_id, transactions.reference", False),
+    ("NOT NULL constraint failed: transactions.reference", False),
+])
+def test_sqlite_collision_detection(message, collision):
+    assert references.is_sqlite_collision(sqlite3.IntegrityError(message)) is collision
+
+
+def test_retry_after_forced_collision(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "refs.db"), max_size=1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        conn.execute("INSERT INTO users (id, full_name, email, phone_number, password) "
+                     "VALUES (1, 'Test', 't@test', '0340000000', 'x')")
+        conn.execute("INSERT INTO wallets (user_id, balance) VALUES (1, 0)")
+        conn.commit()
+        taken = references.new()
+        wallet.credit(conn, 1, 10, "dépôt", taken)
+
+        generate = references.new
+        proposed = iter([taken])
+        monkeypatch.setattr(references, "new", lambda: next(proposed, None) or generate())
+        before = references.stats()["collisions"]
+
+        result = references.retry_on_collision(lambda reference: wallet.credit(conn, 1, 5, "dépôt", reference))
+        assert result.reference != taken
+        assert result.balance == 15
+        assert references.stats()["collisions"] == before + 1
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 2
+    pool.close_all()
+
+
+def test_other_integrity_errors_are_not_retried():
+    calls = []
+
+    def operation(reference):
+        calls.append(reference)
+        raise sqlite3.IntegrityError("UNIQUE constraint failed: users.email")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        references.retry_on_collision(operation)
+    assert len(calls) == 1
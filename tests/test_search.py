@@ -0,0 +1,59 @@
+import pytest
+
+import migrations
+import search
+from db import ConnectionPool
+
+
+@pytest.fixture
+def conn(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "search.db"), max_size=1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        for n, name in enumerate(["Rakoto Jean", "Rabe Marie", "Andry NOT Soa"]):
+            conn.execute("INSERT INTO users(full_name, email, phone_number, password) VALUES (?, ?, ?, 'x')",
+                         (name, f"u{n}@test.mg", f"0340000{n:03d}"))
+        for reference in ["DEP-AB12-XYZ", "RET-CD34-XYZ", 'INV-"QUOTE"-1']:
+            conn.execute("INSERT INTO transactions(user_id, type, amount, reference) VALUES (1, 'dépôt', 100, ?)",
+                         (reference,))
+        conn.commit()
+        yield conn
+    pool.close_all()
+
+
+def test_match_expression_is_a_quoted_phrase():
+    assert search.match_expression("abc") == '"abc"'
+    assert search.match_expression('a"b') == '"a""b"'
+
+
+@pytest.mark.parametrize("text", ["NOT", "a AND b", "ab*", "-XYZ", "full_name:x", "(abc", '"', '"""'])
+def test_fts5_operators_are_searched_literally(conn, text):
+    # Aucune erreur de syntaxe FTS5, quel que soit le texte saisi
+    search.search(conn, text)
+
+
+def test_substring_search_is_case_insensitive(conn):
+    result = search.search(conn, "akot")
+    assert [row["full_name"] for row in result["users"]] == ["Rakoto Jean"]
+    assert search.search(conn, "ab12")["transactions"][0]["reference"] == "DEP-AB12-XYZ"
+    assert sorted(row["reference"] for row in search.search(conn, "xyz")["transactions"]) == \
+        ["DEP-AB12-XYZ", "RET-CD34-XYZ"]
+
+
+def test_operators_inside_the_text_match_literally(conn):
+    assert [row["full_name"] for row in search.search(conn, "Andry NOT")["users"]] == ["Andry NOT Soa"]
+    assert [row["reference"] for row in search.search(conn, '"QUOTE"')["transactions"]] == ['INV-"QUOTE"-1']
+
+
+def test_short_input_falls_back_to_user_prefix(conn):
+    result = search.search(conn, "ra")
+    assert sorted(row["full_name"] for row in result["users"]) == ["Rabe Marie", "Rakoto Jean"]
+    assert result["transactions"] == []
+    # Préfixe seulement: "ko" est au milieu de "Rakoto"
+    assert search.search(conn, "ko")["users"] == []
+    assert search.search(conn, "  ")["users"] == []
+
+
+def test_limit_is_clamped(conn):
+    assert len(search.search(conn, "xyz", limit=1)["transactions"]) == 1
+    assert len(search.search(conn, "xyz", limit=0)["transactions"]) == 1
@@ -0,0 +1,123 @@
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, session
+
+import migrations
+import sessions
+from db import ConnectionPool
+
+SID = "s" * sessions.SID_LENGTH
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "sessions.db"), max_size=4)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def store(pool):
+    return sessions.SessionStore(pool, idle_timeout=3600, touch_interval=60)
+
+
+def row(pool, sid):
+    with pool.connection() as conn:
+        return conn.execute("SELECT * FROM sessions WHERE id=?", (sessions.session_key(sid),)).fetchone()
+
+
+def test_save_then_load_from_memory(store):
+    store.save(SID, {"user_id": 1}, 1, now=1000.0)
+    assert store.load(SID, 1, now=1001.0) == ({"user_id": 1}, 1, False)
+    assert store.stats()["memory_hits"] == 1
+
+
+def test_new_version_is_read_from_database(pool, store):
+    # Deux workers: chacun son cache, la même table
+    other = sessions.SessionStore(pool, idle_timeout=3600, touch_interval=60)
+    store.save(SID, {"user_id": 1}, 1, now=1000.0)
+    assert other.load(SID, 1, now=1001.0)[0] == {"user_id": 1}
+
+    store.save(SID, {"user_id": 1, "flash": "ok"}, 2, now=1002.0)
+    data, version, _ = other.load(SID, 2, now=1003.0)
+    assert (data, version) == ({"user_id": 1, "flash": "ok"}, 2)
+    assert other.stats()["db_hits"] == 2
+
+
+def test_idle_expiry_is_extended_only_after_touch_interval(pool, store):
+    store.save(SID, {"user_id": 1}, 1, now=1000.0)
+    fresh = sessions.SessionStore(pool, idle_timeout=3600, touch_interval=60)
+
+    assert fresh.load(SID, 1, now=1030.0)[2] is False
+    assert row(pool, SID)["last_seen"] == 1000.0
+
+    assert fresh.load(SID, 1, now=1100.0)[2] is True
+    assert row(pool, SID)["expires_at"] == 1100.0 + 3600
+
+
+def test_idle_session_expires(pool, store):
+    store.save(SID, {"user_id": 1}, 1, now=1000.0)
+    fresh = sessions.SessionStore(pool, idle_timeout=3600, touch_interval=60)
+    assert fresh.load(SID, 1, now=1000.0 + 3601) == (None, 0, False)
+
+
+def test_unknown_sid_never_takes_the_write_lock(tmp_path, pool, store):
+    store.save(SID, {"user_id": 1}, 1, now=time.time() - 120)
+    holder = sqlite3.connect(str(tmp_path / "sessions.db"), isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.perf_counter()
+        assert store.load("x" * sessions.SID_LENGTH, 1) == (None, 0, False)
+        # Session connue mais base occupée: servie sans prolonger, sans erreur
+        fresh = sessions.SessionStore(pool, idle_timeout=3600, touch_interval=60)
+        assert fresh.load(SID, 1) == ({"user_id": 1}, 1, False)
+        assert fresh.stats()["touch_skipped"] == 1
+        assert time.perf_counter() - start < 1.0
+    finally:
+        holder.rollback()
+        holder.close()
+
+
+def test_revoke_user(store):
+    store.save(SID, {"user_id": 1}, 1)
+    store.save("t" * sessions.SID_LENGTH, {"user_id": 1}, 1)
+    store.save("u" * sessions.SID_LENGTH, {"user_id": 2}, 1)
+    assert store.revoke_user(1) == 2
+    assert store.load(SID, 1) == (None, 0, False)
+    assert store.load("u" * sessions.SID_LENGTH, 1)[0] == {"user_id": 2}
+
+
+def test_login_regenerates_the_session_id(pool, store):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = sessions.ServerSessionInterface(store)
+
+    @app.route("/visit")
+    def visit():
+        session["cart"] = 1
+        return ""
+
+    @app.route("/login")
+    def login():
+        sessions.login({"id": 1, "full_name": "A", "email": "a@test", "phone_number": "034"})
+        return ""
+
+    @app.route("/me")
+    def me():
+        user = sessions.current_user()
+        return str(user.id if user else None)
+
+    client = app.test_client()
+    client.get("/visit")
+    before = client.get_cookie("session").value.partition(".")[0]
+    client.get("/login")
+    after = client.get_cookie("session").value.partition(".")[0]
+
+    assert after != before
+    assert row(pool, before) is None
+    assert row(pool, after)["user_id"] == 1
+    assert client.get("/me").get_data(as_text=True) == "1"
@@ -0,0 +1,93 @@
+import os
+import threading
+import uuid
+
+import pytest
+
+import migrations
+import storage
+import wallet
+from db import ConnectionPool
+
+THREADS = 8
+OPERATIONS = 25
+INITIAL_BALANCE = 300
+AMOUNT = 7
+
+
+def sqlite_backend(tmp_path):
+    from storage.sqlite import SqliteStorage
+    pool = ConnectionPool(str(tmp_path / "storage.db"), max_size=THREADS)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+    return SqliteStorage(pool)
+
+
+def postgres_backend(tmp_path):
+    url = os.environ.get("DATABASE_URL", "")
+    if not storage.is_postgres(url):
+        pytest.skip("DATABASE_URL=postgresql://... non défini")
+    pytest.importorskip("psycopg2")
+    from storage.postgres import PostgresStorage
+    backend = PostgresStorage(url, max_size=THREADS)
+    backend.ensure_schema()
+    return backend
+
+
+@pytest.fixture(params=[sqlite_backend, postgres_backend], ids=["sqlite", "postgresql"])
+def backend(request, tmp_path):
+    return request.param(tmp_path)
+
+
+def ledger_totals(backend, user_id):
+    """{type: (nombre, somme)} des mouvements écrits pour cet utilisateur"""
+    sql = "SELECT type, COUNT(*) AS n, SUM(amount) AS total FROM transactions WHERE user_id={} GROUP BY type"
+    if backend.name == "sqlite":
+        with backend.connection() as conn:
+            rows = conn.execute(sql.format("?"), (user_id,)).fetchall()
+    else:
+        with backend.cursor() as cur:
+            cur.execute(sql.format("%s"), (user_id,))
+            rows = cur.fetchall()
+    return {row["type"]: (row["n"], row["total"]) for row in rows}
+
+
+def test_concurrent_deposits_and_withdrawals(backend):
+    tag = uuid.uuid4().hex[:12]
+    user_id = backend.users.create("Test", f"storage-{tag}@test", f"0{tag}", "x")
+    backend.wallets.credit(user_id, INITIAL_BALANCE, "dépôt", f"T-{tag}-init")
+
+    outcomes = {"dépôt": 0, "retrait": 0, "insufficient": 0}
+    balances = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(n):
+        barrier.wait()
+        for i in range(OPERATIONS):
+            kind = "dépôt" if i % 3 == 0 else "retrait"
+            mutate = backend.wallets.credit if kind == "dépôt" else backend.wallets.debit
+            try:
+                result = mutate(user_id, AMOUNT, kind, f"T-{tag}-{n}-{i}")
+            except wallet.InsufficientFunds:
+                kind, result = "insufficient", None
+            with lock:
+                outcomes[kind] += 1
+                if result is not None:
+                    balances.append(result.balance)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(outcomes.values()) == THREADS * OPERATIONS
+    assert min(balances) >= 0
+    deposits, withdrawals = outcomes["dépôt"] + 1, outcomes["retrait"]
+    balance = backend.wallets.balance(user_id)
+    assert balance == INITIAL_BALANCE + (outcomes["dépôt"] - withdrawals) * AMOUNT
+    ledger = ledger_totals(backend, user_id)
+    assert ledger["dépôt"] == (deposits, INITIAL_BALANCE + outcomes["dépôt"] * AMOUNT)
+    assert ledger.get("retrait", (0, 0)) == (withdrawals, withdrawals * AMOUNT)
+    assert balance == ledger["dépôt"][1] - ledger.get("retrait", (0, 0))[1]
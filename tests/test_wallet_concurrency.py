@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import migrations
+import wallet
+from db import ConnectionPool
+
+THREADS = 8
+OPERATIONS = 40
+INITIAL_BALANCE = 500
+AMOUNT = 7
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "wallet.db"), max_size=THREADS + 1)
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        conn.execute("INSERT INTO users (id, full_name, email, phone_number, password) "
+                     "VALUES (1, 'Test', 't@test', '0340000000', 'x')")
+        conn.execute("INSERT INTO wallets (user_id, balance) VALUES (1, 0)")
+        conn.commit()
+        wallet.credit(conn, 1, INITIAL_BALANCE, "dépôt", "INIT")
+    yield pool
+    pool.close_all()
+
+
+def test_concurrent_deposits_and_withdrawals_lose_no_update(pool):
+    outcomes = {"dépôt": 0, "retrait": 0, "insufficient": 0}
+    balances = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(n):
+        barrier.wait()
+        for i in range(OPERATIONS):
+            # Surtout des retraits: le solde passe par zéro en cours de route
+            kind = "dépôt" if i % 3 == 0 else "retrait"
+            with pool.connection() as conn:
+                try:
+                    mutate = wallet.credit if kind == "dépôt" else wallet.debit
+                    result = mutate(conn, 1, AMOUNT, kind, f"T-{n}-{i}")
+                except wallet.InsufficientFunds:
+                    kind = "insufficient"
+                    result = None
+            with lock:
+                outcomes[kind] += 1
+                if result is not None:
+                    balances.append(result.balance)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes["insufficient"] > 0
+    assert min(balances) >= 0
+    expected = INITIAL_BALANCE + (outcomes["dépôt"] - outcomes["retrait"]) * AMOUNT
+    with pool.connection() as conn:
+        balance = conn.execute("SELECT balance FROM wallets WHERE user_id=1").fetchone()[0]
+        ledger = dict(conn.execute("SELECT type, COUNT(*) FROM transactions WHERE user_id=1 GROUP BY type").fetchall())
+    assert balance == expected
+    assert ledger == {"dépôt": outcomes["dépôt"] + 1, "retrait": outcomes["retrait"]}
+
+
+def test_lock_wait_is_bounded(pool, tmp_path):
+    # Un autre processus (ici une autre connexion) garde le verrou d'écriture
+    holder = sqlite3.connect(str(tmp_path / "wallet.db"), isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.perf_counter()
+        with pool.connection() as conn:
+            with pytest.raises(wallet.WalletBusy):
+                wallet.debit(conn, 1, AMOUNT, "retrait", "T-busy")
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert time.perf_counter() - start < wallet.MAX_LOCK_WAIT + 0.5
+    finally:
+        holder.rollback()
+        holder.close()
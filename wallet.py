@@ -0,0 +1,156 @@
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import references
+
+MutationResult = namedtuple("MutationResult", "balance reference lock_wait attempts version")
+
+
+class InsufficientFunds(Exception):
+    """Solde insuffisant (ou portefeuille inexistant) pour un débit"""
+
+
+class WalletNotFound(Exception):
+    """Aucun portefeuille pour cet utilisateur"""
+
+
+class WalletBusy(Exception):
+    """Verrou d'écriture SQLite toujours pris après toutes les tentatives"""
+
+
+# Solde et version lus ensemble (ETag de /api/wallet)
+STATE_SQL = "SELECT balance, version FROM wallets WHERE user_id=?"
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.01
+BACKOFF_MAX = 0.25
+# Attente totale du verrou d'écriture pour une mutation, toutes tentatives
+# comprises: le busy_timeout du pool (5 s) ne s'applique pas à chaque tentative
+MAX_LOCK_WAIT = 2.0
+ATTEMPT_BUSY_TIMEOUT = 0.25
+
+_stats_lock = threading.Lock()
+_stats = {
+    "mutations": 0,
+    "insufficient_funds": 0,
+    "busy_retries": 0,
+    "busy_failures": 0,
+    "lock_wait_seconds": 0.0,
+    "lock_wait_max_seconds": 0.0,
+}
+
+
+def record(**deltas):
+    """Cumuler des compteurs (partagés avec le backend PostgreSQL)"""
+    with _stats_lock:
+        for key, value in deltas.items():
+            if key == "lock_wait_max_seconds":
+                _stats[key] = max(_stats[key], value)
+            else:
+                _stats[key] += value
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _begin_immediate(conn, max_attempts, max_wait=MAX_LOCK_WAIT):
+    """Prendre le verrou d'écriture; retourne (attente en secondes, tentatives).
+
+    Chaque tentative attend au plus ATTEMPT_BUSY_TIMEOUT, et l'ensemble au plus
+    max_wait: au-delà, WalletBusy.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+    start = time.perf_counter()
+    deadline = start + max_wait
+    previous_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    try:
+        for attempt in range(1, max_attempts + 1):
+            remaining = deadline - time.perf_counter()
+            conn.execute(f"PRAGMA busy_timeout = {max(1, int(min(remaining, ATTEMPT_BUSY_TIMEOUT) * 1000))}")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return time.perf_counter() - start, attempt
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e):
+                    raise
+                remaining = deadline - time.perf_counter()
+                if attempt == max_attempts or remaining <= 0:
+                    record(busy_failures=1, lock_wait_seconds=time.perf_counter() - start)
+                    raise WalletBusy("Portefeuille occupé, veuillez réessayer") from e
+                record(busy_retries=1)
+                time.sleep(min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX, remaining) * random.uniform(0.5, 1.0))
+    finally:
+        # Connexion du pool: les autres requêtes retrouvent le busy_timeout habituel
+        conn.execute(f"PRAGMA busy_timeout = {previous_timeout}")
+
+
+def _mutate(conn, user_id, amount, tx_type, reference, debit, extra, max_attempts):
+    lock_wait, attempts = _begin_immediate(conn, max_attempts)
+    try:
+        if debit:
+            # Débit conditionnel: jamais de solde négatif, même en concurrence
+            row = conn.execute(
+                "UPDATE wallets SET balance = balance - ?, version = version + 1 "
+                "WHERE user_id=? AND balance >= ? RETURNING balance, version",
+                (amount, user_id, amount)
+            ).fetchone()
+            if row is None:
+                raise InsufficientFunds("Solde insuffisant")
+        else:
+            row = conn.execute(
+                "UPDATE wallets SET balance = balance + ?, version = version + 1 WHERE user_id=? RETURNING balance, version",
+                (amount, user_id)
+            ).fetchone()
+            if row is None:
+                raise WalletNotFound(f"Aucun portefeuille pour l'utilisateur {user_id}")
+
+        conn.execute(
+            "INSERT INTO transactions (user_id, type, amount, reference, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, tx_type, amount, reference, "réussi", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        for sql, params in extra:
+            conn.execute(sql, params)
+        conn.commit()
+    except InsufficientFunds:
+        conn.rollback()
+        record(insufficient_funds=1, lock_wait_seconds=lock_wait, lock_wait_max_seconds=lock_wait)
+        raise
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        if references.is_sqlite_collision(e):
+            raise references.ReferenceCollision(str(e)) from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+
+    record(mutations=1, lock_wait_seconds=lock_wait, lock_wait_max_seconds=lock_wait)
+    return MutationResult(balance=row["balance"], reference=reference, lock_wait=lock_wait, attempts=attempts,
+                          version=row["version"])
+
+
+def debit(conn, user_id, amount, tx_type, reference, extra=(), max_attempts=MAX_ATTEMPTS):
+    """Débiter le portefeuille et écrire le mouvement dans une seule transaction.
+
+    extra: requêtes (sql, params) supplémentaires exécutées dans la même transaction.
+    Lève InsufficientFunds si le solde ne couvre pas le montant, WalletBusy si le
+    verrou d'écriture reste indisponible.
+    """
+    return _mutate(conn, user_id, amount, tx_type, reference, True, extra, max_attempts)
+
+
+def credit(conn, user_id, amount, tx_type, reference, extra=(), max_attempts=MAX_ATTEMPTS):
+    """Créditer le portefeuille et écrire le mouvement dans une seule transaction"""
+    return _mutate(conn, user_id, amount, tx_type, reference, False, extra, max_attempts)